@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so profiles and timings cover the rest of the stack
+    'quotes.profiling.ProfilingMiddleware',
+    'quotes.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -49,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'quotes.versioning.CorpusVersionMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -141,3 +146,69 @@ FILE_UPLOAD_PERMISSIONS = 0o644
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Quotes
+# How pick_weighted_quote draws: "index" (in-memory, per worker), "sql" (one window-function query) or "scan"
+QUOTES_SAMPLER_STRATEGY = os.environ.get('QUOTES_SAMPLER_STRATEGY', 'index')
+
+# The random page skips each visitor's last SIZE quotes (kept in a signed cookie; see quotes/history.py); 0 disables
+QUOTES_HISTORY = {
+    'SIZE': 5,
+    'COOKIE_NAME': 'recent_quotes',
+    'MAX_AGE': 30 * 24 * 3600,
+}
+
+# Serve the read and vote endpoints from quotes/async_views.py; only worth it under ASGI (uvicorn) workers
+QUOTES_ASYNC_VIEWS = False
+
+# Corpus version that keeps each worker's in-memory quote state coherent (see quotes/versioning.py).
+# Workers check it at most once per CHECK_INTERVAL seconds, so other workers' edits show up within that bound.
+QUOTES_CORPUS = {
+    'CHECK_INTERVAL': 1.0,
+    'MAX_DELTA': 500,
+    'RETENTION': 10000,
+}
+
+# Write-behind buffering of view and vote counts (see quotes/counters.py for the durability modes)
+QUOTES_COUNTERS = {
+    'DURABILITY': 'memory',
+    'MAX_PENDING': 100,
+    'FLUSH_INTERVAL': 5.0,
+    'JOURNAL_DIR': BASE_DIR / 'var' / 'counters',
+    'FSYNC': False,
+}
+
+# Per-worker top-K boards for the popular page (see quotes/leaderboard.py)
+QUOTES_LEADERBOARD = {
+    'SIZE': 10,
+    'REFRESH_INTERVAL': 2.0,
+    'REBUILD_INTERVAL': 300.0,
+    'MAX_SOURCES': 256,
+}
+
+# Per-worker metrics merged on /metrics (see quotes/metrics.py)
+QUOTES_METRICS = {
+    'ENABLED': True,
+    'DIRECTORY': BASE_DIR / 'var' / 'metrics',
+    'WRITE_INTERVAL': 5.0,
+    'TOKEN': None,
+}
+
+# On-demand request profiling (see quotes/profiling.py); "manage.py profiles" lists the captures
+QUOTES_PROFILING = {
+    'ENABLED': True,
+    'DIRECTORY': BASE_DIR / 'logs' / 'profiles',
+    'SAMPLE_RATE': 0.0,
+    'SLOW_THRESHOLD': None,
+    'ARMED_REQUESTS': 1,
+    'TOKEN_MAX_AGE': 300,
+    'MAX_CAPTURES': 200,
+    'MAX_BYTES': 100 * 1024 * 1024,
+}
+
+# /live and /ready probes (see quotes/health.py): readiness is re-checked in the background every INTERVAL
+# seconds; a result older than STALE_AFTER seconds reports the worker as not ready
+QUOTES_HEALTH = {
+    'INTERVAL': 10.0,
+    'STALE_AFTER': 60.0,
+}
@@ -11,12 +11,65 @@ SECRET_KEY = os.environ.get('SECRET_KEY', SECRET_KEY)
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 # Database configuration
+# WAL lets readers run while a writer commits; synchronous=NORMAL is durable across process crashes in WAL
+# mode and only risks the last commits on power loss. mmap_size/cache_size keep hot pages in memory.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+    f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024))};"
+    'PRAGMA temp_store=MEMORY;'
+)
+# Seconds a connection waits for the write lock (busy_timeout) before raising "database is locked"
+SQLITE_TIMEOUT = float(os.environ.get('SQLITE_TIMEOUT', '20'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            # Take the write lock at BEGIN, where busy_timeout applies, instead of failing on lock upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_TIMEOUT,
+        },
+    },
+    # Same file opened query-only: view reads never queue behind the writer connection (see quotes/routers.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS + 'PRAGMA query_only=ON;',
+            'timeout': SQLITE_TIMEOUT,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['quotes.routers.ReadReplicaRouter']
+
+# Templates are compiled once per worker; loaders must be listed explicitly, so APP_DIRS is turned off
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Async views under uvicorn workers (scripts/start.sh picks the worker class from the same variable).
+# A sync-only middleware would wrap every async request in a thread hop and lose the concurrency, so
+# WhiteNoise is dropped in that mode; nginx serves /static/ itself.
+QUOTES_ASYNC_VIEWS = os.environ.get('QUOTES_ASYNC_VIEWS', 'False').lower() == 'true'
+if QUOTES_ASYNC_VIEWS:
+    MIDDLEWARE = [name for name in MIDDLEWARE if name != 'whitenoise.middleware.WhiteNoiseMiddleware']
 
 # Static files configuration for production
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -47,23 +100,74 @@ CSRF_COOKIE_SAMESITE = 'Strict'
 SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 SECURE_CROSS_ORIGIN_OPENER_POLICY = 'same-origin'
 
-# Performance optimizations
-CONN_MAX_AGE = 60
+# Performance optimizations (CONN_MAX_AGE is set per database above)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
-# Cache configuration (if using Redis)
+# Cache shared by all gunicorn workers on the host: a SQLite WAL file in /dev/shm (no Redis needed)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'quotes.sqlite_cache.SQLiteCache',
+        'LOCATION': os.environ.get('QUOTES_CACHE_PATH', '/dev/shm/quotes-cache.sqlite3'),
+        'TIMEOUT': int(os.environ.get('QUOTES_CACHE_TIMEOUT', '300')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('QUOTES_CACHE_MAX_ENTRIES', '10000')),
+        },
     }
 }
 
+# Weighted sampler strategy; short-lived processes can use "sql" to skip building the in-memory index
+QUOTES_SAMPLER_STRATEGY = os.environ.get('QUOTES_SAMPLER_STRATEGY', 'index')
+
+# Quotes the random page will not repeat for a visitor
+QUOTES_HISTORY = {
+    **QUOTES_HISTORY,
+    'SIZE': int(os.environ.get('QUOTES_HISTORY_SIZE', '5')),
+}
+
+# Counter buffering: "journal" replays increments from crashed workers, "memory" may lose one buffer on a crash
+QUOTES_COUNTERS = {
+    'DURABILITY': os.environ.get('QUOTES_COUNTERS_DURABILITY', 'journal'),
+    'MAX_PENDING': int(os.environ.get('QUOTES_COUNTERS_MAX_PENDING', '200')),
+    'FLUSH_INTERVAL': float(os.environ.get('QUOTES_COUNTERS_FLUSH_INTERVAL', '5')),
+    'JOURNAL_DIR': os.environ.get('QUOTES_COUNTERS_JOURNAL_DIR', BASE_DIR / 'var' / 'counters'),
+    'FSYNC': os.environ.get('QUOTES_COUNTERS_FSYNC', 'False').lower() == 'true',
+}
+
+# Metrics snapshots live on tmpfs; scrapers authenticate with "Authorization: Bearer $QUOTES_METRICS_TOKEN"
+QUOTES_METRICS = {
+    'ENABLED': os.environ.get('QUOTES_METRICS_ENABLED', 'True').lower() == 'true',
+    'DIRECTORY': os.environ.get('QUOTES_METRICS_DIR', '/dev/shm/quotes-metrics'),
+    'WRITE_INTERVAL': float(os.environ.get('QUOTES_METRICS_WRITE_INTERVAL', '5')),
+    'TOKEN': os.environ.get('QUOTES_METRICS_TOKEN') or None,
+}
+
+# Request profiling: header-triggered always, sampling and slow-route arming when configured
+QUOTES_PROFILING = {
+    'ENABLED': os.environ.get('QUOTES_PROFILING_ENABLED', 'True').lower() == 'true',
+    'DIRECTORY': BASE_DIR / 'logs' / 'profiles',
+    'SAMPLE_RATE': float(os.environ.get('QUOTES_PROFILING_SAMPLE_RATE', '0')),
+    'SLOW_THRESHOLD': float(os.environ['QUOTES_PROFILING_SLOW_THRESHOLD'])
+    if os.environ.get('QUOTES_PROFILING_SLOW_THRESHOLD') else None,
+    'ARMED_REQUESTS': int(os.environ.get('QUOTES_PROFILING_ARMED_REQUESTS', '1')),
+    'TOKEN_MAX_AGE': int(os.environ.get('QUOTES_PROFILING_TOKEN_MAX_AGE', '3600')),
+    'MAX_CAPTURES': int(os.environ.get('QUOTES_PROFILING_MAX_CAPTURES', '200')),
+    'MAX_BYTES': int(os.environ.get('QUOTES_PROFILING_MAX_MB', '100')) * 1024 * 1024,
+}
+
+# Readiness probe cadence for /ready
+QUOTES_HEALTH = {
+    'INTERVAL': float(os.environ.get('QUOTES_HEALTH_INTERVAL', '10')),
+    'STALE_AFTER': float(os.environ.get('QUOTES_HEALTH_STALE_AFTER', '60')),
+}
+
 # Email configuration
 # TODO: add email info
 
 # Logging configuration
+# Request threads only enqueue log records; a listener thread per worker writes them through the "quotes.sink"
+# handlers (see quotes/log.py). When the queue is full records are dropped and counted, or with "block" the
+# request waits up to QUOTES_LOG_BLOCK_TIMEOUT seconds first.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -77,10 +181,17 @@ LOGGING = {
             'style': '{',
         },
         'json': {
-            'format': '{"level": "%(levelname)s", "time": "%(asctime)s", "module": "%(module)s", "message": "%(message)s"}',
+            '()': 'quotes.log.JSONFormatter',
         },
     },
     'handlers': {
+        'queue': {
+            'class': 'quotes.log.QueueHandler',
+            'sink': 'quotes.sink',
+            'maxsize': int(os.environ.get('QUOTES_LOG_QUEUE_SIZE', '10000')),
+            'policy': os.environ.get('QUOTES_LOG_QUEUE_POLICY', 'drop'),
+            'block_timeout': float(os.environ.get('QUOTES_LOG_BLOCK_TIMEOUT', '0.05')),
+        },
         'file': {
             'level': 'INFO',
             'class': 'logging.handlers.RotatingFileHandler',
@@ -104,20 +215,26 @@ LOGGING = {
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file', 'error_file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'quotes': {
-            'handlers': ['console', 'file', 'error_file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
+        # Written from the listener thread only
+        'quotes.sink': {
+            'handlers': ['console', 'file', 'error_file'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
     },
 }
 
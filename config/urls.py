@@ -19,9 +19,18 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from quotes import async_views, health
+from quotes.metrics import metrics_view
+
+# Load balancer probes, next to the app rather than under it; async twins for ASGI workers
+probes = async_views if getattr(settings, 'QUOTES_ASYNC_VIEWS', False) else health
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('quotes/', include('quotes.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('live', probes.live_view, name='live'),
+    path('ready', probes.ready_view, name='ready'),
 ]
 
 # Serve static files in development
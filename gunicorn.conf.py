@@ -1,12 +1,15 @@
 # Gunicorn configuration for Django Quotes Application
 
+import os
+
 # Server socket
 bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes
 workers = 3
-worker_class = "sync"
+# "sync" for config.wsgi; "uvicorn_worker.UvicornWorker" for config.asgi with QUOTES_ASYNC_VIEWS (see scripts/start.sh)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -38,7 +41,6 @@ tmp_upload_dir = None
 
 # Worker process management
 worker_tmp_dir = "/dev/shm"
-worker_class = "sync"
 
 # Graceful timeout for worker processes
 graceful_timeout = 30
@@ -56,7 +58,6 @@ preload_app = True
 worker_connections = 1000
 
 # Process management
-worker_class = "sync"
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -69,3 +70,31 @@ limit_request_field_size = 8190
 # Performance tuning
 worker_tmp_dir = "/dev/shm"
 
+
+# Server hooks
+def post_worker_init(worker):
+    # Flush buffered view/vote counters in the background and replay journals left by crashed workers
+    from quotes.counters import start_flusher
+    start_flusher()
+    # Readiness is probed in the background, so /ready polls never wait on the database
+    from quotes.health import start_prober
+    start_prober()
+    # Metrics snapshots are written in the background; requests only update in-memory counters
+    from quotes.metrics import start_writer
+    start_writer()
+
+
+def worker_exit(server, worker):
+    # Runs in the worker on graceful shutdown and max_requests recycling, so buffered counters are not lost
+    from quotes.counters import shutdown
+    shutdown()
+    from quotes.health import stop_prober
+    stop_prober()
+    from quotes.metrics import stop_writer
+    stop_writer()
+
+
+def child_exit(server, worker):
+    # Fold the exited worker's metrics snapshot into the archive so counters survive worker recycling
+    from quotes.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
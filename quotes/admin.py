@@ -1,10 +1,16 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpRequest, HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
 
+from . import exporting, search
+from .forms import QuoteForm
 from .models import Quote
 
 
 @admin.register(Quote)
 class QuoteAdmin(admin.ModelAdmin):
+    form = QuoteForm
     list_display = ("id", "source", "short_text", "weight", "views", "likes", "dislikes", "created_at")
     list_filter = ("source",)
     search_fields = ("source", "text")
@@ -12,3 +18,36 @@ class QuoteAdmin(admin.ModelAdmin):
     def short_text(self, obj: Quote) -> str:
         return (obj.text or "")[:60]
     short_text.short_description = "text"
+
+    def get_search_results(self, request: HttpRequest, queryset, search_term: str):
+        # Served by the FTS5 index instead of LIKE '%term%' over every row
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
+    def get_urls(self):
+        urls = [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name="quotes_quote_export",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def export_view(self, request: HttpRequest):
+        """Stream every quote with its counters; ?format=csv|jsonl|ndjson&gzip=1."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        fmt = request.GET.get("format", "csv")
+        if fmt not in exporting.FORMATS:
+            return HttpResponseBadRequest(f"Unknown format, expected one of {', '.join(exporting.FORMATS)}")
+        compress = request.GET.get("gzip") in ("1", "true", "yes")
+        response = StreamingHttpResponse(
+            exporting.export(fmt, compress),
+            content_type="application/gzip" if compress else exporting.CONTENT_TYPES[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{exporting.filename(fmt, compress)}"'
+        # Let nginx pass blocks through instead of spooling the whole export to disk
+        response["X-Accel-Buffering"] = "no"
+        return response
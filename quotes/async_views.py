@@ -0,0 +1,126 @@
+"""
+Async versions of the read, vote and probe endpoints, served when QUOTES_ASYNC_VIEWS is on.
+
+Under an ASGI worker (uvicorn) these keep the event loop free while a request
+waits on the database: rows are read with the async ORM API, and per-worker
+state that may need the database (sampler load, leaderboard refresh, counter
+flushes) is touched through ``sync_to_async``. Draws from a loaded sampler and buffered counter
+increments stay on the loop. Templates with a ``{% cache %}`` fragment (the popular table) render
+in a worker thread too, since the production cache backend does blocking SQLite I/O; the random
+card has no fragment and renders on the loop. Responses match the sync views in
+``quotes.views``.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+
+from . import health
+from .counters import view_counter, vote_counter
+from .history import recent_quotes, remember_quote
+from .leaderboard import fingerprint, leaderboard
+from .models import Quote
+from .sampling import sampler
+from .services import pick_weighted_quote
+from .views import POPULAR_FRAGMENT_TIMEOUT
+
+
+async def _pick_quote(exclude):
+    strategy = getattr(settings, "QUOTES_SAMPLER_STRATEGY", "index")
+    if strategy != "index":
+        return await sync_to_async(pick_weighted_quote)(strategy, exclude)
+    for _ in range(2):
+        pk = await sampler.adraw(exclude)
+        if pk is None:
+            return None
+        try:
+            return await Quote.objects.aget(pk=pk)
+        # Deleted by another worker since the index was built; reload it and draw again
+        except Quote.DoesNotExist:
+            sampler.invalidate()
+    # Same fallback as services._heaviest_quote
+    best = Quote.objects.order_by("-weight", "-likes")
+    return (await best.exclude(pk__in=exclude).afirst() if exclude else None) or await best.afirst()
+
+
+async def random_quote(request: HttpRequest) -> HttpResponse:
+    recent = recent_quotes(request)
+    quote = await _pick_quote(recent)
+    if not quote:
+        return render(request, "quotes/random.html", {"quote": None})
+    # DB value plus this worker's unflushed views, counted before a flush the add may trigger
+    quote.views += await view_counter.aadd(quote.pk, "views")
+    response = render(request, "quotes/random.html", {"quote": quote})
+    remember_quote(response, recent, quote.pk)
+    return response
+
+
+async def popular_quotes(request: HttpRequest) -> HttpResponse:
+    source = request.GET.get("source")
+    quotes = await sync_to_async(leaderboard.top)(source or None)
+    digest = fingerprint(source or None, quotes)
+    # What @condition does for the sync view; its etag_func cannot await
+    etag = quote_etag(digest)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        context = {
+            "quotes": quotes,
+            "active_source": source,
+            "board_digest": digest,
+            "fragment_timeout": POPULAR_FRAGMENT_TIMEOUT,
+        }
+        # The {% cache %} fragment reads the shared SQLite cache; keep that I/O off the event loop
+        response = await sync_to_async(render)(request, "quotes/popular.html", context)
+    if request.method in ("GET", "HEAD") and not response.has_header("ETag"):
+        response.headers["ETag"] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+async def like_quote(request: HttpRequest, pk: int) -> HttpResponse:
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    await vote_counter.aadd(pk, "likes")
+    return redirect(reverse("quotes:random"))
+
+
+async def dislike_quote(request: HttpRequest, pk: int) -> HttpResponse:
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+    await vote_counter.aadd(pk, "dislikes")
+    return redirect(reverse("quotes:random"))
+
+
+async def _vote_json(request: HttpRequest, pk: int, field: str) -> JsonResponse:
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        counters = await Quote.objects.values("views", "likes", "dislikes").aget(pk=pk)
+    except Quote.DoesNotExist:
+        return JsonResponse({"error": "Quote not found"}, status=404)
+    # Pending increments are read before the add, whose flush may move them into the row read above
+    other = "dislikes" if field == "likes" else "likes"
+    counters["views"] += view_counter.pending(pk, "views")
+    counters[other] += vote_counter.pending(pk, other)
+    counters[field] += await vote_counter.aadd(pk, field)
+    return JsonResponse({"id": pk, **counters})
+
+
+async def like_quote_json(request: HttpRequest, pk: int) -> JsonResponse:
+    return await _vote_json(request, pk, "likes")
+
+
+async def dislike_quote_json(request: HttpRequest, pk: int) -> JsonResponse:
+    return await _vote_json(request, pk, "dislikes")
+
+
+# The probes do no I/O (see quotes.health); async twins spare them the thread hop a sync view costs under ASGI
+async def live_view(request: HttpRequest) -> HttpResponse:
+    return health.live_view(request)
+
+
+async def ready_view(request: HttpRequest) -> HttpResponse:
+    return health.ready_view(request)
@@ -0,0 +1,91 @@
+"""
+Benchmark suites run through ``manage.py benchmark <suite>``.
+
+Every suite runs against a throwaway test database, so the configured
+database is never touched.
+"""
+
+from __future__ import annotations
+
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database():
+    """Create a fresh, migrated test database for the duration of the block."""
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "ops_per_sec": len(samples) / total if total else 0.0,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def _direction(metric: str) -> int:
+    """+1 if a larger value is better, -1 if smaller is better, 0 if the metric is not compared."""
+    if metric in ("ops_per_sec", "throughput_rps"):
+        return 1
+    if metric.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[dict]:
+    """
+    Relative change of every timing metric that ``results`` shares with ``baseline``.
+
+    A row is a regression when the metric got worse by more than ``tolerance``
+    (a fraction, e.g. 0.1 for 10%); rows and metrics missing on either side are skipped.
+    """
+    changes = []
+    for name, row in results.items():
+        for metric, value in row.items():
+            direction = _direction(metric)
+            old = baseline.get(name, {}).get(metric)
+            if not direction or not old:
+                continue
+            change = (value - old) / old
+            changes.append({
+                "name": name,
+                "metric": metric,
+                "baseline": old,
+                "value": value,
+                "change": change,
+                "regression": -direction * change > tolerance,
+            })
+    return changes
@@ -0,0 +1,98 @@
+"""
+Cache backends: LocMemCache vs FileBasedCache vs the shared SQLiteCache.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from ..sqlite_cache import SQLiteCache
+from . import measure
+
+BACKENDS = ("locmem", "filebased", "sqlite")
+VALUE = {"id": 1, "text": "x" * 200, "source": "Benchmark", "likes": 10, "views": 100}
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--ops", type=int, default=5000, help="Operations per single-process measurement")
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct keys in the working set")
+    parser.add_argument("--workers", type=int, default=3, help="Processes in the shared-cache run")
+    parser.add_argument("--worker-ops", type=int, default=5000, help="Operations per process in the shared-cache run")
+
+
+def make_cache(name: str, location: str):
+    params = {"OPTIONS": {"MAX_ENTRIES": 100_000}}
+    if name == "locmem":
+        return LocMemCache(location, params)
+    if name == "filebased":
+        return FileBasedCache(location, params)
+    return SQLiteCache(location, params)
+
+
+def _location(name: str, directory: str) -> str:
+    if name == "filebased":
+        return os.path.join(directory, "filebased")
+    if name == "sqlite":
+        return os.path.join(directory, "cache.sqlite3")
+    return "benchmark"
+
+
+def _worker(name: str, location: str, ops: int, keys: int, seed: int) -> tuple:
+    """Read-mostly traffic from one process: 90% get (set on miss), 10% incr of a shared counter."""
+    cache = make_cache(name, location)
+    rng = random.Random(seed)
+    hits = gets = 0
+    start = time.perf_counter()
+    for _ in range(ops):
+        if rng.random() < 0.1:
+            if not cache.add("counter", 1):
+                cache.incr("counter")
+            continue
+        key = f"quote:{rng.randrange(keys)}"
+        gets += 1
+        if cache.get(key) is None:
+            cache.set(key, VALUE)
+        else:
+            hits += 1
+    return hits, gets, time.perf_counter() - start
+
+
+def run(options) -> dict:
+    results = {}
+    keys = options["keys"]
+    for name in options["backends"]:
+        with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+            location = _location(name, directory)
+            cache = make_cache(name, location)
+            rng = random.Random(1)
+            cache.set_many({f"quote:{i}": VALUE for i in range(keys)})
+            cache.set("counter", 0)
+            results[f"{name}_get_hit"] = measure(lambda: cache.get(f"quote:{rng.randrange(keys)}"), options["ops"])
+            results[f"{name}_get_miss"] = measure(lambda: cache.get(f"missing:{rng.randrange(keys)}"), options["ops"])
+            results[f"{name}_set"] = measure(lambda: cache.set(f"quote:{rng.randrange(keys)}", VALUE), options["ops"])
+            results[f"{name}_incr"] = measure(lambda: cache.incr("counter"), options["ops"])
+
+            # Fresh processes, like gunicorn workers after a recycle: only a shared backend starts warm
+            cache.clear()
+            cache.set_many({f"quote:{i}": VALUE for i in range(keys)})
+            workers = options["workers"]
+            with multiprocessing.get_context("spawn").Pool(workers) as pool:
+                outcomes = pool.starmap(
+                    _worker, [(name, location, options["worker_ops"], keys, seed) for seed in range(workers)]
+                )
+            hits = sum(outcome[0] for outcome in outcomes)
+            gets = sum(outcome[1] for outcome in outcomes)
+            results[f"{name}_shared"] = {
+                "workers": workers,
+                "hit_rate": hits / gets if gets else 0.0,
+                "ops_per_sec": workers * options["worker_ops"] / max(outcome[2] for outcome in outcomes),
+            }
+    return results
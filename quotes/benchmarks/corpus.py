@@ -0,0 +1,93 @@
+"""
+Synthetic quote corpus for benchmarks.
+"""
+
+from __future__ import annotations
+
+import itertools
+import random
+
+from typing import Callable, Iterator, List, Optional
+
+from django.db import connection, transaction
+
+from ..models import Quote, Source, content_hash_for
+
+
+WORDS = (
+    "love", "life", "time", "truth", "courage", "fear", "hope", "light", "dark", "river", "mountain", "silence",
+    "journey", "home", "friend", "war", "peace", "memory", "dream", "heart", "world", "night", "morning", "road",
+    "storm", "fire", "water", "stone", "king", "child", "freedom", "wisdom", "fortune", "destiny", "shadow", "star",
+)
+
+
+# Largest weight and counter values a skewed corpus draws
+MAX_SKEWED_WEIGHT = 100
+MAX_SKEWED_COUNTER = 10_000
+
+
+def zipf_cum_weights(n: int, skew: float) -> List[float]:
+    """Cumulative weights for choosing among ``n`` ranks, the k-th with probability proportional to 1 / k ** skew."""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+
+def sentence(i: int, rng: random.Random, length: int = 12) -> str:
+    """A random sentence over ``WORDS``, unique through its number."""
+    return f"{' '.join(rng.choice(WORDS) for _ in range(length)).capitalize()} ({i})"
+
+
+def generate(
+    count: int,
+    batch_size: int = 5000,
+    seed: int = 42,
+    text: Optional[Callable[[int, random.Random], str]] = None,
+    skew: float = 0.0,
+) -> None:
+    """
+    Bulk insert ``count`` quotes.
+
+    By default every source has three quotes, weights are uniform in 1..10
+    and counters start at zero. A positive ``skew`` is the Zipf exponent of a
+    production-like corpus instead: most quotes weigh 1 with a long tail up to
+    ``MAX_SKEWED_WEIGHT``, most sources have a single quote, and views and
+    likes are heavy-tailed, so a few quotes dominate the leaderboard.
+    """
+    rng = random.Random(seed)
+    text = text or (lambda i, rng: f"Benchmark quote number {i}")
+    if skew:
+        weights = zipf_cum_weights(MAX_SKEWED_WEIGHT, skew)
+        source_sizes = zipf_cum_weights(3, skew)
+        counters = zipf_cum_weights(MAX_SKEWED_COUNTER + 1, skew)
+    sources = _source_names(rng, source_sizes if skew else None)
+    with transaction.atomic():
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count)
+            quotes = []
+            for i in range(start, stop):
+                body, source = text(i, rng), next(sources)
+                quote = Quote(text=body, source=source, content_hash=content_hash_for(body, source))
+                if skew:
+                    quote.weight = rng.choices(range(1, MAX_SKEWED_WEIGHT + 1), cum_weights=weights)[0]
+                    quote.likes, views = rng.choices(range(MAX_SKEWED_COUNTER + 1), cum_weights=counters, k=2)
+                    quote.views = views + quote.likes
+                    quote.dislikes = quote.likes // 10
+                else:
+                    quote.weight = rng.randint(1, 10)
+                quotes.append(quote)
+            Quote.objects.bulk_create(quotes, batch_size=batch_size)
+        # bulk_create bypasses Quote.save(), so recount the sources it touched
+        Source.sync()
+
+
+def _source_names(rng: random.Random, size_weights: Optional[List[float]]) -> Iterator[str]:
+    """Endless source names, three quotes per source or 1..3 drawn from ``size_weights``."""
+    for number in itertools.count():
+        size = rng.choices((1, 2, 3), cum_weights=size_weights)[0] if size_weights else 3
+        for _ in range(size):
+            yield f"Source {number}"
+
+
+def clear() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {Quote._meta.db_table}")
+        cursor.execute(f"DELETE FROM {Source._meta.db_table}")
@@ -0,0 +1,288 @@
+"""
+HTTP load against a local gunicorn with a realistic request mix: sync WSGI workers vs uvicorn workers with async views.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from django.conf import settings
+
+from . import corpus, summarize
+
+# mode -> (application, worker class, QUOTES_ASYNC_VIEWS)
+MODES = {
+    "sync": ("config.wsgi:application", "sync", "false"),
+    "async": ("config.asgi:application", "uvicorn_worker.UvicornWorker", "true"),
+}
+# Production settings with the databases moved into the benchmark's directory
+SETTINGS_MODULE = """
+from config.settings_production import *
+
+ALLOWED_HOSTS = ["*"]
+for _alias in DATABASES:
+    DATABASES[_alias]["NAME"] = {database!r}
+"""
+REQUEST_TIMEOUT = 30.0
+# Endpoint -> share of requests: mostly reads, a trickle of votes and submissions
+MIX = {"random": 70, "popular": 15, "like": 8, "dislike": 4, "add": 3}
+# Form posts that redirect on success; anything else (e.g. the add form re-rendered with errors) is an error
+REDIRECTS = ("like", "dislike", "add")
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000], help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--size", type=int, default=10_000, help="Quotes in the benchmark database")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the corpus and of voted quotes")
+    parser.add_argument(
+        "--mix", nargs="+", type=_share, default=list(MIX.items()), metavar="ENDPOINT=SHARE",
+        help=f"Request mix over {', '.join(MIX)} (default: {' '.join(f'{k}={v}' for k, v in MIX.items())})",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def _share(value: str) -> Tuple[str, int]:
+    endpoint, _, share = value.partition("=")
+    if endpoint not in MIX or not share.isdigit():
+        raise argparse.ArgumentTypeError(f"expected ENDPOINT=SHARE with ENDPOINT in {', '.join(MIX)}")
+    return endpoint, int(share)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Site:
+    """A throwaway project directory: settings module, migrated SQLite file with a corpus."""
+
+    def __init__(self, directory: str, size: int, skew: float) -> None:
+        self.directory = Path(directory)
+        self.database = self.directory / "db.sqlite3"
+        (self.directory / "bench_settings.py").write_text(SETTINGS_MODULE.format(database=str(self.database)))
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([str(self.directory), str(settings.BASE_DIR), os.environ.get("PYTHONPATH", "")]),
+            "DJANGO_SETTINGS_MODULE": "bench_settings",
+            "QUOTES_CACHE_PATH": str(self.directory / "cache.sqlite3"),
+            "QUOTES_COUNTERS_JOURNAL_DIR": str(self.directory / "counters"),
+            "QUOTES_METRICS_DIR": str(self.directory / "metrics"),
+            "SECURE_SSL_REDIRECT": "False",
+        }
+        self.manage("migrate", "--noinput", "-v", "0")
+        self.manage(
+            "shell", "-c",
+            f"from quotes.benchmarks import corpus; corpus.generate({size}, text=corpus.sentence, skew={skew!r})",
+        )
+
+    def manage(self, *args: str) -> None:
+        subprocess.run([sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), *args], env=self.env, check=True)
+
+    @contextmanager
+    def serve(self, mode: str, workers: int, extra: Sequence[str] = (), env: Dict[str, str] = None) -> Iterator[int]:
+        """Run gunicorn in ``mode`` (plus ``extra`` arguments and ``env``) and yield its port once it answers."""
+        app, worker_class, async_views = MODES[mode]
+        port = _free_port()
+        log = open(self.directory / f"gunicorn-{mode}.log", "w")
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", app,
+                "--config", str(Path(settings.BASE_DIR) / "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(workers),
+                "--pid", str(self.directory / f"gunicorn-{mode}.pid"),
+                "--access-logfile", "/dev/null",
+                "--error-logfile", "-",
+                *extra,
+            ],
+            cwd=settings.BASE_DIR,
+            env={**self.env, "GUNICORN_WORKER_CLASS": worker_class, "QUOTES_ASYNC_VIEWS": async_views, **(env or {})},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            _wait_until_up(port, process)
+            yield port
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+
+def _wait_until_up(port: int, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}; see its log in the benchmark directory")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/quotes/", timeout=5).read()
+            return
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple:
+    """Read one response; return (status, keep-alive)."""
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(head[0].split()[1])
+    headers = {}
+    for line in head[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get("connection") != "close"
+
+
+class Workload:
+    """Raw HTTP/1.1 requests for a weighted endpoint mix over a corpus of ``size`` quotes."""
+
+    def __init__(self, mix: Dict[str, int], size: int, skew: float, seed: int) -> None:
+        self.endpoints = [endpoint for endpoint, share in mix.items() if share]
+        self.shares = list(itertools.accumulate(mix[endpoint] for endpoint in self.endpoints))
+        self.size = size
+        # Votes concentrate on a few quotes the way views do
+        self.ranks = corpus.zipf_cum_weights(size, skew) if skew else None
+        # Double-submit CSRF: a client may pick its own secret as long as cookie and header agree
+        rng = random.Random(seed)
+        self.csrf = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(32))
+        # Numbers new quotes across every run against the same database, so each add is accepted
+        self.added = itertools.count()
+
+    def quote_id(self, rng: random.Random) -> int:
+        if self.ranks is None:
+            return rng.randint(1, self.size)
+        return bisect.bisect(self.ranks, rng.random() * self.ranks[-1]) + 1
+
+    def request(self, rng: random.Random) -> Tuple[str, bytes]:
+        endpoint = rng.choices(self.endpoints, cum_weights=self.shares)[0]
+        if endpoint == "random":
+            return endpoint, self._get("/quotes/")
+        if endpoint == "popular":
+            return endpoint, self._get("/quotes/popular/")
+        if endpoint in ("like", "dislike"):
+            return endpoint, self._post(f"/quotes/{endpoint}/{self.quote_id(rng)}/", {})
+        n = next(self.added)
+        form = {"text": f"Load test quote number {n}", "source": f"Load test source {n}", "weight": rng.randint(1, 10)}
+        return endpoint, self._post("/quotes/add/", form)
+
+    def _get(self, path: str) -> bytes:
+        return f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+    def _post(self, path: str, form: dict) -> bytes:
+        body = urllib.parse.urlencode(form)
+        return (
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Cookie: {settings.CSRF_COOKIE_NAME}={self.csrf}\r\nX-CSRFToken: {self.csrf}\r\n"
+            f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n\r\n{body}"
+        ).encode()
+
+
+async def _client(port: int, workload: Workload, deadline: float, latencies: Dict[str, List[float]],
+                  errors: Counter, rng: random.Random) -> None:
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        endpoint, request = workload.request(rng)
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), REQUEST_TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+            errors[type(e).__name__] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+            continue
+        latencies[endpoint].append(time.perf_counter() - start)
+        if status >= 400:
+            errors[f"http_{status}"] += 1
+        elif endpoint in REDIRECTS and status != 302:
+            errors[f"{endpoint}_{status}"] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def load(port: int, workload: Workload, concurrency: int, duration: float, seed: int = 7) -> Dict[str, dict]:
+    """
+    Drive ``concurrency`` keep-alive clients for ``duration`` seconds.
+
+    Returns latency and throughput for all requests under ``"all"`` and for each endpoint of the mix.
+    """
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+
+    async def main() -> None:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _client(port, workload, deadline, latencies, errors, random.Random(seed + i)) for i in range(concurrency)
+        ))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    rows = {"all": _row(list(itertools.chain.from_iterable(latencies.values())), elapsed)}
+    rows["all"]["errors"] = sum(errors.values())
+    rows["all"].update({f"errors_{name}": count for name, count in sorted(errors.items())})
+    rows.update({endpoint: _row(latencies[endpoint], elapsed) for endpoint in workload.endpoints})
+    return rows
+
+
+def _row(samples: List[float], elapsed: float) -> Dict[str, float]:
+    row = {key: value for key, value in summarize(samples).items() if key != "ops_per_sec"}
+    row["throughput_rps"] = len(samples) / elapsed if elapsed else 0.0
+    return row
+
+
+def run(options) -> dict:
+    results = {}
+    workload = Workload(dict(options["mix"]), options["size"], options["skew"], options["seed"])
+    with tempfile.TemporaryDirectory() as directory:
+        site = Site(directory, options["size"], options["skew"])
+        for mode in options["modes"]:
+            with site.serve(mode, options["workers"]) as port:
+                load(port, workload, 10, 1.0)  # warm up every worker's sampler and leaderboard
+                for concurrency in options["concurrency"]:
+                    rows = load(port, workload, concurrency, options["duration"], options["seed"])
+                    results[f"{mode}@{concurrency}"] = rows.pop("all")
+                    results.update({f"{mode}@{concurrency}/{endpoint}": row for endpoint, row in rows.items()})
+    return results
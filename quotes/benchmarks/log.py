@@ -0,0 +1,117 @@
+"""
+Logging latency seen by request threads: rotating file handlers called directly vs the queued pipeline.
+"""
+
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+from ..log import JSONFormatter, QueueHandler
+from . import summarize
+
+MODES = ("direct", "queue-drop", "queue-block")
+APP_LOGGER = "quotes.benchmarks.app"
+SINK_LOGGER = "quotes.benchmarks.sink"
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent request threads")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per thread")
+    parser.add_argument("--lines", type=int, default=3, help="Log lines per request")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument(
+        "--write-delay", type=float, default=0.0,
+        help="Extra milliseconds per file write, to model a slow or contended disk",
+    )
+
+
+class SlowRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    delay_seconds = 0.0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        super().emit(record)
+
+
+def _sink_handlers(directory: Path, delay: float) -> List[logging.Handler]:
+    """The production handler set: two rotating files (one ERROR-only) and a JSON stream."""
+    verbose = logging.Formatter("{levelname} {asctime} {module} {process:d} {thread:d} {message}", style="{")
+    handlers = []
+    for name, level in (("django.log", logging.INFO), ("error.log", logging.ERROR)):
+        handler = SlowRotatingFileHandler(directory / name, maxBytes=1024 * 1024, backupCount=3)
+        handler.delay_seconds = delay
+        handler.setLevel(level)
+        handler.setFormatter(verbose)
+        handlers.append(handler)
+    console = logging.StreamHandler(open(directory / "console.log", "w"))
+    console.setFormatter(JSONFormatter())
+    handlers.append(console)
+    return handlers
+
+
+def _configure(mode: str, directory: Path, options) -> tuple:
+    app, sink = logging.getLogger(APP_LOGGER), logging.getLogger(SINK_LOGGER)
+    for logger in (app, sink):
+        logger.handlers.clear()
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    targets = _sink_handlers(directory, options["write_delay"] / 1000)
+    if mode == "direct":
+        for handler in targets:
+            app.addHandler(handler)
+        return app, None, targets
+    for handler in targets:
+        sink.addHandler(handler)
+    queued = QueueHandler(SINK_LOGGER, maxsize=options["queue_size"], policy=mode.split("-")[1])
+    app.addHandler(queued)
+    return app, queued, targets
+
+
+def run(options) -> dict:
+    results = {}
+    for mode in options["modes"]:
+        with tempfile.TemporaryDirectory() as directory:
+            app, queued, targets = _configure(mode, Path(directory), options)
+            samples: List[float] = []
+            lock = threading.Lock()
+
+            def worker(number: int) -> None:
+                timings = []
+                for i in range(options["requests"]):
+                    start = time.perf_counter()
+                    for line in range(options["lines"]):
+                        app.info("GET /quotes/ request %d of thread %d line %d", i, number, line)
+                    if i % 100 == 0:
+                        app.error("Request %d of thread %d failed", i, number)
+                    timings.append(time.perf_counter() - start)
+                with lock:
+                    samples.extend(timings)
+
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["threads"])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            row = summarize(samples)
+            row["wall_s"] = elapsed
+            if queued is not None:
+                row["dropped"] = queued.dropped
+                drain = time.perf_counter()
+                queued.close()
+                row["drain_ms"] = (time.perf_counter() - drain) * 1000
+            for handler in targets:
+                handler.close()
+            app.handlers.clear()
+            logging.getLogger(SINK_LOGGER).handlers.clear()
+            results[mode] = row
+    return results
@@ -0,0 +1,65 @@
+"""
+Hot-path micro-benchmarks on a skewed corpus: weighted pick, QuoteForm validation and page rendering.
+"""
+
+from __future__ import annotations
+
+import itertools
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from ..forms import QuoteForm
+from ..leaderboard import fingerprint, leaderboard
+from ..models import MAX_QUOTES_PER_SOURCE, Quote, Source
+from ..sampling import sampler
+from ..services import pick_weighted_quote
+from ..views import POPULAR_FRAGMENT_TIMEOUT
+from . import corpus, measure
+
+# Distinct weighted picks the random page render cycles through
+RENDERED_QUOTES = 200
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000], help="Corpus sizes (1k to 1M)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of weights, sources and counters")
+    parser.add_argument("--repeat", type=int, default=1000, help="Calls per benchmark and size")
+
+
+def run(options) -> dict:
+    request = RequestFactory().get("/")
+    repeat = options["repeat"]
+    results = {}
+    for size in options["sizes"]:
+        corpus.clear()
+        corpus.generate(size, text=corpus.sentence, skew=options["skew"])
+        sampler.invalidate()
+        leaderboard.invalidate()
+
+        sampler.load()
+        results[f"pick_weighted_quote@{size}"] = measure(pick_weighted_quote, repeat)
+
+        # The three outcomes of an add: accepted, duplicate, and a source that already has its maximum
+        new = ({"text": f"A new benchmark quote {n}", "source": f"New source {n}", "weight": 3} for n in itertools.count())
+        results[f"form_valid@{size}"] = measure(lambda: QuoteForm(next(new)).is_valid(), repeat)
+        existing = Quote.objects.order_by("pk").first()
+        duplicate = {"text": existing.text, "source": existing.source, "weight": existing.weight}
+        results[f"form_duplicate@{size}"] = measure(lambda: QuoteForm(duplicate).is_valid(), repeat)
+        full = Source.objects.filter(quote_count__gte=MAX_QUOTES_PER_SOURCE).values_list("name", flat=True).first()
+        if full:
+            over = {"text": "One quote too many", "source": full, "weight": 1}
+            results[f"form_full_source@{size}"] = measure(lambda: QuoteForm(over).is_valid(), repeat)
+
+        picks = itertools.cycle([pick_weighted_quote() for _ in range(RENDERED_QUOTES)])
+        results[f"render_random@{size}"] = measure(
+            lambda: render_to_string("quotes/random.html", {"quote": next(picks)}, request), repeat
+        )
+        board = leaderboard.top()
+        popular = {"quotes": board, "board_digest": fingerprint(None, board), "fragment_timeout": POPULAR_FRAGMENT_TIMEOUT}
+        results[f"render_popular@{size}"] = measure(
+            lambda: render_to_string("quotes/popular.html", popular, request), repeat
+        )
+    sampler.invalidate()
+    leaderboard.invalidate()
+    return results
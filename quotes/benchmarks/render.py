@@ -0,0 +1,71 @@
+"""
+Template rendering time for the popular table (and the random card, which has no fragment, as a control):
+no fragment caching, fragments in LocMemCache, and fragments in the shared SQLite cache production uses.
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from ..leaderboard import fingerprint, leaderboard
+from ..models import Quote
+from ..views import POPULAR_FRAGMENT_TIMEOUT
+from . import corpus, measure
+
+# The {% cache %} tag uses this alias when it exists; a dummy backend turns fragment caching off
+UNCACHED = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "template_fragments": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+MODES = ("uncached", "locmem", "sqlite")
+
+
+def _caches(mode: str, directory: str) -> dict:
+    if mode == "uncached":
+        return UNCACHED
+    if mode == "locmem":
+        return LOCMEM
+    return {
+        "default": {"BACKEND": "quotes.sqlite_cache.SQLiteCache", "LOCATION": str(Path(directory) / "cache.sqlite3")},
+    }
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--renders", type=int, default=2000, help="Renders per template and mode")
+    parser.add_argument("--hot", type=int, default=200, help="Distinct quotes the random page cycles through")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+
+
+def run(options) -> dict:
+    corpus.clear()
+    corpus.generate(options["size"], text=corpus.sentence)
+    leaderboard.invalidate()
+    request = RequestFactory().get("/")
+    rng = random.Random(11)
+    quotes = list(Quote.objects.filter(pk__in=rng.sample(range(1, options["size"] + 1), options["hot"])))
+    board = leaderboard.top()
+    popular = {
+        "quotes": board,
+        "board_digest": fingerprint(None, board),
+        "fragment_timeout": POPULAR_FRAGMENT_TIMEOUT,
+    }
+
+    results = {}
+    for mode in options["modes"]:
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=_caches(mode, directory)):
+            picks = iter(rng.choices(quotes, k=options["renders"]))
+            results[f"random_card_{mode}"] = measure(
+                lambda: render_to_string("quotes/random.html", {"quote": next(picks)}, request),
+                options["renders"],
+            )
+            results[f"popular_table_{mode}"] = measure(
+                lambda: render_to_string("quotes/popular.html", popular, request), options["renders"]
+            )
+    return results
@@ -0,0 +1,45 @@
+"""
+pick_weighted_quote strategies at increasing corpus sizes.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+
+from ..sampling import sampler
+from ..services import SAMPLER_STRATEGIES, pick_weighted_quote
+from . import corpus, measure
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--draws", type=int, default=200, help="Draws per strategy and size")
+    parser.add_argument("--strategies", nargs="+", choices=SAMPLER_STRATEGIES, default=list(SAMPLER_STRATEGIES))
+    parser.add_argument(
+        "--recent", type=int, nargs="+", default=[5, 50],
+        help="History sizes for no-repeat draws from the index (ids excluded per draw)",
+    )
+
+
+def run(options) -> dict:
+    results = {}
+    for size in options["sizes"]:
+        corpus.clear()
+        corpus.generate(size)
+        for strategy in options["strategies"]:
+            row = {}
+            if strategy == "index":
+                start = time.perf_counter()
+                sampler.load()
+                row["load_ms"] = (time.perf_counter() - start) * 1000
+            row.update(measure(lambda: pick_weighted_quote(strategy), options["draws"]))
+            results[f"{strategy}@{size}"] = row
+            if strategy == "index":
+                for recent in options["recent"]:
+                    exclude = random.Random(recent).sample(range(1, size + 1), min(recent, size))
+                    results[f"index-recent{recent}@{size}"] = measure(
+                        lambda: pick_weighted_quote(strategy, exclude=exclude), options["draws"]
+                    )
+    sampler.invalidate()
+    return results
@@ -0,0 +1,52 @@
+"""
+Search latency: LIKE '%term%' over text and source vs the FTS5 index.
+"""
+
+from __future__ import annotations
+
+import random
+
+from django.db.models import Q
+
+from ..models import Quote
+from ..search import SearchResults, fts_available
+from . import corpus, measure
+
+PAGE_SIZE = 20
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--queries", type=int, default=100, help="Searches per method and size")
+
+
+def _like_page(term: str) -> None:
+    qs = Quote.objects.filter(Q(text__icontains=term) | Q(source__icontains=term))
+    qs.count()
+    list(qs.order_by("-likes", "-id")[:PAGE_SIZE])
+
+
+def _fts_page(term: str) -> None:
+    results = SearchResults(term)
+    results.count()
+    results[:PAGE_SIZE]
+
+
+def run(options) -> dict:
+    if not fts_available():
+        raise RuntimeError("The search benchmark needs SQLite with FTS5")
+    results = {}
+    for size in options["sizes"]:
+        corpus.clear()
+        corpus.generate(size, text=corpus.sentence)
+        rng = random.Random(5)
+        # Single words, two-word queries and a rare source name
+        terms = [rng.choice(corpus.WORDS) for _ in range(options["queries"])]
+        pairs = [f"{rng.choice(corpus.WORDS)} {rng.choice(corpus.WORDS)}" for _ in range(options["queries"])]
+        for method, page in (("like", _like_page), ("fts", _fts_page)):
+            for kind, queries in (("word", terms), ("source", [f"Source {size // 2}"] * options["queries"])):
+                it = iter(queries)
+                results[f"{method}_{kind}@{size}"] = measure(lambda: page(next(it)), len(queries))
+        it = iter(pairs)
+        results[f"fts_two_words@{size}"] = measure(lambda: _fts_page(next(it)), len(pairs))
+    return results
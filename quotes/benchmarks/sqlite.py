@@ -0,0 +1,146 @@
+"""
+Reader latency and "database is locked" errors under concurrent counter writes: SQLite defaults vs production tuning.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from . import summarize
+
+# Connection setup per configuration: (pragmas, write BEGIN statement, reader pragmas)
+CONFIGS = {
+    # What Django gives out of the box: rollback journal, synchronous=FULL, deferred transactions
+    "default": ((), "BEGIN", ()),
+    # settings_production: WAL + pragmas, BEGIN IMMEDIATE for writers, query-only reader connections
+    "tuned": (
+        (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA mmap_size=268435456",
+            "PRAGMA cache_size=-65536",
+            "PRAGMA temp_store=MEMORY",
+        ),
+        "BEGIN IMMEDIATE",
+        ("PRAGMA query_only=ON",),
+    ),
+}
+SCHEMA = (
+    "CREATE TABLE quote (id INTEGER PRIMARY KEY, text TEXT, source TEXT, weight INT, views INT, likes INT, "
+    "created_at REAL)",
+    "CREATE INDEX quote_popular_idx ON quote (likes, views, created_at)",
+)
+READS = (
+    "SELECT id, text, source, weight, views, likes FROM quote WHERE id = ?",
+    "SELECT id, text, source, likes, views FROM quote ORDER BY likes DESC, views DESC, created_at DESC, id DESC LIMIT 10",
+)
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per configuration")
+    parser.add_argument("--timeout", type=float, default=5.0, help="busy timeout in seconds (Python's default is 5)")
+    parser.add_argument("--batch", type=int, default=100, help="Rows updated per write transaction, like a counter flush")
+
+
+def _connect(path: str, pragmas, timeout: float) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def _locked(error: sqlite3.OperationalError) -> bool:
+    return "locked" in str(error) or "busy" in str(error)
+
+
+def _writer(path: str, config: str, timeout: float, rows: int, batch: int, deadline: float, seed: int) -> tuple:
+    pragmas, begin, _ = CONFIGS[config]
+    conn = _connect(path, pragmas, timeout)
+    rng = random.Random(seed)
+    commits = errors = 0
+    while time.time() < deadline:
+        ids = [rng.randint(1, rows) for _ in range(batch)]
+        try:
+            conn.execute(begin)
+            conn.executemany("UPDATE quote SET views = views + 1, likes = likes + ? WHERE id = ?",
+                             [(rng.random() < 0.2, pk) for pk in ids])
+            conn.execute("COMMIT")
+            commits += 1
+        except sqlite3.OperationalError as e:
+            if not _locked(e):
+                raise
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        time.sleep(0.005)  # flusher cadence: writes arrive in bursts, not back to back
+    return commits, errors
+
+
+def _reader(path: str, config: str, timeout: float, rows: int, deadline: float, seed: int) -> tuple:
+    pragmas, _, reader_pragmas = CONFIGS[config]
+    conn = _connect(path, (*pragmas, *reader_pragmas), timeout)
+    rng = random.Random(seed)
+    samples, errors = [], 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.execute(READS[0], (rng.randint(1, rows),)).fetchall()
+            conn.execute(READS[1]).fetchall()
+        except sqlite3.OperationalError as e:
+            if not _locked(e):
+                raise
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - start)
+    return samples, errors
+
+
+def _populate(path: str, config: str, rows: int) -> None:
+    conn = _connect(path, CONFIGS[config][0], 5.0)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    rng = random.Random(1)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO quote (id, text, source, weight, views, likes, created_at) VALUES (?, ?, ?, ?, 0, 0, ?)",
+        ((i, f"Benchmark quote number {i}", f"Source {i // 3}", rng.randint(1, 10), time.time()) for i in range(1, rows + 1)),
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def run(options) -> dict:
+    results = {}
+    for config in options["configs"]:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            _populate(path, config, options["rows"])
+            deadline = time.time() + 1.0 + options["duration"]  # 1s head start for spawning
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(options["readers"] + options["writers"]) as pool:
+                writers = [
+                    pool.apply_async(_writer, (path, config, options["timeout"], options["rows"], options["batch"], deadline, i))
+                    for i in range(options["writers"])
+                ]
+                readers = [
+                    pool.apply_async(_reader, (path, config, options["timeout"], options["rows"], deadline, 100 + i))
+                    for i in range(options["readers"])
+                ]
+                writer_results = [w.get() for w in writers]
+                reader_results = [r.get() for r in readers]
+            samples = [s for r in reader_results for s in r[0]]
+            row = {f"read_{key}": value for key, value in summarize(samples).items()}
+            row["read_locked_errors"] = sum(r[1] for r in reader_results)
+            row["write_commits"] = sum(w[0] for w in writer_results)
+            row["write_locked_errors"] = sum(w[1] for w in writer_results)
+            results[config] = row
+    return results
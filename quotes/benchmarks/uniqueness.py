@@ -0,0 +1,89 @@
+"""
+Index size, insert and duplicate-check latency: UNIQUE(text, source) vs UNIQUE(content_hash).
+"""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+import time
+
+from ..models import content_hash_for
+from . import measure
+
+SCHEMAS = {
+    "raw_text": (
+        "CREATE TABLE quote (id INTEGER PRIMARY KEY, text TEXT NOT NULL, source VARCHAR(255) NOT NULL)",
+        "CREATE UNIQUE INDEX uniq ON quote (text, source)",
+        "INSERT INTO quote (text, source) VALUES (?, ?)",
+        "SELECT 1 FROM quote WHERE text = ? AND source = ? LIMIT 1",
+    ),
+    "content_hash": (
+        "CREATE TABLE quote (id INTEGER PRIMARY KEY, text TEXT NOT NULL, source VARCHAR(255) NOT NULL, "
+        "content_hash VARCHAR(40) NOT NULL)",
+        "CREATE UNIQUE INDEX uniq ON quote (content_hash)",
+        "INSERT INTO quote (text, source, content_hash) VALUES (?, ?, ?)",
+        "SELECT 1 FROM quote WHERE content_hash = ? LIMIT 1",
+    ),
+}
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--text-length", type=int, default=400, help="Characters per quote")
+    parser.add_argument("--lookups", type=int, default=2000)
+
+
+def _rows(count: int, length: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = ["wisdom", "courage", "light", "patience", "journey", "silence", "truth", "river", "mountain", "time"]
+    for i in range(count):
+        text = f"{i} " + " ".join(rng.choice(words) for _ in range(length // 7))
+        yield text[:length], f"Source {i // 3}"
+
+
+def _pages(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def run(options) -> dict:
+    results = {}
+    rows = list(_rows(options["rows"], options["text_length"]))
+    for name, (create_table, create_index, insert, lookup) in SCHEMAS.items():
+        conn = sqlite3.connect(":memory:")
+        conn.execute(create_table)
+
+        def params(text, source):
+            return (text, source) if name == "raw_text" else (text, source, content_hash_for(text, source))
+
+        # Index size: database growth when the index is built over the loaded table
+        conn.executemany(insert, (params(text, source) for text, source in rows))
+        before = _pages(conn)
+        conn.execute(create_index)
+        index_bytes = _pages(conn) - before
+
+        # Insert latency with the index in place, one transaction per row like Quote.save()
+        conn.execute("DELETE FROM quote")
+        extra = list(_rows(options["lookups"], options["text_length"], seed=11))
+        extra = [(f"new {text}", source) for text, source in extra]
+        it = iter(extra)
+
+        def insert_one():
+            with conn:
+                conn.execute(insert, params(*next(it)))
+
+        conn.executemany(insert, (params(text, source) for text, source in rows))
+        conn.commit()
+        row = {"index_bytes": index_bytes}
+        row.update({f"insert_{k}": v for k, v in measure(insert_one, len(extra)).items()})
+
+        probes = iter(random.Random(3).choices(rows, k=options["lookups"]))
+
+        def lookup_one():
+            text, source = next(probes)
+            conn.execute(lookup, (text, source) if name == "raw_text" else (content_hash_for(text, source),)).fetchone()
+
+        row.update({f"lookup_{k}": v for k, v in measure(lookup_one, options["lookups"]).items()})
+        results[name] = row
+        conn.close()
+    return results
@@ -0,0 +1,341 @@
+"""
+Write-behind buffers for Quote counter columns.
+
+Increments are coalesced in memory per worker and applied as one batched
+``UPDATE ... SET col = col + CASE id WHEN ... END`` when the buffer holds
+``MAX_PENDING`` increments or ``FLUSH_INTERVAL`` seconds have passed since
+the last flush. ``QUOTES_COUNTERS["DURABILITY"]`` picks what survives a crash:
+
+``memory``
+    Pending increments live only in the worker; a crash loses at most one
+    buffer's worth.
+``journal``
+    Every increment is first appended to a per-worker journal segment in
+    ``JOURNAL_DIR`` (fsync'd when ``FSYNC`` is set). Segments are removed after
+    the flush that covers them commits, and segments left behind by a dead
+    worker are replayed by the next worker that touches the buffer. A worker
+    holds an ``flock`` on its owner lock file for as long as it lives, and
+    file names carry a random owner token rather than the bare PID, so a PID
+    reused after a container restart cannot hide a dead worker's journal. A
+    crash between commit and removal replays the segment again, so increments
+    are applied at least once.
+``immediate``
+    Write-through: every increment is flushed before ``add`` returns.
+"""
+
+from __future__ import annotations
+
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "DURABILITY": "memory",
+    "MAX_PENDING": 100,
+    "FLUSH_INTERVAL": 5.0,
+    "JOURNAL_DIR": None,
+    "FSYNC": False,
+}
+# Rows per UPDATE statement; keeps the CASE expression and IN list under SQLite's variable limit.
+BATCH_SIZE = 400
+
+_buffers: List["CounterBuffer"] = []
+
+
+def counter_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_COUNTERS", {})}
+
+
+class CounterBuffer:
+    """Per-worker accumulator of ``(quote id, field) -> delta`` increments."""
+
+    def __init__(self, name: str, fields: Iterable[str]) -> None:
+        self.name = name
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self._reset()
+        _buffers.append(self)
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        # Names this worker's journal files; unlike the PID it is never reused
+        self._owner = f"{self._pid}_{secrets.token_hex(4)}"
+        # A descriptor inherited through fork must not keep the parent's lock alive after the parent dies
+        if getattr(self, "_owner_lock", None) is not None:
+            self._owner_lock.close()
+        self._owner_lock: Optional[TextIO] = None
+        # Serializes flushes, so one never removes a segment another is still applying
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, Dict[int, int]] = {field: defaultdict(int) for field in self.fields}
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._segment = 0
+        self._journal = None
+        self._recovered = False
+
+    def _check_process(self) -> None:
+        # State inherited across fork (gunicorn preload_app) belongs to the parent.
+        if self._pid != os.getpid():
+            self._lock = threading.RLock()
+            self._reset()
+
+    # Journal ----------------------------------------------------------------
+
+    def _journal_dir(self) -> Path:
+        directory = counter_settings()["JOURNAL_DIR"] or Path(settings.BASE_DIR) / "var" / "counters"
+        return Path(directory)
+
+    def _segment_path(self, owner: str, segment: int) -> Path:
+        return self._journal_dir() / f"{self.name}-{owner}-{segment:08d}.log"
+
+    def _owner_lock_path(self, owner: str) -> Path:
+        return self._journal_dir() / f"{self.name}-{owner}.lock"
+
+    def _lock_owner(self) -> None:
+        """Hold this worker's owner lock; the kernel releases it when the process dies, however it dies."""
+        if self._owner_lock is None:
+            self._journal_dir().mkdir(parents=True, exist_ok=True)
+            self._owner_lock = open(self._owner_lock_path(self._owner), "a")
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX)
+
+    def _claim_owner(self, owner: str) -> Optional[TextIO]:
+        """Take the lock of a dead owner, or return None while its worker is still running."""
+        lock = open(self._owner_lock_path(owner), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    def _write_journal(self, pk: int, field: str, amount: int) -> None:
+        if self._journal is None:
+            self._lock_owner()
+            self._journal = open(self._segment_path(self._owner, self._segment), "a")
+        self._journal.write(f"{pk} {field} {amount}\n")
+        self._journal.flush()
+        if counter_settings()["FSYNC"]:
+            os.fsync(self._journal.fileno())
+
+    def _close_segment(self) -> int:
+        """Seal the current journal segment and return its number."""
+        segment = self._segment
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._segment += 1
+        return segment
+
+    def _remove_segments(self, upto: int) -> None:
+        for path in glob.glob(str(self._journal_dir() / f"{self.name}-{self._owner}-*.log")):
+            if int(path.rsplit("-", 1)[1][:-4]) <= upto:
+                os.unlink(path)
+
+    def recover(self) -> int:
+        """Replay journal segments left behind by dead workers; return increments applied."""
+        self._recovered = True
+        self._lock_owner()  # our own replay files must not look abandoned
+        recovered = 0
+        directory = self._journal_dir()
+        orphans: Dict[str, List[str]] = defaultdict(list)
+        for path in glob.glob(str(directory / f"{self.name}-*-*.log")):
+            orphans[Path(path).name[len(self.name) + 1:].split("-")[0]].append(path)
+        # Segments claimed by a worker that died while replaying them
+        for path in glob.glob(str(directory / f"{self.name}-*.replay")):
+            orphans[path.rsplit(".", 2)[1]].append(path)
+        for owner, paths in sorted(orphans.items()):
+            if owner == self._owner:
+                continue
+            lock = self._claim_owner(owner)
+            if lock is None:
+                continue  # still running
+            try:
+                for path in sorted(paths):
+                    recovered += self._replay(path)
+                self._owner_lock_path(owner).unlink(missing_ok=True)
+            finally:
+                lock.close()
+        if recovered:
+            logger.info("Recovered %s %s increments from dead workers", recovered, self.name)
+        return recovered
+
+    def _replay(self, path: str) -> int:
+        base = path.rsplit(".", 2)[0] if path.endswith(".replay") else path
+        claimed = f"{base}.{self._owner}.replay"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return 0  # another worker claimed it first
+        deltas = self._empty()
+        with open(claimed) as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 3 and parts[1] in deltas:
+                    deltas[parts[1]][int(parts[0])] += int(parts[2])
+        applied = self._apply(deltas)
+        os.unlink(claimed)
+        return applied
+
+    # Buffering --------------------------------------------------------------
+
+    def _empty(self) -> Dict[str, Dict[int, int]]:
+        return {field: defaultdict(int) for field in self.fields}
+
+    def add(self, pk: int, field: str, amount: int = 1) -> int:
+        """
+        Buffer an increment and return this worker's unapplied total for ``pk``/``field``, this one included,
+        as it stood before any flush the call triggers: the amount to add to a counter read before calling.
+        """
+        unapplied, due = self._buffer(pk, field, amount)
+        if due:
+            self.flush()
+        return unapplied
+
+    async def aadd(self, pk: int, field: str, amount: int = 1) -> int:
+        """``add`` for async views: buffering stays on the event loop, database work runs in a worker thread."""
+        if self._pid != os.getpid() or (counter_settings()["DURABILITY"] == "journal" and not self._recovered):
+            return await sync_to_async(self.add)(pk, field, amount)  # journal recovery still pending
+        unapplied, due = self._buffer(pk, field, amount)
+        if due:
+            await sync_to_async(self.flush)()
+        return unapplied
+
+    def _buffer(self, pk: int, field: str, amount: int) -> Tuple[int, bool]:
+        """Record an increment; return the unapplied total for ``pk``/``field`` and whether a flush is due."""
+        config = counter_settings()
+        with self._lock:
+            self._check_process()
+            if config["DURABILITY"] == "journal":
+                if not self._recovered:
+                    self.recover()
+                self._write_journal(pk, field, amount)
+            self._pending[field][pk] += amount
+            self._size += amount
+            return self._pending[field][pk], (
+                config["DURABILITY"] == "immediate"
+                or self._size >= config["MAX_PENDING"]
+                or time.monotonic() - self._last_flush >= config["FLUSH_INTERVAL"]
+            )
+
+    def pending(self, pk: int, field: str) -> int:
+        with self._lock:
+            self._check_process()
+            return self._pending[field].get(pk, 0)
+
+    def flush(self) -> int:
+        """Apply every pending increment; return how many were applied."""
+        with self._lock:
+            self._check_process()
+            flush_lock = self._flush_lock
+        # Request threads and the Flusher may flush at once; a flush removes every sealed segment up to its
+        # own, so a second one running alongside would delete a segment whose UPDATE has not committed yet.
+        with flush_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                if not self._size:
+                    return 0
+                deltas, size = self._pending, self._size
+                self._pending, self._size = self._empty(), 0
+                sealed = self._close_segment()
+            try:
+                self._apply(deltas)
+            except Exception:
+                # Put the increments back; their journal segments stay until a later flush commits.
+                with self._lock:
+                    for field, rows in deltas.items():
+                        for pk, amount in rows.items():
+                            self._pending[field][pk] += amount
+                    self._size += size
+                raise
+            with self._lock:
+                self._remove_segments(sealed)
+        return size
+
+    def _apply(self, deltas: Dict[str, Dict[int, int]]) -> int:
+        from .models import Quote
+
+        ids = sorted({pk for rows in deltas.values() for pk in rows})
+        now = timezone.now()
+        applied = 0
+        with transaction.atomic():
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                updates = {}
+                for field, rows in deltas.items():
+                    whens = [When(pk=pk, then=Value(rows[pk])) for pk in batch if rows.get(pk)]
+                    if whens:
+                        applied += sum(rows[pk] for pk in batch if rows.get(pk))
+                        updates[field] = F(field) + Case(*whens, default=Value(0), output_field=models.PositiveIntegerField())
+                # Lets the leaderboard delta job find rows whose counters moved; updated_at stays the last edit
+                Quote.objects.filter(pk__in=batch).update(counters_changed_at=now, **updates)
+        return applied
+
+
+def flush_all() -> None:
+    for buffer in _buffers:
+        try:
+            buffer.flush()
+        except Exception:
+            logger.exception("Failed to flush %s counters", buffer.name)
+
+
+class Flusher(threading.Thread):
+    """Daemon thread that flushes every buffer each ``FLUSH_INTERVAL`` seconds."""
+
+    def __init__(self) -> None:
+        super().__init__(name="quotes-counter-flusher", daemon=True)
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        from django.db import close_old_connections
+
+        while not self.stopped.wait(counter_settings()["FLUSH_INTERVAL"]):
+            close_old_connections()
+            flush_all()
+
+
+_flusher = None
+
+
+def start_flusher() -> None:
+    """Start this worker's background flusher and replay journals of dead workers."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    if counter_settings()["DURABILITY"] == "journal":
+        for buffer in _buffers:
+            try:
+                buffer.recover()
+            except Exception:
+                logger.exception("Failed to recover %s counters", buffer.name)
+    _flusher = Flusher()
+    _flusher.start()
+
+
+def shutdown() -> None:
+    """Stop the background flusher and apply everything still pending."""
+    if _flusher is not None:
+        _flusher.stopped.set()
+    flush_all()
+
+
+atexit.register(flush_all)
+
+view_counter = CounterBuffer("views", ["views"])
+vote_counter = CounterBuffer("votes", ["likes", "dislikes"])
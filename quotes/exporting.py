@@ -0,0 +1,91 @@
+"""
+Streaming export of every quote with its counters.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` in id order,
+so neither model instances nor the full result set are ever held in memory.
+Encoded lines are grouped into blocks of about ``BLOCK_SIZE`` characters and
+optionally gzip-compressed on the fly with a single ``zlib`` stream.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from .models import Quote
+
+FIELDS = ("id", "text", "source", "weight", "views", "likes", "dislikes", "created_at", "updated_at")
+FORMATS = ("csv", "jsonl", "ndjson")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/jsonl; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+DEFAULT_CHUNK_SIZE = 2000
+# Characters of encoded output handed on at a time
+BLOCK_SIZE = 64 * 1024
+
+
+def rows(chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield ``FIELDS`` tuples for every quote, in id order."""
+    return Quote.objects.order_by("id").values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow([value.isoformat() if hasattr(value, "isoformat") else value for value in row])
+        if buffer.tell() >= BLOCK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _json_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    block, size = [], 0
+    for row in rows:
+        record = dict(zip(FIELDS, row))
+        record["created_at"] = record["created_at"].isoformat()
+        record["updated_at"] = record["updated_at"].isoformat()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield "".join(block)
+            block, size = [], 0
+    if block:
+        yield "".join(block)
+
+
+def encode(rows: Iterable[tuple], fmt: str) -> Iterator[str]:
+    if fmt == "csv":
+        return _csv_lines(rows)
+    if fmt in ("jsonl", "ndjson"):
+        return _json_lines(rows)
+    raise ValueError(f"Unknown export format {fmt!r}, expected one of {FORMATS}")
+
+
+def gzipped(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header and trailer
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(fmt: str, compress: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the encoded (and optionally gzip-compressed) export as bytes blocks."""
+    blocks = (block.encode("utf-8") for block in encode(rows(chunk_size), fmt))
+    return gzipped(blocks) if compress else blocks
+
+
+def filename(fmt: str, compress: bool = False) -> str:
+    return f"quotes.{fmt}" + (".gz" if compress else "")
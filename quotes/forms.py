@@ -1,7 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Quote
+from .models import Quote, content_hash_for
 
 class QuoteForm(forms.ModelForm):
     class Meta:
@@ -13,16 +13,16 @@ class QuoteForm(forms.ModelForm):
         text = cleaned.get("text")
         source = cleaned.get("source")
         if text and source:
-            exists_qs = Quote.objects.filter(text=text, source=source)
+            exists_qs = Quote.objects.filter(content_hash=content_hash_for(text, source))
             if self.instance and self.instance.pk:
                 exists_qs = exists_qs.exclude(pk=self.instance.pk)
             if exists_qs.exists():
                 raise ValidationError("This quote from the same source already exists.")
-
-            count_same_source = Quote.objects.filter(source=source)
-            if self.instance and self.instance.pk:
-                count_same_source = count_same_source.exclude(pk=self.instance.pk)
-            if count_same_source.count() >= 3:
-                raise ValidationError("A single source cannot have more than 3 quotes.")
+        # The 3-per-source limit is checked once, by Quote.clean() during _post_clean()
         return cleaned
 
+    def save(self, commit=True):
+        # clean() and _post_clean() already ran every check, so Quote.save() need not repeat them
+        self.instance.mark_validated()
+        return super().save(commit)
+
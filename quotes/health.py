@@ -0,0 +1,158 @@
+"""
+Liveness and readiness probes that stay cheap under frequent polling.
+
+``/live`` answers from the worker itself without touching the database or
+cache: if the worker can run a view, it is alive. ``/ready`` returns the last
+result of a per-worker background ``Prober`` that checks the database, the
+cache and the corpus every ``INTERVAL`` seconds, so load balancer polls never
+wait on I/O. The corpus size comes from the sampler index the worker already
+maintains (``quotes.sampling``); without a loaded index an ``EXISTS`` query
+decides whether there are any quotes. A result older than ``STALE_AFTER``
+seconds (the prober stopped or hangs) counts as not ready.
+
+``/ready`` is reachable from outside, so it answers with the status only;
+the failing component and its error go to the log, and staff get the full
+picture from ``/quotes/health/``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "INTERVAL": 10.0,
+    "STALE_AFTER": 60.0,
+}
+CACHE_KEY = "quotes:health:probe"
+# Requests that per-request middleware work (e.g. the corpus version check) leaves alone
+PROBE_PATHS = frozenset({"/live", "/ready"})
+# Fields of a probe result that /ready may show; component details can carry exception text
+PUBLIC_FIELDS = ("status", "checked_at", "reason")
+
+
+def health_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_HEALTH", {})}
+
+
+def probe() -> dict:
+    """Check the database, the cache and the corpus; never raises."""
+    from .models import Quote
+    from .sampling import sampler
+
+    result = {"status": "ready", "checked_at": timezone.now().isoformat()}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        result["database"] = "connected"
+    except Exception as e:
+        result["database"] = f"error: {e}"
+        result["status"] = "unavailable"
+
+    try:
+        cache.set(CACHE_KEY, os.getpid(), 30)
+        cache.get(CACHE_KEY)
+        result["cache"] = "connected"
+    except Exception as e:
+        result["cache"] = f"error: {e}"
+        result["status"] = "unavailable"
+
+    if result["database"] == "connected":
+        try:
+            quotes = sampler.count()
+            if quotes is None:
+                has_quotes = Quote.objects.exists()
+            else:
+                result["quotes_count"], has_quotes = quotes, quotes > 0
+            if not has_quotes and result["status"] == "ready":
+                result["status"] = "degraded"
+        except Exception as e:
+            result["quotes_count"] = f"error: {e}"
+            result["status"] = "unavailable"
+    return result
+
+
+class Prober(threading.Thread):
+    """Daemon thread that refreshes this worker's readiness every ``INTERVAL`` seconds."""
+
+    def __init__(self) -> None:
+        super().__init__(name="quotes-health-prober", daemon=True)
+        self.stopped = threading.Event()
+        self.result: Optional[dict] = None
+        self.updated_at = 0.0
+
+    def refresh(self) -> None:
+        close_old_connections()
+        result = probe()
+        # Logged when the status changes, so a long outage does not log every INTERVAL
+        if result["status"] != "ready" and (self.result is None or self.result["status"] != result["status"]):
+            logger.warning("Worker not ready: %s", result)
+        self.result, self.updated_at = result, time.monotonic()
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Readiness probe failed")
+            if self.stopped.wait(health_settings()["INTERVAL"]):
+                break
+        close_old_connections()
+
+
+_prober: Optional[Prober] = None
+_prober_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def start_prober() -> Prober:
+    """Start this worker's prober unless it is already running."""
+    global _prober, _prober_pid
+    with _lock:
+        if _prober is None or _prober_pid != os.getpid() or not _prober.is_alive():
+            _prober, _prober_pid = Prober(), os.getpid()
+            _prober.start()
+        return _prober
+
+
+def stop_prober() -> None:
+    if _prober is not None:
+        _prober.stopped.set()
+
+
+def readiness() -> dict:
+    """The prober's last result, with ``status`` "unavailable" until the first probe or once it is stale."""
+    prober = start_prober()
+    result = prober.result
+    if result is None:
+        return {"status": "unavailable", "reason": "starting"}
+    age = time.monotonic() - prober.updated_at
+    if age > health_settings()["STALE_AFTER"]:
+        return {**result, "status": "unavailable", "reason": f"last probe {age:.0f}s ago"}
+    return result
+
+
+def live_view(request: HttpRequest) -> HttpResponse:
+    """Liveness: answered in-process, no I/O."""
+    return HttpResponse('{"status": "alive"}', content_type="application/json")
+
+
+def ready_view(request: HttpRequest) -> HttpResponse:
+    """Readiness from the background prober, status only; 503 when this worker should get no traffic."""
+    result = readiness()
+    public = {key: result[key] for key in PUBLIC_FIELDS if key in result}
+    return HttpResponse(
+        json.dumps(public), content_type="application/json", status=200 if result["status"] == "ready" else 503
+    )
@@ -0,0 +1,68 @@
+"""
+Per-visitor history of recently shown quotes, so the random page does not repeat them.
+
+The last ``SIZE`` quote ids travel in a signed cookie (base-36 ids joined by
+dots, newest first): no session row is read or written per page view, and
+the sampler leaves the ids out of the draw itself (see
+``WeightedIndex.sample``). A tampered or expired cookie is treated as empty.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.http import base36_to_int, int_to_base36
+
+DEFAULTS = {
+    "SIZE": 5,
+    "COOKIE_NAME": "recent_quotes",
+    "MAX_AGE": 30 * 24 * 3600,
+}
+SALT = "quotes.history"
+
+
+def history_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_HISTORY", {})}
+
+
+def recent_quotes(request: HttpRequest) -> List[int]:
+    """Ids of the quotes this visitor saw last, newest first."""
+    config = history_settings()
+    if not config["SIZE"]:
+        return []
+    value = request.get_signed_cookie(config["COOKIE_NAME"], default="", salt=SALT, max_age=config["MAX_AGE"])
+    ids = []
+    for part in value.split(".")[:config["SIZE"]]:
+        try:
+            ids.append(base36_to_int(part))
+        except ValueError:
+            return []
+    return ids
+
+
+def remember_quote(response: HttpResponse, recent: List[int], pk: int) -> None:
+    """Put ``pk`` first in the history cookie set on ``response``."""
+    remember_quotes(response, recent, [pk])
+
+
+def remember_quotes(response: HttpResponse, recent: List[int], shown: List[int]) -> None:
+    """Record the ids in ``shown`` (in display order, so the last one ends up first) in the history cookie."""
+    config = history_settings()
+    if not config["SIZE"] or not shown:
+        return
+    ids = []
+    for pk in [*reversed(shown), *recent]:
+        if pk not in ids:
+            ids.append(pk)
+    ids = ids[:config["SIZE"]]
+    response.set_signed_cookie(
+        config["COOKIE_NAME"],
+        ".".join(int_to_base36(seen) for seen in ids),
+        salt=SALT,
+        max_age=config["MAX_AGE"],
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
@@ -0,0 +1,199 @@
+"""
+Streaming bulk import of quotes from CSV or JSON Lines files.
+
+Rows flow through a generator pipeline — read, normalize, chunk — so memory
+use depends on ``chunk_size``, not on the file size. Each chunk is checked
+against the database with two indexed queries (``content_hash IN (...)`` and
+``Source.name IN (...)``) plus the duplicates and per-source counts within
+the chunk, then inserted with ``bulk_create`` and the ``Source`` counters
+bumped, all in one transaction.
+"""
+
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .models import MAX_QUOTES_PER_SOURCE, Quote, Source, content_hash_for
+
+FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 5000
+# Rows per INSERT statement; keeps each statement under SQLite's variable limit.
+INSERT_BATCH_SIZE = 500
+
+SOURCE_MAX_LENGTH = Quote._meta.get_field("source").max_length
+
+
+@dataclass
+class Row:
+    line: int
+    text: str
+    source: str
+    weight: int
+    content_hash: str = ""
+
+
+@dataclass
+class Rejected:
+    line: int
+    reason: str
+    data: dict
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    imported: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def rejected_total(self) -> int:
+        return sum(self.rejected.values())
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def detect_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_records(fh, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Yield ``(line number, raw record)`` pairs from an open text file."""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {"__error__": "invalid JSON", "line": line.rstrip("\n")}
+            if not isinstance(record, dict):
+                record = {"__error__": "not a JSON object", "line": line.rstrip("\n")}
+            yield number, record
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def parse(records: Iterable[Tuple[int, dict]]) -> Iterator[object]:
+    """Turn raw records into ``Row`` objects, or ``Rejected`` for malformed ones."""
+    for line, record in records:
+        if "__error__" in record:
+            yield Rejected(line, record["__error__"], record)
+            continue
+        text = str(record.get("text") or "").strip()
+        source = str(record.get("source") or "").strip()
+        weight = record.get("weight")
+        if not text or not source:
+            yield Rejected(line, "missing text or source", record)
+            continue
+        if len(source) > SOURCE_MAX_LENGTH:
+            yield Rejected(line, "source too long", record)
+            continue
+        try:
+            weight = int(weight) if weight not in (None, "") else 1
+        except (TypeError, ValueError):
+            yield Rejected(line, "invalid weight", record)
+            continue
+        if weight < 1:
+            yield Rejected(line, "invalid weight", record)
+            continue
+        yield Row(line, text, source, weight, content_hash_for(text, source))
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _add_source_counts(added: Dict[str, int]) -> None:
+    table = connection.ops.quote_name(Source._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (name, quote_count) VALUES (%s, %s) "
+            f"ON CONFLICT (name) DO UPDATE SET quote_count = {table}.quote_count + excluded.quote_count",
+            list(added.items()),
+        )
+
+
+def import_chunk(chunk: List[object], stats: ImportStats, on_reject: Optional[Callable] = None) -> None:
+    rows = [item for item in chunk if isinstance(item, Row)]
+    rejected = [item for item in chunk if isinstance(item, Rejected)]
+    with transaction.atomic():
+        hashes = {row.content_hash for row in rows}
+        names = {row.source for row in rows}
+        existing = set(Quote.objects.filter(content_hash__in=hashes).values_list("content_hash", flat=True))
+        counts = dict(Source.objects.filter(name__in=names).values_list("name", "quote_count"))
+        accepted: List[Row] = []
+        added: Counter = Counter()
+        for row in rows:
+            if row.content_hash in existing:
+                rejected.append(Rejected(row.line, "duplicate quote", {"text": row.text, "source": row.source}))
+                continue
+            if counts.get(row.source, 0) + added[row.source] >= MAX_QUOTES_PER_SOURCE:
+                rejected.append(Rejected(row.line, "source limit reached", {"text": row.text, "source": row.source}))
+                continue
+            existing.add(row.content_hash)
+            added[row.source] += 1
+            accepted.append(row)
+        Quote.objects.bulk_create(
+            [
+                Quote(text=row.text, source=row.source, weight=row.weight, content_hash=row.content_hash)
+                for row in accepted
+            ],
+            batch_size=INSERT_BATCH_SIZE,
+        )
+        if added:
+            _add_source_counts(added)
+    stats.imported += len(accepted)
+    for item in sorted(rejected, key=lambda item: item.line):
+        stats.rejected[item.reason] += 1
+        if on_reject is not None:
+            on_reject(item)
+
+
+def import_quotes(
+    fh,
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_reject: Optional[Callable] = None,
+    on_chunk: Optional[Callable] = None,
+) -> ImportStats:
+    """Stream quotes from ``fh`` into the database and return the counts."""
+    from .leaderboard import leaderboard
+    from .sampling import sampler
+    from .versioning import record_bulk_change
+
+    stats = ImportStats()
+    for chunk in chunked(parse(read_records(fh, fmt)), chunk_size):
+        stats.read += len(chunk)
+        import_chunk(chunk, stats, on_reject)
+        if on_chunk is not None:
+            on_chunk(stats)
+    # bulk_create sends no post_save signals; rebuild in-memory state here now and in other workers via the corpus version
+    sampler.invalidate()
+    leaderboard.invalidate()
+    if stats.imported:
+        record_bulk_change()
+    return stats
@@ -0,0 +1,253 @@
+"""
+Per-worker top-K leaderboards for the popular page.
+
+A global board and an LRU of per-source boards hold the K best quotes by
+``(likes, views, created_at, id)``. They are kept current by a delta job
+that folds in rows whose ``counters_changed_at`` (set by counter flushes)
+or ``updated_at`` (set by edits) moved since the last refresh, so reading a board is O(K) with no sort. Because
+counters only grow, merging deltas keeps a board exact; when a member's key
+shrinks, its source changes or it is deleted, the board is reloaded. Deleted
+rows leave nothing for the delta query to find, so the job also checks that
+every member still exists; that catches deletes made by other workers.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+POPULAR_ORDERING = ("-likes", "-views", "-created_at", "-id")
+FIELDS = ("id", "source", "text", "likes", "views", "created_at", "updated_at", "counters_changed_at")
+# Rows committed slightly after a refresh can carry an older timestamp; re-read this overlap.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+DEFAULTS = {
+    "SIZE": 10,
+    "REFRESH_INTERVAL": 2.0,
+    "REBUILD_INTERVAL": 300.0,
+    "MAX_SOURCES": 256,
+}
+
+
+def leaderboard_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_LEADERBOARD", {})}
+
+
+class Entry:
+    """The columns of a quote the popular table renders."""
+
+    __slots__ = ("pk", "source", "text", "likes", "views", "created_at", "key")
+
+    def __init__(self, row: dict) -> None:
+        self.pk = row["id"]
+        self.source = row["source"]
+        self.text = row["text"]
+        self.likes = row["likes"]
+        self.views = row["views"]
+        self.created_at = row["created_at"]
+        # Negated so ascending order is the popular order
+        self.key = (-self.likes, -self.views, -self.created_at.timestamp(), -self.pk)
+
+    def __repr__(self) -> str:
+        return f"<Entry {self.pk} likes={self.likes} views={self.views}>"
+
+
+def fingerprint(source: Optional[str], entries: Iterable[Entry]) -> str:
+    """SHA-1 over the scope and every rendered column of ``entries``."""
+    digest = hashlib.sha1(f"{source}\x00".encode())
+    for entry in entries:
+        digest.update(f"{entry.pk}:{entry.likes}:{entry.views}:{entry.source}\x00{entry.text}\x00".encode())
+    return digest.hexdigest()
+
+
+class Board:
+    """Exact top-``size`` entries of one scope, ordered best first."""
+
+    def __init__(self, size: int, rows: Iterable[dict]) -> None:
+        self.size = size
+        self.entries: List[Entry] = []
+        self._keys: list = []
+        self._by_pk: Dict[int, Entry] = {}
+        for row in rows:
+            self._insert(Entry(row))
+
+    def _insert(self, entry: Entry) -> None:
+        i = bisect.bisect_left(self._keys, entry.key)
+        self._keys.insert(i, entry.key)
+        self.entries.insert(i, entry)
+        self._by_pk[entry.pk] = entry
+
+    def _remove(self, entry: Entry) -> None:
+        i = bisect.bisect_left(self._keys, entry.key)
+        del self._keys[i]
+        del self.entries[i]
+        del self._by_pk[entry.pk]
+
+    def __contains__(self, pk: int) -> bool:
+        return pk in self._by_pk
+
+    def merge(self, row: dict) -> bool:
+        """Fold in a changed row; return False if the board can no longer be exact."""
+        entry = Entry(row)
+        old = self._by_pk.get(entry.pk)
+        if old is not None:
+            if entry.key > old.key:
+                return False  # a member fell; an outsider may now belong in the top K
+            self._remove(old)
+        elif len(self.entries) >= self.size and entry.key >= self._keys[-1]:
+            return True
+        self._insert(entry)
+        if len(self.entries) > self.size:
+            self._remove(self.entries[-1])
+        return True
+
+
+class Leaderboard:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._global: Optional[Board] = None
+        self._sources: "OrderedDict[str, Board]" = OrderedDict()
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+
+    def _queryset(self):
+        from .models import Quote
+
+        return Quote.objects.order_by(*POPULAR_ORDERING).values(*FIELDS)
+
+    def _load(self, source: Optional[str] = None) -> Board:
+        qs = self._queryset()
+        if source is not None:
+            qs = qs.filter(source=source)
+        return Board(leaderboard_settings()["SIZE"], qs[: leaderboard_settings()["SIZE"]])
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def mark_stale(self) -> None:
+        """Run the delta job on the next read, e.g. after this worker saved a quote."""
+        with self._lock:
+            self._refreshed_at = 0.0
+
+    def discard(self, pk: int) -> None:
+        """Drop boards that contain a deleted quote so they reload on next read."""
+        with self._lock:
+            if self._global is not None and pk in self._global:
+                self._global = None
+            for source in [s for s, board in self._sources.items() if pk in board]:
+                del self._sources[source]
+
+    def _rebuild(self) -> None:
+        from django.db.models import Max
+
+        from .models import Quote
+
+        # One MAX per query: SQLite answers a lone MAX from the index, two in one SELECT scan the table
+        stamps = [Quote.objects.aggregate(stamp=Max(field))["stamp"] for field in ("updated_at", "counters_changed_at")]
+        self._watermark = max(filter(None, stamps), default=None)
+        self._global = self._load()
+        self._sources.clear()
+        self._refreshed_at = self._rebuilt_at = time.monotonic()
+
+    def _drop_deleted(self) -> None:
+        from .models import Quote
+
+        members = {entry.pk for board in (self._global, *self._sources.values()) for entry in board.entries}
+        if members:
+            alive = Quote.objects.order_by().filter(pk__in=members).values_list("id", flat=True)
+            for pk in members - set(alive):
+                self.discard(pk)
+
+    def refresh(self) -> int:
+        """Run the delta job now; return the number of changed rows merged."""
+        from django.db.models import Q
+
+        with self._lock:
+            if self._pid != os.getpid() or self._global is None or self._watermark is None:
+                self._reset()
+                self._rebuild()
+                return 0
+            self._drop_deleted()
+            if self._global is None:
+                self._global = self._load()
+            since = self._watermark - WATERMARK_OVERLAP
+            rows = list(self._queryset().order_by().filter(Q(counters_changed_at__gte=since) | Q(updated_at__gte=since)))
+            for row in rows:
+                if not self._global.merge(row):
+                    self._global = self._load()
+                for source, board in list(self._sources.items()):
+                    if row["id"] in board and row["source"] != source:
+                        del self._sources[source]
+                    elif row["source"] == source and not board.merge(row):
+                        del self._sources[source]
+                self._watermark = max(self._watermark, row["updated_at"], row["counters_changed_at"])
+            self._refreshed_at = time.monotonic()
+            return len(rows)
+
+    def top(self, source: Optional[str] = None) -> List[Entry]:
+        config = leaderboard_settings()
+        with self._lock:
+            now = time.monotonic()
+            if self._pid != os.getpid() or self._global is None or now - self._rebuilt_at > config["REBUILD_INTERVAL"]:
+                self._reset()
+                self._rebuild()
+            elif now - self._refreshed_at > config["REFRESH_INTERVAL"]:
+                self.refresh()
+            if source is None:
+                return list(self._global.entries)
+            board = self._sources.get(source)
+            if board is None:
+                board = self._sources[source] = self._load(source)
+                if len(self._sources) > config["MAX_SOURCES"]:
+                    self._sources.popitem(last=False)
+            else:
+                self._sources.move_to_end(source)
+            return list(board.entries)
+
+    def digest(self, source: Optional[str] = None) -> str:
+        """Fingerprint of everything the popular page renders for a board, e.g. for ETags."""
+        return fingerprint(source, self.top(source))
+
+    def verify(self, source: Optional[str] = None) -> List[str]:
+        """
+        Run the delta job on a board and compare it with the live query; return human-readable differences.
+
+        Load the board (``top``) a while before calling this, so the check covers the rows merged since then
+        rather than a board that was just built from the same query.
+        """
+        from django.db import transaction
+
+        from .models import Quote
+
+        # One read snapshot for the delta job and the live query, so counters flushed meanwhile cannot show as drift
+        with self._lock, transaction.atomic():
+            self.refresh()
+            board = [(entry.pk, entry.likes, entry.views) for entry in self.top(source)]
+            qs = Quote.objects.order_by(*POPULAR_ORDERING)
+            if source is not None:
+                qs = qs.filter(source=source)
+            live = list(qs.values_list("id", "likes", "views")[: leaderboard_settings()["SIZE"]])
+        if board != live:
+            return [f"source={source!r}: leaderboard {board} != live {live}"]
+        return []
+
+    def cached_sources(self) -> List[str]:
+        with self._lock:
+            return list(self._sources)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,167 @@
+"""
+Non-blocking log handling for production.
+
+``QueueHandler`` is the only handler on the application loggers: a request
+thread just puts the record on a bounded in-memory queue, and a per-worker
+listener thread hands it to the handlers of the ``sink`` logger (rotating
+files, console), where the file I/O and rotation checks happen. When the
+queue is full the ``policy`` decides:
+
+``drop``
+    Discard the record and count it; a warning with the count is logged once
+    the queue has room again.
+``block``
+    Wait up to ``block_timeout`` seconds for room, then drop as above, so a
+    stuck disk slows requests down but never hangs them.
+
+Forked workers (gunicorn ``preload_app``) each start their own queue and
+listener on first use. ``JSONFormatter`` writes one JSON object per line.
+
+This module is imported while settings are configured, so it must not
+import Django.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Optional
+
+POLICIES = ("drop", "block")
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, location, message, exception and ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.thread,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SinkListener(logging.handlers.QueueListener):
+    """Passes queued records to the handlers of the ``sink`` logger, as configured in LOGGING."""
+
+    def __init__(self, records: queue.Queue, sink: str) -> None:
+        super().__init__(records)
+        self.sink = logging.getLogger(sink)
+
+    def handle(self, record: logging.LogRecord) -> None:
+        self.sink.handle(record)
+
+    def enqueue_sentinel(self) -> None:
+        # The queue may be full; wait for room rather than losing the stop signal
+        self.queue.put(self._sentinel)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Bounded, per-process queue in front of the ``sink`` logger's handlers."""
+
+    def __init__(self, sink: str, maxsize: int = 10000, policy: str = "drop", block_timeout: float = 0.05) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {POLICIES}")
+        super().__init__(queue.Queue(maxsize))
+        self.sink = sink
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        # Records dropped in this process, and how many of them no warning has reported yet
+        self.dropped = 0
+        self._unreported = 0
+        self._listener: Optional[SinkListener] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork may hold a lock taken by the parent's listener thread
+            self.queue = queue.Queue(self.maxsize)
+            self.dropped = self._unreported = 0
+            self._listener = SinkListener(self.queue, self.sink)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the base class, but the traceback stays in exc_text instead of being folded into the message,
+        # so the sink's formatters still see message and exception apart. Extras are made plain data.
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = record.exc_text or "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not isinstance(value, (str, int, float, bool, type(None))):
+                setattr(record, key, str(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        if self._unreported:
+            dropped, self._unreported = self._unreported, 0
+            notice = logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log queue was full; dropped {dropped} record(s)",
+                "created": time.time(),
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self._unreported += dropped
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self) -> None:
+        """Drain the queue into the sink and stop this process's listener."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener, self._pid = None, None
+
+    def close(self) -> None:
+        self.stop()
+        super().close()
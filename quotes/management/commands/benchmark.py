@@ -0,0 +1,101 @@
+"""
+Management command that runs the benchmark suites in quotes.benchmarks.
+"""
+
+import importlib
+import json
+import platform
+import sys
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quotes.benchmarks import benchmark_database, compare
+
+SUITES = {
+    'cache': 'quotes.benchmarks.cache',
+    'http': 'quotes.benchmarks.http',
+    'logging': 'quotes.benchmarks.log',
+    'micro': 'quotes.benchmarks.micro',
+    'sampler': 'quotes.benchmarks.sampler',
+    'search': 'quotes.benchmarks.search',
+    'render': 'quotes.benchmarks.render',
+    'sqlite': 'quotes.benchmarks.sqlite',
+    'uniqueness': 'quotes.benchmarks.uniqueness',
+}
+
+
+class Command(BaseCommand):
+    help = 'Run a benchmark suite against a throwaway database and report latency percentiles'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='suite', required=True)
+        # Suite -> its own option names, recorded with the results so a run can be repeated
+        self._suite_options = {}
+        for name, module_path in SUITES.items():
+            subparser = subparsers.add_parser(name, help=importlib.import_module(module_path).__doc__.strip())
+            subparser.add_argument(
+                '--json',
+                dest='json_path',
+                help='Write the results as JSON to this path',
+            )
+            subparser.add_argument(
+                '--baseline',
+                help='Compare against results previously written with --json; fail on regressions',
+            )
+            subparser.add_argument(
+                '--tolerance',
+                type=float,
+                default=10.0,
+                help='Percent a timing metric may worsen against the baseline before it counts as a regression',
+            )
+            common = {action.dest for action in subparser._actions}
+            importlib.import_module(module_path).add_arguments(subparser)
+            self._suite_options[name] = {action.dest for action in subparser._actions} - common
+
+    def handle(self, *args, **options):
+        suite = importlib.import_module(SUITES[options['suite']])
+        self.stdout.write(f"Running {options['suite']} benchmark...")
+        with benchmark_database():
+            results = suite.run(options)
+
+        for name, row in results.items():
+            stats = ' '.join(
+                f'{key}={value:.3f}' if isinstance(value, float) else f'{key}={value}'
+                for key, value in row.items()
+            )
+            self.stdout.write(f'{name}: {stats}')
+
+        if options.get('json_path'):
+            report = {
+                'suite': options['suite'],
+                'created_at': timezone.now().isoformat(),
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'options': {key: value for key, value in options.items() if key in self._suite_options[options['suite']]},
+                'results': results,
+            }
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
+
+        if options.get('baseline'):
+            self._compare(results, options['baseline'], options['tolerance'])
+
+    def _compare(self, results, path, tolerance):
+        with open(path) as fh:
+            baseline = json.load(fh)['results']
+        changes = compare(results, baseline, tolerance / 100)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Against {path}'))
+        for change in changes:
+            line = (
+                f"{change['name']} {change['metric']}: {change['baseline']:.3f} -> {change['value']:.3f} "
+                f"({change['change']:+.1%})"
+            )
+            self.stdout.write(self.style.ERROR(line) if change['regression'] else line)
+        regressions = sum(change['regression'] for change in changes)
+        if regressions:
+            raise CommandError(f'{regressions} metric(s) regressed by more than {tolerance:g}%')
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {tolerance:g}% in {len(changes)} metric(s)'))
@@ -0,0 +1,48 @@
+"""
+Management command that compares the popular-page leaderboard with the live query.
+
+The boards are loaded first and checked ``--window`` seconds later, after the
+delta job has merged whatever the workers flushed and deleted meanwhile, so
+the check covers the incremental path the workers serve from.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.leaderboard import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Check that the incrementally maintained leaderboard matches ORDER BY -likes, -views'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            action='append',
+            default=[],
+            help='Also check the leaderboard of this source (repeatable)',
+        )
+        parser.add_argument(
+            '--window',
+            type=float,
+            default=10.0,
+            help='Seconds between loading the boards and checking the merged result (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        leaderboard.top()
+        for source in options['source']:
+            leaderboard.top(source)
+        time.sleep(options['window'])
+
+        problems = leaderboard.verify()
+        for source in options['source']:
+            problems += leaderboard.verify(source)
+
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'{len(problems)} leaderboard(s) differ from the live query')
+
+        self.stdout.write(self.style.SUCCESS('Leaderboard matches the live query.'))
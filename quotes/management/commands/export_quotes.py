@@ -0,0 +1,57 @@
+"""
+Management command that streams every quote with its counters to a file or stdout.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from quotes import exporting
+
+
+class Command(BaseCommand):
+    help = (
+        'Export all quotes with views/likes/dislikes as CSV, JSONL or NDJSON, optionally gzip-compressed. '
+        'Counts are read from the database: views and votes still buffered in running workers '
+        '(up to QUOTES_COUNTERS FLUSH_INTERVAL old) are not included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=exporting.FORMATS,
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip',
+        )
+        parser.add_argument(
+            '--output',
+            '-o',
+            help="File to write (default: stdout)",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=exporting.DEFAULT_CHUNK_SIZE,
+            help='Rows fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for block in exporting.export(options['format'], options['gzip'], options['chunk_size']):
+                out.write(block)
+                written += len(block)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
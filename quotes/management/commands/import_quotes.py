@@ -0,0 +1,74 @@
+"""
+Management command that streams quotes from a CSV or JSON Lines file into the database.
+"""
+
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.importing import DEFAULT_CHUNK_SIZE, FORMATS, detect_format, import_quotes
+
+
+class Command(BaseCommand):
+    help = 'Bulk import quotes (text, source, weight) from a CSV or JSONL file, skipping invalid rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or a JSONL file; '-' reads stdin")
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: from the file extension, csv for stdin)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Rows validated and inserted per transaction',
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Write rejected rows with their line number and reason to this CSV file',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        rejects_file = open(options['rejects'], 'w', newline='') if options['rejects'] else None
+        rejects_writer = csv.writer(rejects_file) if rejects_file else None
+        if rejects_writer:
+            rejects_writer.writerow(['line', 'reason', 'record'])
+
+        def on_reject(rejected):
+            if rejects_writer:
+                rejects_writer.writerow([rejected.line, rejected.reason, json.dumps(rejected.data, ensure_ascii=False)])
+
+        def on_chunk(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{stats.read} rows read, {stats.imported} imported, '
+                    f'{stats.rejected_total} rejected ({stats.rows_per_sec:.0f} rows/s)'
+                )
+
+        try:
+            fh = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        try:
+            stats = import_quotes(fh, fmt, options['chunk_size'], on_reject=on_reject, on_chunk=on_chunk)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+            if rejects_file:
+                rejects_file.close()
+
+        for reason, count in sorted(stats.rejected.items()):
+            self.stdout.write(f'  rejected ({reason}): {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.imported} of {stats.read} rows in {stats.elapsed:.1f}s '
+            f'({stats.rows_per_sec:.0f} rows/s), {stats.rejected_total} rejected.'
+        ))
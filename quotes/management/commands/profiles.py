@@ -0,0 +1,88 @@
+"""
+Management command that lists and summarizes request profiles captured by ProfilingMiddleware.
+"""
+
+import json
+import pstats
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.profiling import HEADER, captures, enforce_budget, profile_directory, profile_token
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'time')
+
+
+class Command(BaseCommand):
+    help = 'List, summarize and manage request profiles written by quotes.profiling.ProfilingMiddleware'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+        listing = subparsers.add_parser('list', help='List captured profiles, newest last')
+        listing.add_argument('--view', help='Only profiles of this URL name')
+        show = subparsers.add_parser('show', help='Print the hottest functions and slowest SQL of one profile')
+        show.add_argument('name', help='Capture name as printed by "list" (or a path to its .prof/.json file)')
+        show.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+        show.add_argument('--limit', type=int, default=25, help='Functions to print')
+        show.add_argument('--queries', type=int, default=10, help='Slowest SQL statements to print')
+        subparsers.add_parser('token', help=f'Print a signed {HEADER} header value that profiles a request')
+        subparsers.add_parser('prune', help='Delete the oldest profiles beyond the configured budget')
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_list(self, options):
+        rows = 0
+        for path in captures():
+            meta = json.loads(path.read_text())
+            if options['view'] and meta['view'] != options['view']:
+                continue
+            rows += 1
+            self.stdout.write(
+                f"{path.stem}  {meta['method']} {meta['path']}  status={meta['status']} "
+                f"total={meta['duration_ms']:.1f}ms sql={meta['sql_ms']:.1f}ms/{len(meta['queries'])}q "
+                f"trigger={meta['trigger']}"
+            )
+        if not rows:
+            self.stdout.write(f'No profiles in {profile_directory()}')
+
+    def _resolve(self, name):
+        path = Path(name)
+        stem = path.with_suffix('') if path.suffix in ('.prof', '.json') else path
+        if not stem.is_absolute() and not stem.with_suffix('.json').exists():
+            stem = profile_directory() / stem.name
+        if not stem.with_suffix('.json').exists():
+            raise CommandError(f'No profile named {name!r} in {profile_directory()}')
+        return stem
+
+    def handle_show(self, options):
+        stem = self._resolve(options['name'])
+        meta = json.loads(stem.with_suffix('.json').read_text())
+        self.stdout.write(
+            f"{meta['method']} {meta['path']} -> {meta['status']} ({meta['view']}, trigger={meta['trigger']}, "
+            f"pid={meta['pid']}, {meta['started_at']})"
+        )
+        self.stdout.write(
+            f"total {meta['duration_ms']:.1f} ms, SQL {meta['sql_ms']:.1f} ms in {len(meta['queries'])} queries"
+        )
+        if stem.with_suffix('.prof').exists():
+            stats = pstats.Stats(str(stem.with_suffix('.prof')), stream=self.stdout)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+
+        queries = meta['queries']
+        if queries:
+            self.stdout.write(self.style.MIGRATE_HEADING('Slowest queries'))
+            for query in sorted(queries, key=lambda q: q['time_ms'], reverse=True)[:options['queries']]:
+                self.stdout.write(f"{query['time_ms']:8.2f} ms  {query['sql']}  {query['params']}")
+            repeated = [(sql, count) for sql, count in Counter(q['sql'] for q in queries).most_common() if count > 1]
+            if repeated:
+                self.stdout.write(self.style.MIGRATE_HEADING('Repeated statements'))
+                for sql, count in repeated[:options['queries']]:
+                    self.stdout.write(f'{count:5d} x  {sql}')
+
+    def handle_token(self, options):
+        self.stdout.write(profile_token())
+
+    def handle_prune(self, options):
+        self.stdout.write(f'Removed {enforce_budget()} profile(s)')
@@ -0,0 +1,403 @@
+"""
+Prometheus-style metrics aggregated across worker processes.
+
+Each process accumulates counters and histograms in memory; requests only
+touch those. A background thread (``start_writer``, run by gunicorn's
+``post_worker_init`` hook) replaces the process's JSON snapshot in
+``DIRECTORY`` every ``WRITE_INTERVAL`` seconds (one file per process, written
+atomically, so no cross-process locking is needed), and a last snapshot is
+written when the worker exits. ``/metrics`` merges every snapshot into the
+Prometheus text format, so other workers' numbers can lag by up to
+``WRITE_INTERVAL``; without the thread (``runserver``) a process writes its
+snapshot only when it serves a scrape or exits. Snapshots of exited workers
+are folded into an archive file — by gunicorn's ``child_exit`` hook and, for workers that died without
+it, on the next scrape — so counters keep growing across worker recycling.
+
+Recorded series:
+
+``quotes_http_requests_total``, ``quotes_http_request_duration_seconds``
+    Per URL name (``MetricsMiddleware``).
+``quotes_db_queries_per_request``, ``quotes_db_query_duration_seconds``
+    Queries and time spent in the database per request, on every alias
+    (``quotes.querytrace``).
+``quotes_cache_requests_total``
+    Hits and misses of the shared SQLite cache. Only ``quotes.sqlite_cache``
+    records them; other backends (the LocMemCache of dev and test settings,
+    a cache configured in its place) report no cache series at all.
+``quotes_sampler_draw_seconds``
+    Weighted sampler draws.
+"""
+
+from __future__ import annotations
+
+import atexit
+import bisect
+import fcntl
+import glob
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+
+from .processes import pid_alive
+from .querytrace import observe_queries
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DIRECTORY": None,
+    "WRITE_INTERVAL": 5.0,
+    # Bearer token for scrapers; staff users can always read /metrics
+    "TOKEN": None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+DRAW_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)
+
+# name -> (type, help, label names, histogram buckets)
+METRICS = {
+    "quotes_http_requests_total": (
+        "counter", "HTTP responses by URL name, method and status.", ("view", "method", "status"), None),
+    "quotes_http_request_duration_seconds": (
+        "histogram", "Time to produce the response.", ("view",), LATENCY_BUCKETS),
+    "quotes_db_queries_per_request": (
+        "histogram", "Database queries issued per request.", ("view",), QUERY_COUNT_BUCKETS),
+    "quotes_db_query_duration_seconds": (
+        "histogram", "Time spent in database queries per request.", ("view",), LATENCY_BUCKETS),
+    "quotes_cache_requests_total": (
+        "counter", "Shared cache lookups by result.", ("result",), None),
+    "quotes_sampler_draw_seconds": (
+        "histogram", "Weighted sampler draw latency.", ("method",), DRAW_BUCKETS),
+}
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+ARCHIVE = "metrics-archive.json"
+SNAPSHOT_RE = re.compile(r"metrics-(\d+)-[0-9a-f]+\.json$")
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_METRICS", {})}
+
+
+def metrics_directory() -> Path:
+    directory = metrics_settings()["DIRECTORY"] or Path(settings.BASE_DIR) / "var" / "metrics"
+    return Path(directory)
+
+
+class Registry:
+    """This process's metric values, keyed by ``(name, label values)``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # The writer thread and a scrape may both write the snapshot
+        self._write_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        # The token keeps a recycled pid from overwriting a dead worker's snapshot
+        self._path_name = f"metrics-{self._pid}-{uuid.uuid4().hex[:12]}.json"
+        self._counters: Dict[Tuple, float] = {}
+        # Per-bucket (not cumulative) counts with a trailing +Inf bucket, then the sum
+        self._histograms: Dict[Tuple, list] = {}
+
+    def _check_process(self) -> None:
+        # Values inherited across fork (gunicorn preload_app) belong to the parent
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._write_lock = threading.Lock()
+            self._reset()
+
+    def inc(self, name: str, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._check_process()
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Tuple[str, ...] = ()) -> None:
+        self._check_process()
+        buckets = METRICS[name][3]
+        key = (name, labels)
+        with self._lock:
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            values[bisect.bisect_left(buckets, value)] += 1
+            values[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    def write(self) -> None:
+        """Replace this process's snapshot file; never called on the request path."""
+        self._check_process()
+        if not self._counters and not self._histograms:
+            return
+        directory = metrics_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._write_lock:
+            _write_json(directory / self._path_name, self.snapshot())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {"counters": [], "histograms": []}
+
+
+def merge(snapshots: Iterable[dict]) -> dict:
+    """Sum snapshots series by series."""
+    counters: Dict[Tuple, float] = {}
+    histograms: Dict[Tuple, list] = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(labels))
+            total = histograms.get(key)
+            if total is None or len(total) != len(values):
+                histograms[key] = list(values)  # first sighting, or buckets changed between releases
+            else:
+                histograms[key] = [a + b for a, b in zip(total, values)]
+    return {
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), values] for (name, labels), values in histograms.items()],
+    }
+
+
+def _fold(directory: Path, paths: list) -> None:
+    """Add exited workers' snapshots to the archive and remove them."""
+    if not paths:
+        return
+    with open(directory / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = directory / ARCHIVE
+        paths = [path for path in paths if path.exists()]
+        _write_json(archive, merge([_read_json(archive), *(_read_json(path) for path in paths)]))
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Fold the snapshots of worker ``pid``; call from gunicorn's ``child_exit`` hook."""
+    directory = metrics_directory()
+    _fold(directory, [Path(path) for path in glob.glob(str(directory / f"metrics-{pid}-*.json"))])
+
+
+def collect() -> dict:
+    """Merged values of every process, folding snapshots of processes that are gone."""
+    registry.write()
+    directory = metrics_directory()
+    live, dead = [], []
+    for path in map(Path, glob.glob(str(directory / "metrics-*.json"))):
+        match = SNAPSHOT_RE.match(path.name)
+        if match is None:
+            continue
+        (live if pid_alive(int(match.group(1))) else dead).append(path)
+    _fold(directory, dead)
+    return merge(_read_json(path) for path in [directory / ARCHIVE, *live])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(data: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    counters: Dict[str, list] = {}
+    histograms: Dict[str, list] = {}
+    for name, labels, value in data["counters"]:
+        counters.setdefault(name, []).append((labels, value))
+    for name, labels, values in data["histograms"]:
+        histograms.setdefault(name, []).append((labels, values))
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        series = counters.get(name) if kind == "counter" else histograms.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series):
+            if kind == "counter":
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            if len(value) != len(buckets) + 2:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), value[:-1]):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def enabled() -> bool:
+    return metrics_settings()["ENABLED"]
+
+
+def record_cache_lookups(hits: int, misses: int) -> None:
+    if not enabled():
+        return
+    if hits:
+        registry.inc("quotes_cache_requests_total", ("hit",), hits)
+    if misses:
+        registry.inc("quotes_cache_requests_total", ("miss",), misses)
+
+
+def observe_draw(method: str, seconds: float) -> None:
+    if enabled():
+        registry.observe("quotes_sampler_draw_seconds", seconds, (method,))
+
+
+class QueryStats:
+    """Query observer that counts queries and the time spent in them."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, sql, params, many, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+
+class MetricsMiddleware:
+    """Record latency, status and database work per URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        start = time.perf_counter()
+        with observe_queries(QueryStats()) as stats:
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        start = time.perf_counter()
+        with observe_queries(QueryStats()) as stats:
+            response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def _record(self, request, response, elapsed: float, stats: QueryStats) -> None:
+        match = request.resolver_match
+        # Route names, not paths, keep the number of series bounded
+        view = match.view_name if match is not None else "<unresolved>"
+        method = request.method if request.method in METHODS else "OTHER"
+        registry.inc("quotes_http_requests_total", (view, method, str(response.status_code)))
+        registry.observe("quotes_http_request_duration_seconds", elapsed, (view,))
+        registry.observe("quotes_db_queries_per_request", stats.count, (view,))
+        registry.observe("quotes_db_query_duration_seconds", stats.seconds, (view,))
+
+
+def _authorized(request: HttpRequest) -> bool:
+    if request.user.is_active and request.user.is_staff:
+        return True
+    token = metrics_settings()["TOKEN"]
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Merged metrics of every worker, for staff users and scrapers holding ``TOKEN``."""
+    if not _authorized(request):
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(render(collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class Writer(threading.Thread):
+    """Daemon thread that writes this process's snapshot each ``WRITE_INTERVAL`` seconds."""
+
+    def __init__(self) -> None:
+        super().__init__(name="quotes-metrics-writer", daemon=True)
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(metrics_settings()["WRITE_INTERVAL"]):
+            try:
+                registry.write()
+            except OSError:
+                logger.exception("Failed to write the metrics snapshot")
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def start_writer() -> None:
+    """Start this worker's snapshot writer unless it is already running."""
+    global _writer, _writer_pid
+    if not enabled():
+        return
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid() or not _writer.is_alive():
+            _writer, _writer_pid = Writer(), os.getpid()
+            _writer.start()
+
+
+def stop_writer() -> None:
+    """Stop the snapshot writer and write what this process recorded since its last pass."""
+    if _writer is not None:
+        _writer.stopped.set()
+    registry.write()
+
+
+registry = Registry()
+atexit.register(registry.write)
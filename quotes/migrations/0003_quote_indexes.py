@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0002_alter_quote_options_quote_dislikes_quote_likes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['likes', 'views', 'created_at'], name='quote_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['source', 'likes', 'views', 'created_at'], name='quote_source_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['updated_at'], name='quote_updated_at_idx'),
+        ),
+    ]
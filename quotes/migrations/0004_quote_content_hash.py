@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash_for(text, source):
+    # Frozen copy of quotes.models.content_hash_for
+    normalized_text = " ".join(unicodedata.normalize("NFC", text or "").split())
+    normalized_source = " ".join(unicodedata.normalize("NFC", source or "").split())
+    return hashlib.sha1(f"{normalized_text}\x00{normalized_source}".encode("utf-8")).hexdigest()
+
+
+def backfill_content_hash(apps, schema_editor):
+    """Fill content_hash; rows that only differ in whitespace or Unicode normalization are merged into the oldest."""
+    Quote = apps.get_model("quotes", "Quote")
+    seen = {}
+    duplicates = {}
+    batch = []
+    rows = Quote.objects.order_by("id").only("id", "text", "source", "views", "likes", "dislikes")
+    for quote in rows.iterator(chunk_size=2000):
+        quote.content_hash = content_hash_for(quote.text, quote.source)
+        if quote.content_hash in seen:
+            duplicates.setdefault(seen[quote.content_hash], []).append(quote)
+            continue
+        seen[quote.content_hash] = quote.pk
+        batch.append(quote)
+        if len(batch) >= 2000:
+            Quote.objects.bulk_update(batch, ["content_hash"])
+            batch = []
+    if batch:
+        Quote.objects.bulk_update(batch, ["content_hash"])
+    for kept, extras in duplicates.items():
+        # Keep the votes and views the duplicates collected
+        Quote.objects.filter(pk=kept).update(
+            views=F("views") + sum(quote.views for quote in extras),
+            likes=F("likes") + sum(quote.likes for quote in extras),
+            dislikes=F("dislikes") + sum(quote.dislikes for quote in extras),
+        )
+        Quote.objects.filter(pk__in=[quote.pk for quote in extras]).delete()
+        logger.warning(
+            "Quotes %s only differ from quote %s in whitespace or Unicode normalization; "
+            "merged their counters into it and deleted them.",
+            ", ".join(str(quote.pk) for quote in extras), kept,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0003_quote_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=40, null=True),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='quote',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=40),
+        ),
+        migrations.RemoveConstraint(
+            model_name='quote',
+            name='uniq_source_text',
+        ),
+        migrations.AddConstraint(
+            model_name='quote',
+            constraint=models.UniqueConstraint(fields=('content_hash',), name='uniq_quote_content_hash', violation_error_message='This quote from the same source already exists.'),
+        ),
+    ]
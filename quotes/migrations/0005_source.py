@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:32
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_source_counts(apps, schema_editor):
+    Quote = apps.get_model("quotes", "Quote")
+    Source = apps.get_model("quotes", "Source")
+    counts = Quote.objects.order_by().values("source").annotate(n=Count("id")).values_list("source", "n")
+    Source.objects.bulk_create([Source(name=name, quote_count=n) for name, n in counts], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0004_quote_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Source',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('quote_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_source_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# External-content FTS5 index over quotes_quote(text, source), kept in sync by triggers so that
+# save(), bulk_create(), queryset updates and raw SQL all reach it. Counter-only UPDATEs do not
+# touch text or source and so skip the update trigger.
+#
+# Hazard: the triggers are raw SQL that Django's migration state does not know about. Any later
+# operation that makes the SQLite schema editor rebuild quotes_quote (most AlterField/RemoveField
+# changes, altering unique_together, ...) copies the table and drops the old one, and the triggers
+# with it, silently. Such a migration must re-run the CREATE TRIGGER statements below. The
+# quotes.E001 database check (``manage.py check --database default``, also run by ``migrate``)
+# reports missing triggers.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE quotes_quote_fts USING fts5(
+        text, source,
+        content='quotes_quote', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER quotes_quote_fts_insert AFTER INSERT ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (rowid, text, source) VALUES (new.id, new.text, new.source);
+    END
+    """,
+    """
+    CREATE TRIGGER quotes_quote_fts_delete AFTER DELETE ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (quotes_quote_fts, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+    END
+    """,
+    """
+    CREATE TRIGGER quotes_quote_fts_update AFTER UPDATE OF text, source ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (quotes_quote_fts, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+        INSERT INTO quotes_quote_fts (rowid, text, source) VALUES (new.id, new.text, new.source);
+    END
+    """,
+    "INSERT INTO quotes_quote_fts (quotes_quote_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS quotes_quote_fts_update",
+    "DROP TRIGGER IF EXISTS quotes_quote_fts_delete",
+    "DROP TRIGGER IF EXISTS quotes_quote_fts_insert",
+    "DROP TABLE IF EXISTS quotes_quote_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; quotes.search falls back to LIKE elsewhere
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0005_source'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
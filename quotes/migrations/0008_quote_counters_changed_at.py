@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:39
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+# Adding a column with a default makes the SQLite schema editor rebuild quotes_quote, which drops the
+# full-text search triggers (see 0006_quote_search); frozen copies of them are re-created after the
+# rebuild in both directions.
+CREATE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_quote_fts_insert AFTER INSERT ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (rowid, text, source) VALUES (new.id, new.text, new.source);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_quote_fts_delete AFTER DELETE ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (quotes_quote_fts, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_quote_fts_update AFTER UPDATE OF text, source ON quotes_quote BEGIN
+        INSERT INTO quotes_quote_fts (quotes_quote_fts, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+        INSERT INTO quotes_quote_fts (rowid, text, source) VALUES (new.id, new.text, new.source);
+    END
+    """,
+]
+
+
+def create_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in CREATE_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+def backfill_counters_changed_at(apps, schema_editor):
+    # Until now counter flushes bumped updated_at, so it is the best estimate for existing rows
+    Quote = apps.get_model("quotes", "Quote")
+    Quote.objects.update(counters_changed_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0007_quotechange'),
+    ]
+
+    operations = [
+        # Only does work when unapplied, after RemoveField has rebuilt the table
+        migrations.RunPython(migrations.RunPython.noop, create_fts_triggers),
+        migrations.AddField(
+            model_name='quote',
+            name='counters_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['counters_changed_at'], name='quote_counters_changed_idx'),
+        ),
+        migrations.RunPython(create_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_counters_changed_at, migrations.RunPython.noop),
+    ]
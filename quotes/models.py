@@ -1,6 +1,77 @@
+import hashlib
+import unicodedata
+
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+MAX_QUOTES_PER_SOURCE = 3
+SOURCE_LIMIT_MESSAGE = "A single source cannot have more than 3 quotes."
+
+
+def content_hash_for(text: str, source: str) -> str:
+    """SHA-1 of the NFC-normalized, whitespace-collapsed text and source."""
+    normalized_text = " ".join(unicodedata.normalize("NFC", text or "").split())
+    normalized_source = " ".join(unicodedata.normalize("NFC", source or "").split())
+    return hashlib.sha1(f"{normalized_text}\x00{normalized_source}".encode("utf-8")).hexdigest()
+
+
+class Source(models.Model):
+    """Denormalized per-source quote count, kept in step with Quote inside the same transaction."""
+
+    name = models.CharField(max_length=255, unique=True)
+    quote_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.quote_count})"
+
+    @classmethod
+    def reserve(cls, name: str) -> bool:
+        """Count one more quote for ``name``; return False if the source is already full."""
+        # A single upsert both checks and increments, so concurrent saves cannot overshoot the limit.
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (name, quote_count) VALUES (%s, 1) "
+                f"ON CONFLICT (name) DO UPDATE SET quote_count = {table}.quote_count + 1 "
+                f"WHERE {table}.quote_count < %s",
+                [name, MAX_QUOTES_PER_SOURCE],
+            )
+            return cursor.rowcount == 1
+
+    @classmethod
+    def release(cls, name: str) -> None:
+        cls.objects.filter(name=name, quote_count__gt=0).update(quote_count=F("quote_count") - 1)
+
+    @classmethod
+    def quote_count_for(cls, name: str) -> int:
+        try:
+            return cls.objects.values_list("quote_count", flat=True).get(name=name)
+        except cls.DoesNotExist:
+            return 0
+
+    @classmethod
+    def sync(cls, names=None) -> None:
+        """Recount sources from the Quote table, e.g. after bulk operations that bypass save()."""
+        from django.db.models import Count
+
+        quotes = Quote.objects.order_by()
+        if names is not None:
+            names = list(names)
+            quotes = quotes.filter(source__in=names)
+            cls.objects.filter(name__in=names).update(quote_count=0)
+        else:
+            cls.objects.update(quote_count=0)
+        counts = quotes.values("source").annotate(n=Count("id")).values_list("source", "n")
+        cls.objects.bulk_create(
+            [cls(name=name, quote_count=n) for name, n in counts],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["quote_count"],
+            batch_size=500,
+        )
 
 
 class Quote(models.Model):
@@ -12,23 +83,92 @@ class Quote(models.Model):
     dislikes = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set by counter flushes only, so updated_at keeps meaning "last edited" (see quotes.leaderboard)
+    counters_changed_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Compact stand-in for the (text, source) pair in the uniqueness index and duplicate lookups
+    content_hash = models.CharField(max_length=40, editable=False)
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=["text", "source"], name="uniq_source_text"),
+            models.UniqueConstraint(
+                fields=["content_hash"],
+                name="uniq_quote_content_hash",
+                violation_error_message="This quote from the same source already exists.",
+            ),
+        ]
+        indexes = [
+            # Meta.ordering and the popular leaderboard (ORDER BY -likes, -views, -created_at, -id).
+            # Ascending columns scanned backwards also yield the implicit rowid in descending order.
+            models.Index(fields=["likes", "views", "created_at"], name="quote_popular_idx"),
+            # Popular page filtered by source, and the per-source quote count
+            models.Index(fields=["source", "likes", "views", "created_at"], name="quote_source_popular_idx"),
+            # Leaderboard delta job (counters_changed_at >= watermark OR updated_at >= watermark)
+            models.Index(fields=["updated_at"], name="quote_updated_at_idx"),
+            models.Index(fields=["counters_changed_at"], name="quote_counters_changed_idx"),
         ]
         ordering = ["-likes", "-views", "-created_at"]
 
     def __str__(self) -> str:
         return f"{self.source}: {self.text[:50]}" if self.text else self.source
 
+    # Source as last read from or written to the database; None for new quotes
+    _loaded_source = None
+    # (text, source, weight) that last passed full validation
+    _validated_state = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "source" in field_names:
+            instance._loaded_source = values[field_names.index("source")]
+        return instance
+
+    def _source_changed(self) -> bool:
+        return self._state.adding or self.source != self._loaded_source
+
+    def _validation_state(self) -> tuple:
+        return (self.text, self.source, self.weight)
+
+    def mark_validated(self) -> None:
+        """Record that the current values passed validation, so save() does not repeat it."""
+        self._validated_state = self._validation_state()
+
     def clean(self) -> None:
-        # Enforce max 3 quotes per source
-        existing_count = Quote.objects.filter(source=self.source).exclude(pk=self.pk).count()
-        if existing_count >= 3:
-            raise ValidationError({"source": "A source cannot have more than 3 quotes."})
+        self.content_hash = content_hash_for(self.text, self.source)
+        # Enforce max 3 quotes per source with one indexed lookup, only when the quote joins a source
+        if self._source_changed() and Source.quote_count_for(self.source) >= MAX_QUOTES_PER_SOURCE:
+            raise ValidationError({"source": SOURCE_LIMIT_MESSAGE})
+
+    def full_clean(self, exclude=None, validate_unique=True, validate_constraints=True):
+        super().full_clean(exclude, validate_unique, validate_constraints)
+        if exclude is None and validate_unique and validate_constraints:
+            self.mark_validated()
 
     def save(self, *args, **kwargs):
+        self.content_hash = content_hash_for(self.text, self.source)
         # Ensure model-level validations run on save paths outside forms/admin
-        self.full_clean()
-        return super().save(*args, **kwargs)
+        if self._validated_state != self._validation_state():
+            self.full_clean()
+        if not self._source_changed():
+            return super().save(*args, **kwargs)
+        if not self._state.adding and self._loaded_source is None:
+            self._loaded_source = Quote.objects.values_list("source", flat=True).get(pk=self.pk)
+        with transaction.atomic():
+            if not Source.reserve(self.source):
+                raise ValidationError({"source": SOURCE_LIMIT_MESSAGE})
+            if self._loaded_source is not None:
+                Source.release(self._loaded_source)
+            result = super().save(*args, **kwargs)
+        self._loaded_source = self.source
+        return result
+
+
+class QuoteChange(models.Model):
+    """Append-only log of quote changes; the newest id is the corpus version (see quotes/versioning.py)."""
+
+    # No foreign key: the row must outlive the deleted quote it records. NULL marks a bulk change.
+    quote_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"#{self.pk}: {self.quote_id if self.quote_id is not None else 'bulk'}"
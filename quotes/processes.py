@@ -0,0 +1,16 @@
+"""
+Helpers for per-worker state kept outside the process (metrics snapshots and similar files named by PID).
+"""
+
+import os
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with ``pid`` exists; one owned by another user counts as alive."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,283 @@
+"""
+On-demand cProfile capture of single requests.
+
+``ProfilingMiddleware`` runs a request under ``cProfile`` when one of these
+triggers fires:
+
+``header``
+    The request carries ``X-Profile`` with a value from ``profile_token()``
+    (``manage.py profiles token``); it is signed with ``SECRET_KEY``, profiles
+    a single request (its nonce is claimed in the shared cache) and expires
+    after ``TOKEN_MAX_AGE`` seconds if unused.
+``sample``
+    A random ``SAMPLE_RATE`` fraction of requests.
+``slow``
+    A request slower than ``SLOW_THRESHOLD`` seconds cannot be profiled after
+    the fact, so it arms its URL name and the next ``ARMED_REQUESTS`` requests
+    to that route in this worker are profiled.
+
+Each capture writes ``<stem>.prof`` (pstats format) and ``<stem>.json`` (the
+request, timing and every SQL statement with its duration and the types of
+its parameters, never their values) to ``DIRECTORY``.
+The oldest captures are deleted once there are more than ``MAX_CAPTURES`` or
+they take more than ``MAX_BYTES``. ``manage.py profiles`` lists and
+summarizes them.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .querytrace import observe_queries
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DIRECTORY": None,
+    "SAMPLE_RATE": 0.0,
+    "SLOW_THRESHOLD": None,
+    "ARMED_REQUESTS": 1,
+    "TOKEN_MAX_AGE": 300,
+    "MAX_CAPTURES": 200,
+    "MAX_BYTES": 100 * 1024 * 1024,
+}
+HEADER = "X-Profile"
+TOKEN_SALT = "quotes.profiling"
+# Parameter types of a query are kept, cut to this many characters; values can be session keys or password hashes
+MAX_PARAMS_LENGTH = 200
+
+
+def profiling_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_PROFILING", {})}
+
+
+def profile_directory() -> Path:
+    directory = profiling_settings()["DIRECTORY"] or Path(settings.BASE_DIR) / "logs" / "profiles"
+    return Path(directory)
+
+
+def profile_token() -> str:
+    """A value for the ``X-Profile`` header that profiles one request within ``TOKEN_MAX_AGE`` seconds."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(secrets.token_hex(8))
+
+
+def _valid_token(value: str) -> bool:
+    max_age = profiling_settings()["TOKEN_MAX_AGE"]
+    try:
+        nonce = signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    # Single use across workers: only the first request to claim the nonce is profiled
+    return cache.add(f"{TOKEN_SALT}:{nonce}", 1, max_age)
+
+
+def _param_types(params, many: bool) -> str:
+    if params is None:
+        return ""
+    if many:
+        return "executemany"
+    if isinstance(params, dict):
+        return repr({key: type(value).__name__ for key, value in params.items()})
+    return repr(tuple(type(value).__name__ for value in params))
+
+
+class QueryLog:
+    """Query observer that keeps every statement with its duration."""
+
+    def __init__(self) -> None:
+        self.queries: List[dict] = []
+
+    def __call__(self, sql, params, many, seconds):
+        self.queries.append({
+            "sql": sql,
+            "params": _param_types(params, many)[:MAX_PARAMS_LENGTH],
+            "many": many,
+            "time_ms": seconds * 1000,
+        })
+
+
+def captures(directory: Optional[Path] = None) -> List[Path]:
+    """Capture metadata files, oldest first."""
+    directory = directory or profile_directory()
+    return sorted(directory.glob("*.json"), key=lambda path: path.name)
+
+
+def enforce_budget(directory: Optional[Path] = None) -> int:
+    """Delete the oldest captures beyond the count and size limits; return how many were removed."""
+    config = profiling_settings()
+    paths = captures(directory)
+    sizes = {path: path.stat().st_size + _size(path.with_suffix(".prof")) for path in paths}
+    total, removed = sum(sizes.values()), 0
+    while paths and (len(paths) > config["MAX_CAPTURES"] or total > config["MAX_BYTES"]):
+        oldest = paths.pop(0)
+        total -= sizes[oldest]
+        oldest.with_suffix(".prof").unlink(missing_ok=True)
+        oldest.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class _NullProfiler:
+    def disable(self) -> None:
+        pass
+
+
+class ProfilingMiddleware:
+    """Profile requests chosen by a signed header, sampling or a slow previous request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+        # URL name -> profiled requests still owed after a slow one
+        self._armed: Dict[str, int] = {}
+
+    def _trigger(self, request) -> Optional[str]:
+        config = profiling_settings()
+        token = request.headers.get(HEADER)
+        if token and _valid_token(token):
+            return "header"
+        if config["SAMPLE_RATE"] and random.random() < config["SAMPLE_RATE"]:
+            return "sample"
+        if self._armed:
+            try:
+                view = resolve(request.path_info).view_name
+            except Resolver404:
+                return None
+            with self._lock:
+                remaining = self._armed.get(view, 0)
+                if remaining:
+                    if remaining == 1:
+                        del self._armed[view]
+                    else:
+                        self._armed[view] = remaining - 1
+                    return "slow"
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = profiling_settings()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+        trigger = self._trigger(request)
+        # cProfile allows one active profiler at a time, so concurrent triggers in threaded workers run unprofiled
+        if trigger is not None and self._profiling.acquire(blocking=False):
+            try:
+                queries, profiler, started_at, start = self._start()
+                with observe_queries(queries):
+                    try:
+                        response = self.get_response(request)
+                    finally:
+                        profiler.disable()
+                self._finish(request, response, profiler, queries, trigger, started_at, start)
+                return response
+            finally:
+                self._profiling.release()
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._check_latency(request, start)
+        return response
+
+    async def __acall__(self, request):
+        # Under ASGI the profile covers the event loop thread (other requests' coroutines included);
+        # ORM work shows up as time awaiting sync_to_async, and the SQL log still lists it.
+        config = profiling_settings()
+        if not config["ENABLED"]:
+            return await self.get_response(request)
+        trigger = self._trigger(request)
+        if trigger is not None and self._profiling.acquire(blocking=False):
+            try:
+                queries, profiler, started_at, start = self._start()
+                with observe_queries(queries):
+                    try:
+                        response = await self.get_response(request)
+                    finally:
+                        profiler.disable()
+                self._finish(request, response, profiler, queries, trigger, started_at, start)
+                return response
+            finally:
+                self._profiling.release()
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._check_latency(request, start)
+        return response
+
+    def _check_latency(self, request, start: float) -> None:
+        config = profiling_settings()
+        threshold = config["SLOW_THRESHOLD"]
+        if threshold is not None and time.perf_counter() - start > threshold and request.resolver_match:
+            with self._lock:
+                self._armed[request.resolver_match.view_name] = config["ARMED_REQUESTS"]
+
+    def _start(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool owns the interpreter's profile hook; keep the SQL log only
+            profiler = _NullProfiler()
+        return QueryLog(), profiler, timezone.now(), time.perf_counter()
+
+    def _finish(self, request, response, profiler, queries, trigger, started_at, start) -> None:
+        elapsed = time.perf_counter() - start
+        try:
+            self._save(request, response, profiler, queries, trigger, started_at, elapsed)
+        except OSError:
+            logger.warning("Could not write a request profile", exc_info=True)
+
+    def _save(self, request, response, profiler, queries, trigger, started_at, elapsed) -> None:
+        directory = profile_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        view = request.resolver_match.view_name if request.resolver_match else "unresolved"
+        # Sortable by time; unique per worker
+        stem = "{}-{}-{}-{}".format(
+            started_at.strftime("%Y%m%dT%H%M%S%f"), os.getpid(), re.sub(r"[^\w.-]+", "_", view), trigger
+        )
+        if not isinstance(profiler, _NullProfiler):
+            profiler.dump_stats(str(directory / f"{stem}.prof"))
+        meta = {
+            "started_at": started_at.isoformat(),
+            "pid": os.getpid(),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": view,
+            "status": response.status_code,
+            "trigger": trigger,
+            "duration_ms": elapsed * 1000,
+            "sql_ms": sum(query["time_ms"] for query in queries.queries),
+            "queries": queries.queries,
+        }
+        with open(directory / f"{stem}.json", "w") as fh:
+            json.dump(meta, fh, indent=1)
+        enforce_budget(directory)
@@ -0,0 +1,60 @@
+"""
+Per-request database query observers that work for sync and async views.
+
+``connection.execute_wrapper()`` applies to one connection object, and
+connections are per thread, while async views run their queries in
+``sync_to_async`` threads. ``observe_queries()`` instead keeps the observers
+in a context variable, which asgiref copies into those threads, and one
+wrapper installed on every connection reports each query to the observers of
+the current context.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# observer(sql, params, many, seconds)
+_observers: ContextVar[tuple] = ContextVar("quotes_query_observers", default=())
+
+
+def _report(execute, sql, params, many, context):
+    observers = _observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for observer in observers:
+            observer(sql, params, many, elapsed)
+
+
+def install(connection) -> None:
+    if _report not in connection.execute_wrappers:
+        # Outermost, so a surrounding connection.execute_wrapper() block still pops its own wrapper
+        connection.execute_wrappers.insert(0, _report)
+
+
+@receiver(connection_created)
+def _install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+@contextmanager
+def observe_queries(observer: Callable):
+    """Report every query made in this context (and threads it hands work to) to ``observer``."""
+    for alias in connections:
+        install(connections[alias])  # connections opened before this module was imported
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
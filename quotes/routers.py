@@ -0,0 +1,38 @@
+"""
+Database router for a primary + read-only connection pair.
+
+Reads of the ``quotes`` app's models (the read-only view queries: random
+draws, the popular board, search) go to the ``replica`` alias, a query-only
+connection to the same SQLite file; in WAL mode it reads a consistent
+snapshot without waiting for the writer. Everything else (sessions, auth,
+admin) stays on ``default``, as do reads issued inside a transaction on the
+primary, so code that reads what it just wrote (quota checks, delete
+collectors) sees its own uncommitted changes. Writes and migrations always
+use ``default``.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+REPLICA_APPS = frozenset({"quotes"})
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label not in REPLICA_APPS
+            or REPLICA_DB_ALIAS not in connections.settings
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
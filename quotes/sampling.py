@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import bisect
+import os
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+
+from .metrics import observe_draw
+
+
+class WeightedIndex:
+    """Fenwick tree over compact (quote id, weight) arrays.
+
+    Drawing ``randint(1, total)`` and locating the first slot whose running
+    weight reaches it gives every id a probability of ``weight / total`` —
+    the same distribution as scanning the table — in O(log n). Weight changes
+    are O(log n); removed ids leave a zero-weight slot that is reused or
+    dropped on the next compaction.
+
+    ``find``/``sample`` can leave out a few ids (a visitor's recent quotes)
+    without touching the shared tree: the descent subtracts their weight from
+    every node it reads, looked up in their sorted slots, and draws from the
+    remaining ids in proportion to their weights. For k excluded ids that is
+    O(k log k) to sort the slots plus O(log n · log k) for the descent. The
+    random page passes at most ``QUOTES_HISTORY["SIZE"]`` ids (5 by default),
+    so k is a small constant and a draw stays O(log n) in the corpus size;
+    the sampler benchmark's ``--recent`` option measures the difference.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, int]] = ()) -> None:
+        self._rebuild(list(items))
+
+    def _rebuild(self, items: list, capacity: int = 0) -> None:
+        size = max(capacity, len(items), 1)
+        self._ids = array("q", [0]) * size
+        self._weights = array("q", [0]) * size
+        self._tree = array("q", [0]) * (size + 1)
+        self._slots: dict = {}
+        self._free: list = []
+        for slot, (pk, weight) in enumerate(items):
+            self._ids[slot] = pk
+            self._weights[slot] = weight
+            self._slots[pk] = slot
+        self._free = list(range(size - 1, len(items) - 1, -1))
+        tree = self._tree
+        for i in range(1, size + 1):
+            tree[i] += self._weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._step = 1 << (size.bit_length() - 1)
+        self._total = sum(self._weights)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, pk: int) -> bool:
+        return pk in self._slots
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def weight(self, pk: int) -> int:
+        slot = self._slots.get(pk)
+        return 0 if slot is None else self._weights[slot]
+
+    def _add(self, slot: int, delta: int) -> None:
+        tree, size = self._tree, len(self._weights)
+        i = slot + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+        self._weights[slot] += delta
+        self._total += delta
+
+    def set(self, pk: int, weight: int) -> None:
+        weight = max(int(weight or 0), 0)
+        slot = self._slots.get(pk)
+        if slot is None:
+            if not self._free:
+                live = [(p, self._weights[s]) for p, s in sorted(self._slots.items())]
+                self._rebuild(live, capacity=2 * len(self._weights))
+            slot = self._free.pop()
+            self._ids[slot] = pk
+            self._slots[pk] = slot
+        self._add(slot, weight - self._weights[slot])
+
+    def discard(self, pk: int) -> None:
+        slot = self._slots.pop(pk, None)
+        if slot is None:
+            return
+        self._add(slot, -self._weights[slot])
+        self._ids[slot] = 0
+        self._free.append(slot)
+        if len(self._free) > 2 * len(self._slots) + 64:
+            live = [(p, self._weights[s]) for p, s in sorted(self._slots.items())]
+            self._rebuild(live)
+
+    def _excluded(self, exclude: Iterable[int]) -> Tuple[List[int], List[int]]:
+        """Sorted Fenwick positions (slot + 1) of the excluded ids, and running sums of their weights; O(k log k)."""
+        slots = sorted({self._slots[pk] for pk in exclude if pk in self._slots})
+        positions, sums, running = [], [0], 0
+        for slot in slots:
+            positions.append(slot + 1)
+            running += self._weights[slot]
+            sums.append(running)
+        return positions, sums
+
+    def find(self, target: int, exclude: Iterable[int] = ()) -> int:
+        """Return the id of the first slot whose running weight, not counting ``exclude``, is >= ``target``."""
+        return self._find(target, *self._excluded(exclude))
+
+    def _find(self, target: int, positions: List[int], sums: List[int]) -> int:
+        tree, size = self._tree, len(self._weights)
+        pos, remaining, step = 0, target, self._step
+        # Excluded weight at or before position ``pos``
+        skipped = 0
+        while step:
+            nxt = pos + step
+            if nxt <= size:
+                node = tree[nxt]
+                if positions:
+                    within = sums[bisect.bisect_right(positions, nxt)]
+                    node -= within - skipped
+                if node < remaining:
+                    pos = nxt
+                    remaining -= node
+                    if positions:
+                        skipped = within
+            step >>= 1
+        return self._ids[pos]
+
+    def sample(self, exclude: Iterable[int] = ()) -> Optional[int]:
+        """Weighted draw; ids in ``exclude`` are skipped unless nothing else has weight."""
+        positions, sums = self._excluded(exclude) if exclude else ([], [0])
+        total = self._total - sums[-1]
+        if total <= 0:
+            # Everything left is excluded (or the index is empty): a repeat beats no quote
+            positions, sums, total = [], [0], self._total
+        if total <= 0:
+            return None
+        return self._find(random.randint(1, total), positions, sums)
+
+
+class QuoteSampler:
+    """Per-worker weighted index over all quotes, loaded lazily.
+
+    The index is built with a single ``(id, weight)`` query on first use and
+    then kept current by the ``post_save``/``post_delete`` handlers in
+    ``quotes.signals``. Changes made by other processes arrive as per-quote
+    deltas through the corpus version (``quotes.versioning``).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._index: Optional[WeightedIndex] = None
+        self._pid = os.getpid()
+        # Bumped by invalidate(), so a load that started before it does not install its index
+        self._generation = 0
+        # One log per load in progress: (pk, weight or None for a discard) seen while it reads the table
+        self._logs: List[list] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None and self._pid == os.getpid()
+
+    def _ensure_loaded(self) -> WeightedIndex:
+        index = self._index if self.loaded else None
+        return index if index is not None else self.load()
+
+    def load(self) -> WeightedIndex:
+        """Build the index from the table and install it; return it.
+
+        The table is read outside the lock so draws go on meanwhile. Updates
+        and discards that arrive during the read are logged and replayed onto
+        the new index before it is swapped in, so none are lost. If the sampler
+        was invalidated meanwhile, the index serves the caller but is not kept.
+        """
+        from .models import Quote
+
+        log: list = []
+        with self._lock:
+            generation = self._generation
+            self._logs.append(log)
+        try:
+            rows = Quote.objects.order_by("id").values_list("id", "weight")
+            index = WeightedIndex((pk, int(weight or 0)) for pk, weight in rows.iterator(chunk_size=10000))
+        except BaseException:
+            with self._lock:
+                self._logs.remove(log)
+            raise
+        # Replay and swap under one acquisition, so no change falls between the log and the new index
+        with self._lock:
+            self._logs.remove(log)
+            for pk, weight in log:
+                if weight is None:
+                    index.discard(pk)
+                else:
+                    index.set(pk, weight)
+            if generation == self._generation:
+                self._index = index
+                self._pid = os.getpid()
+        return index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def count(self) -> Optional[int]:
+        """Quotes in the loaded index, or None if this worker has not loaded it."""
+        index = self._index if self.loaded else None
+        return None if index is None else len(index)
+
+    def update(self, pk: int, weight: int) -> None:
+        self._change(pk, weight)
+
+    def discard(self, pk: int) -> None:
+        self._change(pk, None)
+
+    def _change(self, pk: int, weight: Optional[int]) -> None:
+        with self._lock:
+            for log in self._logs:
+                log.append((pk, weight))
+            if not self.loaded:
+                return
+            if weight is None:
+                self._index.discard(pk)
+            else:
+                self._index.set(pk, weight)
+
+    def draw(self, exclude: Iterable[int] = ()) -> Optional[int]:
+        """Weighted draw of one id, skipping the ids in ``exclude`` while anything else is left."""
+        return self._draw(self._ensure_loaded(), exclude)
+
+    async def adraw(self, exclude: Iterable[int] = ()) -> Optional[int]:
+        """``draw`` for async views: only loading the index runs in a worker thread."""
+        index = self._index if self.loaded else None
+        if index is None:
+            index = await sync_to_async(self._ensure_loaded)()
+        return self._draw(index, exclude)
+
+    def _draw(self, index: WeightedIndex, exclude: Iterable[int]) -> Optional[int]:
+        start = time.perf_counter()
+        with self._lock:
+            pk = index.sample(exclude)
+        observe_draw("one", time.perf_counter() - start)
+        return pk
+
+    def draw_many(self, count: int, exclude: Sequence[int] = (), window: int = 0) -> List[int]:
+        """Draw ``count`` ids (with replacement) that never repeat any of the previous ``window`` ids.
+
+        The window slides over the batch as it is drawn and starts out holding
+        ``exclude`` (newest first, like the history cookie), so the first ids
+        also avoid what the visitor saw last. ``window=0`` draws independently.
+        """
+        index = self._ensure_loaded()
+        recent = deque(reversed(exclude[:window]), maxlen=window)
+        ids = []
+        start = time.perf_counter()
+        with self._lock:
+            if index.total > 0:
+                for _ in range(count):
+                    ids.append(index.sample(recent))
+                    recent.append(ids[-1])
+        observe_draw("many", time.perf_counter() - start)
+        return ids
+
+sampler = QuoteSampler()
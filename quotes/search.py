@@ -0,0 +1,147 @@
+"""
+Ranked full-text search over quotes.
+
+On SQLite, queries go to the ``quotes_quote_fts`` FTS5 index (migration
+0006), which triggers keep in step with ``quotes_quote``. User input is
+split into words and each word is quoted, so it cannot inject FTS5
+operators; every word must match, and the last one also matches as a
+prefix so results appear while typing. Results are ordered by bm25 with
+matches in ``source`` weighted above matches in ``text``. Other database
+backends fall back to ``icontains``.
+
+The triggers are invisible to Django's migration state, so a later migration
+that rebuilds ``quotes_quote`` drops them; ``check_fts_index`` is a database
+system check (``manage.py check --database default``) that catches that.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from django.core import checks
+from django.db import connection, connections, router
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Quote
+
+FTS_TABLE = "quotes_quote_fts"
+# bm25() column weights for (text, source)
+RANK = f"bm25({FTS_TABLE}, 1.0, 2.0)"
+FTS_TRIGGERS = ("quotes_quote_fts_insert", "quotes_quote_fts_delete", "quotes_quote_fts_update")
+# Private-use sentinels for highlight(), swapped for <mark> after the text is escaped
+_OPEN, _CLOSE = "\ue000", "\ue001"
+
+
+def fts_available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def check_fts_index(app_configs=None, databases=None, **kwargs) -> List[checks.CheckMessage]:
+    """Report SQLite databases whose migrated quotes table lacks the FTS5 index or one of its triggers."""
+    errors = []
+    table = Quote._meta.db_table
+    for alias in databases or ():
+        conn = connections[alias]
+        if conn.vendor != "sqlite" or not router.allow_migrate_model(alias, Quote):
+            continue
+        with conn.cursor() as cursor:
+            tables = conn.introspection.table_names(cursor)
+            if table not in tables:
+                continue  # not migrated yet
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+            present = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in (FTS_TABLE, *FTS_TRIGGERS) if name not in present and name not in tables]
+        if missing:
+            errors.append(checks.Error(
+                f"Full-text search objects missing on database {alias!r}: {', '.join(missing)}; "
+                "search results go stale.",
+                hint="A migration that rebuilt quotes_quote dropped them; re-run the CREATE statements of "
+                     "quotes/migrations/0006_quote_search.py in a new migration.",
+                obj=Quote,
+                id="quotes.E001",
+            ))
+    return errors
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression, or None if it has no words."""
+    terms = "".join(c if c.isalnum() else " " for c in query or "").split()
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def matching(queryset: QuerySet, query: str) -> QuerySet:
+    """Restrict ``queryset`` to quotes matching ``query``, keeping its ordering."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset
+    if not fts_available():
+        return queryset.filter(Q(text__icontains=query) | Q(source__icontains=query))
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+
+
+def _cursor():
+    return connections[router.db_for_read(Quote)].cursor()
+
+
+def _highlight(value: str) -> SafeString:
+    return mark_safe(escape(value).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>"))
+
+
+class SearchResults:
+    """Lazy, ranked result list for ``Paginator``: ``count()`` and slicing each run one query."""
+
+    def __init__(self, query: str) -> None:
+        self.query = query
+        self.expression = match_expression(query)
+        self._count: Optional[int] = None
+
+    def count(self) -> int:
+        if self._count is None:
+            if self.expression is None:
+                self._count = 0
+            elif fts_available():
+                with _cursor() as cursor:
+                    cursor.execute(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [self.expression])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = matching(Quote.objects.all(), self.query).count()
+        return self._count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        limit = (item.stop if item.stop is not None else self.count()) - start
+        if self.expression is None or limit <= 0:
+            return []
+        if not fts_available():
+            quotes = list(matching(Quote.objects.order_by("-likes", "-id"), self.query)[start:start + limit])
+            for quote in quotes:
+                quote.highlighted_text, quote.highlighted_source = escape(quote.text), escape(quote.source)
+            return quotes
+        with _cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, highlight({FTS_TABLE}, 0, %s, %s), highlight({FTS_TABLE}, 1, %s, %s) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {RANK} LIMIT %s OFFSET %s",
+                [_OPEN, _CLOSE, _OPEN, _CLOSE, self.expression, limit, start],
+            )
+            hits = cursor.fetchall()
+        found = Quote.objects.order_by().in_bulk([pk for pk, _, _ in hits])
+        results: List[Quote] = []
+        for pk, text, source in hits:
+            quote = found.get(pk)
+            if quote is None:
+                continue
+            quote.highlighted_text, quote.highlighted_source = _highlight(text), _highlight(source)
+            results.append(quote)
+        return results
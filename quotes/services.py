@@ -1,19 +1,105 @@
 from __future__ import annotations
 
 import random
-from typing import Optional
+from collections import deque
+from typing import Collection, List, Optional, Sequence
 
-from django.db.models import Sum
+from django.conf import settings
+from django.db.models import F, QuerySet, Sum, Value, Window
+from django.db.models.functions import Floor
 
+from .history import history_settings
 from .models import Quote
+from .sampling import sampler
 
-def pick_weighted_quote() -> Optional[Quote]:
-    total_weight = Quote.objects.aggregate(Sum("weight")).get("weight__sum") or 0
+SAMPLER_STRATEGIES = ("index", "sql", "scan")
+
+
+def pick_weighted_quote(strategy: Optional[str] = None, exclude: Collection[int] = ()) -> Optional[Quote]:
+    """Weighted random quote, leaving out the ids in ``exclude`` unless no other quote has weight."""
+    strategy = strategy or getattr(settings, "QUOTES_SAMPLER_STRATEGY", "index")
+    if strategy == "index":
+        return _pick_from_index(exclude)
+    if strategy in ("sql", "scan"):
+        pick = _pick_with_window if strategy == "sql" else _pick_with_scan
+        quote = pick(Quote.objects.exclude(pk__in=exclude) if exclude else Quote.objects.all())
+        if quote is None and exclude:
+            quote = pick(Quote.objects.all())
+        return quote
+    raise ValueError(f"Unknown sampler strategy {strategy!r}, expected one of {SAMPLER_STRATEGIES}")
+
+
+def pick_weighted_quotes(count: int, strategy: Optional[str] = None, exclude: Sequence[int] = ()) -> List[Quote]:
+    """Draw ``count`` quotes with the pick_weighted_quote distribution, for a client that shows them in order.
+
+    No quote repeats any of the ``QUOTES_HISTORY["SIZE"]`` quotes shown before
+    it, counting ``exclude`` (newest first) as shown just before the batch,
+    unless no other quote has weight.
+    """
+    strategy = strategy or getattr(settings, "QUOTES_SAMPLER_STRATEGY", "index")
+    window = history_settings()["SIZE"]
+    if strategy != "index":
+        recent = deque(reversed(exclude[:window]), maxlen=window)
+        quotes = []
+        for _ in range(count):
+            quote = pick_weighted_quote(strategy, exclude=recent)
+            if quote is None:
+                break
+            quotes.append(quote)
+            recent.append(quote.pk)
+        return quotes
+    for _ in range(2):
+        ids = sampler.draw_many(count, exclude, window)
+        found = Quote.objects.order_by().in_bulk(set(ids))
+        if len(found) == len(set(ids)):
+            return [found[pk] for pk in ids]
+        # Some ids were deleted by another worker; reload the index and draw again.
+        sampler.invalidate()
+    return [found[pk] for pk in ids if pk in found]
+
+
+def _pick_from_index(exclude: Collection[int] = ()) -> Optional[Quote]:
+    for _ in range(2):
+        pk = sampler.draw(exclude)
+        if pk is None:
+            return None
+        try:
+            return Quote.objects.get(pk=pk)
+        # The index can lag behind the table when another worker deleted the quote; reload it and draw again.
+        except Quote.DoesNotExist:
+            sampler.invalidate()
+    # If failed, return something if possible
+    return _heaviest_quote(exclude)
+
+
+def _heaviest_quote(exclude: Collection[int] = ()) -> Optional[Quote]:
+    """Fallback when weighted draws fail: the heaviest quote not in ``exclude``, else the heaviest of all."""
+    best = Quote.objects.order_by("-weight", "-likes")
+    return (best.exclude(pk__in=exclude).first() if exclude else None) or best.first()
+
+
+def _pick_with_window(quotes: QuerySet) -> Optional[Quote]:
+    # Whole draw in one statement: running SUM(weight) OVER (ORDER BY id) against a target of
+    # floor(u * total) + 1, which is uniform over 1..total like randint(1, total). WHERE conditions on
+    # ``quotes`` apply before the window sums, so excluded ids drop out of both.
+    return (
+        quotes.annotate(
+            cumulative=Window(Sum("weight"), order_by=F("id").asc()),
+            total=Window(Sum("weight")),
+        )
+        .filter(cumulative__gte=Floor(F("total") * Value(random.random())) + 1)
+        .order_by("id")
+        .first()
+    )
+
+
+def _pick_with_scan(quotes: QuerySet) -> Optional[Quote]:
+    total_weight = quotes.aggregate(Sum("weight")).get("weight__sum") or 0
     if total_weight <= 0:
         return None
     target = random.randint(1, total_weight)
     cumulative = 0
-    for row in Quote.objects.order_by("id").values("id", "weight"):
+    for row in quotes.order_by("id").values("id", "weight"):
         cumulative += int(row["weight"]) or 0
         if cumulative >= target:
             try:
@@ -22,4 +108,4 @@ def pick_weighted_quote() -> Optional[Quote]:
             except Quote.DoesNotExist:
                 continue
     # If failed, return something if possible
-    return Quote.objects.order_by("-weight", "-likes").first()
+    return quotes.order_by("-weight", "-likes").first()
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .leaderboard import leaderboard
+from .models import Quote, Source
+from .sampling import sampler
+from .versioning import record_change
+
+
+@receiver(post_save, sender=Quote)
+def quote_saved(sender, instance: Quote, **kwargs) -> None:
+    sampler.update(instance.pk, instance.weight)
+    leaderboard.mark_stale()
+    record_change(instance.pk)
+
+
+@receiver(post_delete, sender=Quote)
+def quote_deleted(sender, instance: Quote, **kwargs) -> None:
+    # Runs inside the delete's transaction, so the count stays in step with the table
+    Source.release(instance.source)
+    sampler.discard(instance.pk)
+    leaderboard.discard(instance.pk)
+    record_change(instance.pk)
@@ -0,0 +1,235 @@
+"""
+Django cache backend shared by every worker process on a host.
+
+Entries live in one SQLite database in WAL mode, by default under
+``/dev/shm`` so it never touches disk. Each process (and thread) keeps its
+own connection; WAL lets readers proceed while one writer commits, so the
+cache stays warm across gunicorn workers and ``max_requests`` recycling.
+
+* TTL: every row stores its absolute expiry; expired rows are ignored on
+  read and removed when the table is culled.
+* LRU: reads refresh a row's ``accessed`` time (at most once per
+  ``ACCESS_RESOLUTION`` seconds, to keep reads from turning into writes).
+  When the table grows past ``MAX_ENTRIES``, expired rows go first, then
+  the least recently used ``1/CULL_FREQUENCY`` of the rest.
+* Atomic increments: integers are stored unpickled, so ``incr`` is a
+  single ``UPDATE ... SET value = value + ? RETURNING value``.
+
+Configure it with::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "quotes.sqlite_cache.SQLiteCache",
+            "LOCATION": "/dev/shm/quotes-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache_lookups
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+)
+# Rows whose expiry is NULL never expire
+LIVE = "(expires IS NULL OR expires > ?)"
+
+
+def _dumps(value) -> object:
+    # Plain ints are stored as SQLite integers so incr() can be a single UPDATE
+    if type(value) is int and -(2 ** 63) <= value < 2 ** 63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(value) -> object:
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location: str, params: dict) -> None:
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location or "/dev/shm/django-cache.sqlite3"
+        self._busy_timeout = int(options.get("BUSY_TIMEOUT", 5000))
+        self._access_resolution = float(options.get("ACCESS_RESOLUTION", 1.0))
+        # Check the table size every this many writes rather than on each one
+        self._cull_every = max(1, min(100, self._max_entries // 20))
+        self._writes = 0
+        self._local = threading.local()
+
+    # Connection -------------------------------------------------------------
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        local = self._local
+        # Connections must not cross a fork (gunicorn preload_app)
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        return local.conn
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=self._busy_timeout / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout = {self._busy_timeout}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        # A cache can lose its last writes on power failure; that is not worth an fsync per set
+        conn.execute("PRAGMA synchronous = OFF")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    # Reads ------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._db.execute(
+            f"SELECT value, accessed FROM cache WHERE key = ? AND {LIVE}", (key, now)
+        ).fetchone()
+        record_cache_lookups(int(row is not None), int(row is None))
+        if row is None:
+            return default
+        if now - row[1] > self._access_resolution:
+            self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return _loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ", ".join("?" * len(key_map))
+        rows = self._db.execute(
+            f"SELECT key, value, accessed FROM cache WHERE key IN ({placeholders}) AND {LIVE}",
+            (*key_map, now),
+        ).fetchall()
+        record_cache_lookups(len(rows), len(key_map) - len(rows))
+        stale = [(now, key) for key, _, accessed in rows if now - accessed > self._access_resolution]
+        if stale:
+            self._db.executemany("UPDATE cache SET accessed = ? WHERE key = ?", stale)
+        return {key_map[key]: _loads(value) for key, value, _ in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db.execute(f"SELECT 1 FROM cache WHERE key = ? AND {LIVE}", (key, time.time())).fetchone() is not None
+
+    # Writes -----------------------------------------------------------------
+
+    def _wrote(self, count: int = 1) -> None:
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self) -> None:
+        db = self._db
+        if db.execute("SELECT count(*) FROM cache").fetchone()[0] <= self._max_entries:
+            return
+        db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count = db.execute("SELECT count(*) FROM cache").fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries + count // self._cull_frequency
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, _dumps(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._wrote()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        rows = [(self.make_and_validate_key(key, version=version), _dumps(value), expires, now) for key, value in data.items()]
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)", rows)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._wrote(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        # Insert, or take over a row that has expired; a live row is left alone
+        cursor = self._db.execute(
+            "INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, "
+            "accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+            (key, _dumps(value), self.get_backend_timeout(timeout), now, now),
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._wrote()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._db.execute(
+            f"UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND {LIVE}",
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, now = self._db, time.time()
+        row = db.execute(
+            f"UPDATE cache SET value = value + ?, accessed = ? WHERE key = ? AND {LIVE} "
+            "AND typeof(value) = 'integer' RETURNING value",
+            (delta, now, key, now),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        # Missing, expired, or a pickled number: read-modify-write under the write lock
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            found = db.execute(f"SELECT value FROM cache WHERE key = ? AND {LIVE}", (key, now)).fetchone()
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = _loads(found[0]) + delta
+            db.execute("UPDATE cache SET value = ?, accessed = ? WHERE key = ?", (_dumps(value), now, key))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._db.execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys)
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache")
@@ -1,10 +1,52 @@
-from django.test import TestCase, Client
+import csv
+import gzip
+import json
+import logging
+import os
+import runpy
+import sqlite3
+from datetime import timedelta
+from io import BytesIO, StringIO
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.utils import ConnectionHandler
+from asgiref.sync import sync_to_async
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.exceptions import ValidationError
 from django.urls import reverse
+from django.utils import timezone
 
+from . import async_views, exporting, health, metrics, profiling
+from .benchmarks import compare, corpus as benchmark_corpus
+from .counters import CounterBuffer, view_counter, vote_counter
 from .forms import QuoteForm
-from .models import Quote
-from .services import pick_weighted_quote
+from .history import history_settings, recent_quotes
+from .leaderboard import Board, leaderboard
+from .log import JSONFormatter, QueueHandler
+from .models import Quote, QuoteChange, Source, content_hash_for
+from .sampling import WeightedIndex, sampler
+from .routers import ReadReplicaRouter
+from .search import SearchResults, check_fts_index, match_expression
+from .sqlite_cache import SQLiteCache
+from .services import pick_weighted_quote, pick_weighted_quotes
+from .versioning import corpus, corpus_changed, record_bulk_change, record_change
 
 
 class QuoteModelTests(TestCase):
@@ -32,6 +74,20 @@ class QuoteModelTests(TestCase):
                 text="Test quote 1", source="Test Movie", weight=1
             )
 
+    def test_content_hash(self):
+        """Test that the content hash is stored on save and ignores whitespace differences"""
+        self.assertEqual(self.quote1.content_hash, content_hash_for("Test quote 1", "Test Movie"))
+        self.assertEqual(len(self.quote1.content_hash), 40)
+        self.assertNotEqual(content_hash_for("Test quote 1", "Test Movie"), content_hash_for("Test quote 1", "Other"))
+        with self.assertRaises(ValidationError):
+            Quote.objects.create(text="  Test   quote 1 ", source="Test Movie", weight=1)
+
+    def test_content_hash_follows_edits(self):
+        """Test that editing the text recomputes the hash"""
+        self.quote1.text = "Rewritten"
+        self.quote1.save()
+        self.assertEqual(Quote.objects.get(pk=self.quote1.pk).content_hash, content_hash_for("Rewritten", "Test Movie"))
+
     def test_max_quotes_per_source(self):
         """Test that max 3 quotes per source is enforced"""
         # Create 1 more quote for the same source (total will be 3)
@@ -41,6 +97,36 @@ class QuoteModelTests(TestCase):
         with self.assertRaises(ValidationError):
             Quote.objects.create(text="Test quote 4", source="Test Movie", weight=1)
 
+    def test_source_count_tracks_quotes(self):
+        """Test that the per-source counter follows creates, moves and deletes"""
+        self.assertEqual(Source.quote_count_for("Test Movie"), 2)
+        self.quote1.source = "Other Movie"
+        self.quote1.save()
+        self.assertEqual(Source.quote_count_for("Test Movie"), 1)
+        self.assertEqual(Source.quote_count_for("Other Movie"), 1)
+        Quote.objects.get(pk=self.quote2.pk).delete()
+        self.assertEqual(Source.quote_count_for("Test Movie"), 0)
+
+    def test_moving_into_full_source_is_rejected(self):
+        """Test that changing the source respects the limit of the new source"""
+        for i in range(3):
+            Quote.objects.create(text=f"Full {i}", source="Full Movie", weight=1)
+        self.quote1.source = "Full Movie"
+        with self.assertRaises(ValidationError):
+            self.quote1.save()
+        self.assertEqual(Source.quote_count_for("Test Movie"), 2)
+        self.assertEqual(Source.quote_count_for("Full Movie"), 3)
+
+    def test_source_sync(self):
+        """Test that Source.sync recounts after bulk operations"""
+        Quote.objects.bulk_create([
+            Quote(text="Bulk", source="Bulk Movie", weight=1, content_hash=content_hash_for("Bulk", "Bulk Movie")),
+        ])
+        Source.objects.filter(name="Test Movie").update(quote_count=0)
+        Source.sync()
+        self.assertEqual(Source.quote_count_for("Test Movie"), 2)
+        self.assertEqual(Source.quote_count_for("Bulk Movie"), 1)
+
     def test_weight_validation(self):
         """Test that weight must be positive"""
         quote = Quote(text="Test", source="Test", weight=0)
@@ -53,6 +139,34 @@ class QuoteModelTests(TestCase):
         self.assertEqual(str(self.quote1), expected)
 
 
+class ContentHashMigrationTests(TransactionTestCase):
+    """Run 0004_quote_content_hash against rows saved before it."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes("quotes")[0])
+
+    def test_whitespace_variants_merge_into_the_oldest(self):
+        """Test that rows colliding after normalization are merged into the oldest instead of failing"""
+        OldQuote = self.migrate(("quotes", "0003_quote_indexes")).get_model("quotes", "Quote")
+        kept = OldQuote.objects.create(text="Be  yourself", source="Wilde", weight=1, likes=2, views=5)
+        OldQuote.objects.create(text="Be yourself ", source="Wilde", weight=1, likes=1, dislikes=1, views=3)
+        OldQuote.objects.create(text="Be yourself", source=" Wilde", weight=1, views=1)
+        other = OldQuote.objects.create(text="Be someone else", source="Wilde", weight=1)
+        with self.assertLogs("quotes.migrations", "WARNING") as logs:
+            Quote = self.migrate(("quotes", "0004_quote_content_hash")).get_model("quotes", "Quote")
+        self.assertEqual(list(Quote.objects.order_by("id").values_list("id", flat=True)), [kept.pk, other.pk])
+        merged = Quote.objects.get(pk=kept.pk)
+        self.assertEqual((merged.views, merged.likes, merged.dislikes), (9, 3, 1))
+        self.assertEqual(merged.content_hash, content_hash_for("Be yourself", "Wilde"))
+        self.assertIn(f"quote {kept.pk}", logs.output[0])
+
+
 class QuoteFormTests(TestCase):
     def setUp(self):
         Quote.objects.create(text="Existing quote", source="Test Movie", weight=1)
@@ -93,6 +207,25 @@ class QuoteFormTests(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('A single source cannot have more than 3 quotes', str(form.errors))
 
+    def test_add_query_count(self):
+        """Test that adding a quote costs a fixed number of queries, whatever the table size"""
+        form = QuoteForm(data={'text': 'Counted', 'source': 'Test Movie', 'weight': 1})
+        # duplicate lookup, source count, savepoint, reserve, insert, change log, release savepoint
+        with self.assertNumQueries(7):
+            self.assertTrue(form.is_valid())
+            form.save()
+        self.assertEqual(Source.quote_count_for('Test Movie'), 2)
+
+    def test_edit_query_count(self):
+        """Test that editing a quote without moving it skips the source counter"""
+        quote = Quote.objects.get(text='Existing quote')
+        form = QuoteForm(data={'text': 'Edited', 'source': 'Test Movie', 'weight': 3}, instance=quote)
+        # duplicate lookup, update, change log
+        with self.assertNumQueries(3):
+            self.assertTrue(form.is_valid())
+            form.save()
+        self.assertEqual(Source.quote_count_for('Test Movie'), 1)
+
 
 class WeightedSelectionTests(TestCase):
     def setUp(self):
@@ -127,14 +260,994 @@ class WeightedSelectionTests(TestCase):
         self.assertGreater(counts.get(self.quote3.pk, 0), counts.get(self.quote1.pk, 0))
         self.assertGreater(counts.get(self.quote2.pk, 0), counts.get(self.quote1.pk, 0))
 
+    def test_strategies_pick_the_same_quote_for_a_target(self):
+        """Test that the index, SQL and scan strategies agree on the drawn quote"""
+        expected = [(0.0, self.quote1), (0.15, self.quote2), (0.39, self.quote2), (0.4, self.quote3), (0.99, self.quote3)]
+        for fraction, quote in expected:
+            target = int(fraction * 10) + 1
+            with mock.patch("quotes.services.random.random", return_value=fraction), \
+                    mock.patch("quotes.services.random.randint", return_value=target), \
+                    mock.patch("quotes.sampling.random.randint", return_value=target):
+                for strategy in ("index", "sql", "scan"):
+                    self.assertEqual(pick_weighted_quote(strategy), quote, (strategy, fraction))
+
+    def test_every_strategy_honours_exclusions(self):
+        """Test that excluded quotes are never drawn while another quote has weight"""
+        for strategy in ("index", "sql", "scan"):
+            picks = {pick_weighted_quote(strategy, exclude=[self.quote2.pk, self.quote3.pk]) for _ in range(10)}
+            self.assertEqual(picks, {self.quote1}, strategy)
+            everything = [self.quote1.pk, self.quote2.pk, self.quote3.pk]
+            self.assertIsNotNone(pick_weighted_quote(strategy, exclude=everything), strategy)
+
+    def test_index_fallback_honours_exclusions(self):
+        """Test that the fallback after failed draws still skips excluded quotes"""
+        with mock.patch.object(sampler, "draw", return_value=999):
+            self.assertEqual(pick_weighted_quote("index", exclude=[self.quote3.pk]), self.quote2)
+            everything = [self.quote1.pk, self.quote2.pk, self.quote3.pk]
+            self.assertEqual(pick_weighted_quote("index", exclude=everything), self.quote3)
+
+    def test_sql_strategy_is_a_single_query(self):
+        """Test that the SQL strategy returns a full row in one statement"""
+        with self.assertNumQueries(1):
+            quote = pick_weighted_quote("sql")
+        self.assertIn(quote, [self.quote1, self.quote2, self.quote3])
+        self.assertTrue(quote.text)
+
+    @override_settings(QUOTES_SAMPLER_STRATEGY="sql")
+    def test_strategy_setting(self):
+        """Test that the strategy is selected by setting"""
+        Quote.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.assertIsNone(pick_weighted_quote())
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            pick_weighted_quote("bogus")
+
+
+class WeightedIndexTests(TestCase):
+    def linear_pick(self, items, target):
+        cumulative = 0
+        for pk, weight in sorted(items):
+            cumulative += weight
+            if cumulative >= target:
+                return pk
+
+    def test_find_matches_linear_scan(self):
+        """Test that every target maps to the same id as the cumulative scan"""
+        items = [(1, 1), (2, 3), (5, 6), (7, 2), (9, 1)]
+        index = WeightedIndex(items)
+        self.assertEqual(index.total, 13)
+        for target in range(1, index.total + 1):
+            self.assertEqual(index.find(target), self.linear_pick(items, target))
+
+    def test_updates_and_removals(self):
+        """Test that weight changes, removals and growth keep the index exact"""
+        index = WeightedIndex([(1, 2), (2, 2)])
+        index.set(2, 5)
+        index.discard(1)
+        for pk in range(3, 20):
+            index.set(pk, pk % 4 + 1)
+        items = [(pk, index.weight(pk)) for pk in range(2, 20)]
+        self.assertEqual(len(index), 18)
+        self.assertNotIn(1, index)
+        self.assertEqual(index.total, sum(w for _, w in items))
+        for target in range(1, index.total + 1):
+            self.assertEqual(index.find(target), self.linear_pick(items, target))
+
+    def test_empty_index(self):
+        """Test that an empty index draws nothing"""
+        self.assertIsNone(WeightedIndex().sample())
+
+    def test_find_with_exclusions_matches_linear_scan(self):
+        """Test that excluded ids are skipped as if their weight were zero, without changing the index"""
+        items = [(pk, pk % 5 + 1) for pk in range(1, 40)]
+        index = WeightedIndex(items)
+        for exclude in ([3], [1, 2], [39, 17, 8, 30], [100, 5]):
+            remaining = [(pk, weight) for pk, weight in items if pk not in exclude]
+            for target in range(1, sum(weight for _, weight in remaining) + 1):
+                self.assertEqual(index.find(target, exclude), self.linear_pick(remaining, target), (exclude, target))
+        self.assertEqual(index.total, sum(weight for _, weight in items))
+
+    def test_sample_falls_back_when_everything_is_excluded(self):
+        index = WeightedIndex([(1, 2), (2, 3)])
+        self.assertEqual({index.sample(exclude=[1]) for _ in range(20)}, {2})
+        self.assertIn(index.sample(exclude=[1, 2]), (1, 2))
+
+
+class QuoteSamplerTests(TestCase):
+    def setUp(self):
+        sampler.invalidate()
+        self.quote = Quote.objects.create(text="Quote 1", source="Movie 1", weight=2)
+
+    def test_draw_does_not_scan(self):
+        """Test that a loaded sampler draws with a single primary key lookup"""
+        pick_weighted_quote()
+        with self.assertNumQueries(1):
+            self.assertEqual(pick_weighted_quote(), self.quote)
+
+    def test_sampler_follows_saves_and_deletes(self):
+        """Test that saves and deletes are reflected without reloading"""
+        pick_weighted_quote()
+        other = Quote.objects.create(text="Quote 2", source="Movie 2", weight=5)
+        self.quote.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(pick_weighted_quote(), other)
+
+    def test_batch_draw_is_one_query(self):
+        """Test that drawing a batch loads all quotes with one IN query"""
+        Quote.objects.create(text="Quote 2", source="Movie 2", weight=3)
+        pick_weighted_quote()
+        with self.assertNumQueries(1):
+            quotes = pick_weighted_quotes(20)
+        self.assertEqual(len(quotes), 20)
+
+    def test_changes_during_load_are_not_lost(self):
+        """Test that saves and deletes landing while the index is being built reach the installed index"""
+        other = Quote.objects.create(text="Quote 2", source="Movie 2", weight=3)
+        sampler.invalidate()
+
+        def build(items):
+            items = list(items)  # the table has been read; another thread's signals land now
+            sampler.update(other.pk, 7)
+            sampler.discard(self.quote.pk)
+            return WeightedIndex(items)
+
+        with mock.patch("quotes.sampling.WeightedIndex", side_effect=build):
+            sampler.load()
+        self.assertTrue(sampler.loaded)
+        self.assertEqual(sampler._index.weight(other.pk), 7)
+        self.assertNotIn(self.quote.pk, sampler._index)
+
+    def test_invalidate_during_load_is_kept(self):
+        """Test that an index built before an invalidation serves its caller but is not installed"""
+        def build(items):
+            items = list(items)
+            sampler.invalidate()
+            return WeightedIndex(items)
+
+        with mock.patch("quotes.sampling.WeightedIndex", side_effect=build):
+            self.assertEqual(pick_weighted_quote(), self.quote)
+        self.assertFalse(sampler.loaded)
+
+    def test_stale_entry_triggers_reload(self):
+        """Test that an id deleted behind the sampler's back is not returned"""
+        pick_weighted_quote()
+        Quote.objects.filter(pk=self.quote.pk).delete()
+        sampler.update(self.quote.pk, 2)
+        self.assertIsNone(pick_weighted_quote())
+
+
+@override_settings(QUOTES_CORPUS={"CHECK_INTERVAL": 0.0})
+class CorpusVersionTests(TestCase):
+    def setUp(self):
+        self.quote = Quote.objects.create(text="Quote 1", source="Movie 1", weight=2)
+        self.other = Quote.objects.create(text="Quote 2", source="Movie 2", weight=3)
+        corpus.sync(force=True)
+        sampler.load()
+
+    def test_remote_edit_is_applied_as_delta(self):
+        """Test that a change made by another worker updates the sampler without a reload"""
+        Quote.objects.filter(pk=self.quote.pk).update(weight=9)  # bypasses this worker's signals
+        record_change(self.quote.pk)
+        received = []
+        handler = lambda sender, pks, full, **kwargs: received.append((pks, full))
+        corpus_changed.connect(handler)
+        self.addCleanup(corpus_changed.disconnect, handler)
+        with self.assertNumQueries(3):  # version, new changes, changed weights
+            self.assertTrue(corpus.sync())
+        self.assertTrue(sampler.loaded)
+        self.assertEqual(sampler._index.weight(self.quote.pk), 9)
+        self.assertEqual(received, [({self.quote.pk}, False)])
+        with self.assertNumQueries(1):
+            self.assertFalse(corpus.sync())
+
+    def test_remote_delete_is_applied_as_delta(self):
+        version, pk = corpus.current(), self.other.pk
+        self.other.delete()
+        sampler.update(pk, 3)  # as if another worker had deleted it
+        corpus._applied = version
+        corpus.sync()
+        self.assertTrue(sampler.loaded)
+        self.assertNotIn(pk, sampler._index)
+
+    def test_bulk_change_and_gaps_reload(self):
+        record_bulk_change()
+        corpus.sync()
+        self.assertFalse(sampler.loaded)
+        sampler.load()
+        version = record_change(self.quote.pk)
+        QuoteChange.objects.filter(pk=version).delete()
+        record_change(self.quote.pk)
+        corpus._applied = version - 1
+        corpus.sync()  # the first pending change was pruned
+        self.assertFalse(sampler.loaded)
+
+    def test_middleware_syncs_each_request(self):
+        record_change(self.quote.pk)
+        self.client.get(reverse("quotes:popular"))
+        self.assertEqual(corpus.applied, corpus.current())
+
+    @override_settings(QUOTES_CORPUS={"CHECK_INTERVAL": 1.0})
+    def test_check_interval_bounds_version_queries(self):
+        """Test that requests within CHECK_INTERVAL of the last check skip the version query"""
+        applied = corpus.applied
+        record_change(self.quote.pk)
+        corpus._checked_at = time.monotonic()
+        self.client.get(reverse("quotes:popular"))
+        self.assertEqual(corpus.applied, applied)
+        corpus._checked_at -= 1.0  # the interval has passed
+        self.client.get(reverse("quotes:popular"))
+        self.assertEqual(corpus.applied, corpus.current())
+
+
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.journal_dir = tmp.name
+        self.quote1 = Quote.objects.create(text="Quote 1", source="Movie 1", weight=1)
+        self.quote2 = Quote.objects.create(text="Quote 2", source="Movie 2", weight=1)
+
+    def counters(self, **overrides):
+        config = {"DURABILITY": "memory", "MAX_PENDING": 1000, "FLUSH_INTERVAL": 3600, "JOURNAL_DIR": self.journal_dir}
+        config.update(overrides)
+        return override_settings(QUOTES_COUNTERS=config)
+
+    def test_increments_are_coalesced_into_one_update(self):
+        """Test that buffered increments reach the table in a single statement"""
+        buffer = CounterBuffer("test", ["views"])
+        with self.counters():
+            for _ in range(5):
+                buffer.add(self.quote1.pk, "views")
+            buffer.add(self.quote2.pk, "views", 2)
+            self.assertEqual(buffer.pending(self.quote1.pk, "views"), 5)
+            self.quote1.refresh_from_db()
+            self.assertEqual(self.quote1.views, 0)
+            with self.assertNumQueries(3):  # savepoint, UPDATE, release
+                self.assertEqual(buffer.flush(), 7)
+        self.quote1.refresh_from_db()
+        self.quote2.refresh_from_db()
+        self.assertEqual((self.quote1.views, self.quote2.views), (5, 2))
+        self.assertEqual(buffer.pending(self.quote1.pk, "views"), 0)
+
+    def test_flush_leaves_updated_at_alone(self):
+        """Test that a flush stamps counters_changed_at and keeps updated_at as the last edit"""
+        buffer = CounterBuffer("test", ["views"])
+        edited = self.quote1.updated_at
+        with self.counters():
+            buffer.add(self.quote1.pk, "views")
+            buffer.flush()
+        self.quote1.refresh_from_db()
+        self.assertEqual(self.quote1.updated_at, edited)
+        self.assertGreater(self.quote1.counters_changed_at, edited)
+
+    def test_flush_on_size_threshold(self):
+        """Test that reaching MAX_PENDING flushes the buffer"""
+        buffer = CounterBuffer("test", ["views"])
+        with self.counters(MAX_PENDING=3):
+            for _ in range(3):
+                buffer.add(self.quote1.pk, "views")
+        self.quote1.refresh_from_db()
+        self.assertEqual(self.quote1.views, 3)
+
+    def test_immediate_durability_writes_through(self):
+        buffer = CounterBuffer("test", ["views"])
+        with self.counters(DURABILITY="immediate"):
+            buffer.add(self.quote1.pk, "views")
+        self.quote1.refresh_from_db()
+        self.assertEqual(self.quote1.views, 1)
+
+    def test_journal_is_removed_after_flush(self):
+        """Test that flushed journal segments are deleted"""
+        buffer = CounterBuffer("test", ["views"])
+        with self.counters(DURABILITY="journal"):
+            buffer.add(self.quote1.pk, "views")
+            self.assertEqual(len(list(Path(self.journal_dir).glob("test-*.log"))), 1)
+            buffer.flush()
+        # Only the owner lock, held for the worker's lifetime, is left
+        self.assertEqual([path.suffix for path in Path(self.journal_dir).glob("test-*")], [".lock"])
+
+    def test_journal_of_dead_worker_is_replayed(self):
+        """Test that increments journaled by a crashed worker are applied by the next one"""
+        # PID 1 always runs; a reused PID must not make a crashed owner look alive
+        segment = Path(self.journal_dir) / "test-1_0badf00d-00000000.log"
+        segment.write_text(f"{self.quote1.pk} views 1\n{self.quote1.pk} views 1\n{self.quote2.pk} views 4\n")
+        buffer = CounterBuffer("test", ["views"])
+        with self.counters(DURABILITY="journal"):
+            self.assertEqual(buffer.recover(), 6)
+        self.assertFalse(segment.exists())
+        self.assertFalse((Path(self.journal_dir) / "test-1_0badf00d.lock").exists())
+        self.quote1.refresh_from_db()
+        self.quote2.refresh_from_db()
+        self.assertEqual((self.quote1.views, self.quote2.views), (2, 4))
+
+    def test_journal_of_live_worker_is_left_alone(self):
+        """Test that a journal whose owner still holds its lock is not replayed"""
+        live = CounterBuffer("test", ["views"])
+        with self.counters(DURABILITY="journal"):
+            live.add(self.quote1.pk, "views", 3)
+            other = CounterBuffer("test", ["views"])
+            self.assertEqual(other.recover(), 0)
+            self.assertEqual(live.flush(), 3)
+        self.quote1.refresh_from_db()
+        self.assertEqual(self.quote1.views, 3)
+
+    def test_overlapping_flushes_keep_unapplied_segments(self):
+        """Test that a flush started while another applies waits, so a failed UPDATE keeps its journal"""
+        buffer = CounterBuffer("test", ["views"])
+        applying, release = threading.Event(), threading.Event()
+        applied = []
+
+        def apply(deltas):
+            if not applied:
+                applied.append(None)
+                applying.set()
+                release.wait(5)
+                raise DatabaseError("disk I/O error")
+            applied.append({pk: amount for pk, amount in deltas["views"].items()})
+            return sum(deltas["views"].values())
+
+        with self.counters(DURABILITY="journal"), mock.patch.object(buffer, "_apply", apply):
+            buffer.add(self.quote1.pk, "views", 2)
+            first = threading.Thread(target=lambda: self.assertRaises(DatabaseError, buffer.flush))
+            first.start()
+            applying.wait(5)
+            buffer.add(self.quote2.pk, "views")
+            second = threading.Thread(target=buffer.flush)
+            second.start()
+            second.join(0.2)
+            # The second flush waits, so the failing one's segment survives
+            self.assertTrue(second.is_alive())
+            self.assertEqual(len(list(Path(self.journal_dir).glob("test-*.log"))), 2)
+            release.set()
+            first.join(5)
+            second.join(5)
+        # The increments the failed flush put back were applied with the next one, which removed both segments
+        self.assertEqual(applied[1:], [{self.quote1.pk: 2, self.quote2.pk: 1}])
+        self.assertEqual(list(Path(self.journal_dir).glob("test-*.log")), [])
+
+
+class VoteIngestionTests(TestCase):
+    def setUp(self):
+        self.quote = Quote.objects.create(text="Viral quote", source="Movie", weight=1)
+
+    def test_journaled_votes_survive_worker_crashes(self):
+        """Test that votes buffered by a worker that died without flushing are replayed by its successor"""
+        # Let go of the owner lock in the temporary journal directory
+        self.addCleanup(vote_counter._reset)
+        with tempfile.TemporaryDirectory() as directory, override_settings(QUOTES_COUNTERS={
+                "DURABILITY": "journal", "MAX_PENDING": 10000, "FLUSH_INTERVAL": 3600, "JOURNAL_DIR": directory}):
+            for lifetime in range(3):
+                # A new worker replays what the previous one left behind
+                self.assertEqual(vote_counter.recover(), 25 if lifetime else 0)
+                for i in range(25):
+                    url = reverse('quotes:like' if i % 5 else 'quotes:dislike', args=[self.quote.pk])
+                    self.assertEqual(self.client.post(url).status_code, 302)
+                self.quote.refresh_from_db()
+                self.assertEqual(self.quote.likes, 20 * lifetime)
+                # Killed: memory is gone and the kernel drops the owner lock, only the journal remains
+                vote_counter._journal.close()
+                vote_counter._reset()
+            self.assertEqual(vote_counter.recover(), 25)
+        self.quote.refresh_from_db()
+        self.assertEqual((self.quote.likes, self.quote.dislikes), (60, 15))
+
+    @skipUnless(os.environ.get("QUOTES_GUNICORN_TESTS"), "starts a real gunicorn; set QUOTES_GUNICORN_TESTS=1")
+    def test_no_votes_lost_across_worker_recycling(self):
+        """Test that a real gunicorn recycling its worker every few requests applies every buffered vote"""
+        from .benchmarks.http import Site
+
+        token = "a" * 32
+        with tempfile.TemporaryDirectory() as directory:
+            site = Site(directory, size=1, skew=0.0)
+            # Memory durability and no background flush: only worker_exit can save the buffered votes
+            counters = {"QUOTES_COUNTERS_DURABILITY": "memory", "QUOTES_COUNTERS_MAX_PENDING": "10000",
+                        "QUOTES_COUNTERS_FLUSH_INTERVAL": "3600"}
+            recycling = ["--workers", "1", "--max-requests", "10", "--max-requests-jitter", "0"]
+            with site.serve("sync", 1, extra=recycling, env=counters) as port:
+                for i in range(25):
+                    request = urllib.request.Request(
+                        f"http://127.0.0.1:{port}/quotes/like/1/", data=b"", method="POST",
+                        headers={"Cookie": f"csrftoken={token}", "X-CSRFToken": token},
+                    )
+                    self.assertEqual(urllib.request.urlopen(request, timeout=30).status, 200)  # after the redirect
+            log = (Path(directory) / "gunicorn-sync.log").read_text()
+            self.assertGreaterEqual(log.count("Autorestarting worker"), 2, log)
+            with sqlite3.connect(site.database) as db:
+                self.assertEqual(db.execute("SELECT likes FROM quotes_quote WHERE id = 1").fetchone(), (25,))
+
+    @override_settings(QUOTES_COUNTERS={"DURABILITY": "memory", "MAX_PENDING": 10000, "FLUSH_INTERVAL": 3600})
+    def test_worker_exit_hook_flushes_buffered_votes(self):
+        """Test that gunicorn's worker_exit hook, called in-process, applies what the buffer holds"""
+        config = runpy.run_path(str(Path(settings.BASE_DIR) / "gunicorn.conf.py"))
+        max_requests = 25
+        for lifetime in range(3):
+            for i in range(max_requests):
+                url = reverse('quotes:like' if i % 5 else 'quotes:dislike', args=[self.quote.pk])
+                self.assertEqual(self.client.post(url).status_code, 302)
+            # Still buffered until the worker exits
+            self.quote.refresh_from_db()
+            self.assertEqual(self.quote.likes, 20 * lifetime)
+            config["worker_exit"](mock.Mock(), mock.Mock())
+        self.quote.refresh_from_db()
+        self.assertEqual((self.quote.likes, self.quote.dislikes), (60, 15))
+
+    @override_settings(QUOTES_COUNTERS={"DURABILITY": "memory", "MAX_PENDING": 10000, "FLUSH_INTERVAL": 3600})
+    def test_votes_are_applied_in_one_batch(self):
+        """Test that many votes cost a single UPDATE"""
+        for _ in range(50):
+            vote_counter.add(self.quote.pk, "likes")
+        with self.assertNumQueries(3):  # savepoint, UPDATE, release
+            vote_counter.flush()
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.likes, 50)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboard.invalidate()
+        self.quotes = [
+            Quote.objects.create(text=f"Quote {i}", source=f"Movie {i % 4}", weight=1, likes=i % 7, views=i)
+            for i in range(12)
+        ]
+
+    def row(self, pk, likes, views=0, source="Movie"):
+        quote = Quote.objects.get(pk=pk)
+        return {"id": pk, "source": source, "text": "", "likes": likes, "views": views, "created_at": quote.created_at}
+
+    def test_board_merge(self):
+        """Test that merging rising rows keeps the board exact and bounded"""
+        a, b, c = (q.pk for q in self.quotes[:3])
+        board = Board(2, [self.row(a, 5), self.row(b, 3)])
+        self.assertTrue(board.merge(self.row(c, 1)))
+        self.assertEqual([e.pk for e in board.entries], [a, b])
+        self.assertTrue(board.merge(self.row(c, 9)))
+        self.assertEqual([e.pk for e in board.entries], [c, a])
+        self.assertNotIn(b, board)
+        self.assertFalse(board.merge(self.row(c, 0)))
+
+    def test_leaderboard_follows_counter_flushes(self):
+        """Test that the delta job folds flushed votes and views into the boards"""
+        leaderboard.top()
+        leaderboard.top("Movie 1")
+        for i, quote in enumerate(self.quotes):
+            vote_counter.add(quote.pk, "likes", (i * 5) % 11)
+            view_counter.add(quote.pk, "views", i % 3)
+        vote_counter.flush()
+        view_counter.flush()
+        self.assertEqual(leaderboard.verify(), [])
+        self.assertEqual(leaderboard.verify("Movie 1"), [])
+
+    def test_leaderboard_handles_source_change_and_delete(self):
+        """Test that moved and deleted quotes leave the boards"""
+        best = leaderboard.top("Movie 1")[0]
+        quote = Quote.objects.get(pk=best.pk)
+        quote.source = "Elsewhere"
+        quote.save()
+        self.assertNotIn(best.pk, [e.pk for e in leaderboard.top("Movie 1")])
+        self.assertEqual(leaderboard.verify("Movie 1"), [])
+        self.assertEqual(leaderboard.verify(), [])
+        best = quote
+        best.delete()
+        self.assertNotIn(best.pk, [e.pk for e in leaderboard.top()])
+        self.assertEqual(leaderboard.verify(), [])
+
+    @override_settings(QUOTES_CORPUS={"CHECK_INTERVAL": 0.0})
+    def test_popular_reads_without_sorting_queries(self):
+        """Test that a fresh leaderboard serves the popular page without querying quotes"""
+        self.client.get(reverse('quotes:popular'))
+        with self.assertNumQueries(1):  # the corpus version check
+            response = self.client.get(reverse('quotes:popular'))
+        self.assertEqual([e.pk for e in response.context["quotes"]],
+                         list(Quote.objects.order_by("-likes", "-views", "-created_at", "-id").values_list("id", flat=True)[:10]))
+
+    def test_delta_job_drops_quotes_deleted_elsewhere(self):
+        """Test that a member deleted by another worker, whose signal this one never sees, leaves the boards"""
+        best = leaderboard.top()[0].pk
+        leaderboard.top("Movie 1")
+        with mock.patch.object(leaderboard, "discard", wraps=leaderboard.discard) as discard, \
+                mock.patch("quotes.signals.leaderboard"):
+            Quote.objects.filter(pk=best).delete()
+            self.assertEqual(discard.call_count, 0)
+            leaderboard.refresh()
+        self.assertNotIn(best, [e.pk for e in leaderboard.top()])
+        self.assertEqual(leaderboard.verify(), [])
+        self.assertEqual(leaderboard.verify("Movie 1"), [])
+
+    def test_check_leaderboard_command(self):
+        """Test that the command checks boards after merging what changed during its window"""
+        def traffic(seconds):
+            # Other workers flush votes and delete a member while the command waits
+            for i, quote in enumerate(self.quotes[1:]):
+                vote_counter.add(quote.pk, "likes", (i * 3) % 5)
+            vote_counter.flush()
+            with mock.patch("quotes.signals.leaderboard"):
+                Quote.objects.filter(pk=leaderboard.top("Movie 3")[0].pk).delete()
+
+        leaderboard.invalidate()
+        with mock.patch("quotes.management.commands.check_leaderboard.time.sleep", side_effect=traffic) as sleep:
+            call_command("check_leaderboard", "--source", "Movie 3", "--window", "3", stdout=StringIO())
+        sleep.assert_called_once_with(3.0)
+
+        # A write that hides from the delta job, so the board drifts from the table
+        stale = timezone.now() - timedelta(days=1)
+        with mock.patch("quotes.management.commands.check_leaderboard.time.sleep",
+                        side_effect=lambda seconds: Quote.objects.filter(pk=self.quotes[0].pk).update(
+                            likes=100, updated_at=stale, counters_changed_at=stale)):
+            with self.assertRaises(CommandError):
+                call_command("check_leaderboard", stdout=StringIO(), stderr=StringIO())
+
+
+class ImportQuotesTests(TestCase):
+    def setUp(self):
+        Quote.objects.create(text="Already here", source="Movie A", weight=1)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def test_csv_import_rejects_duplicates_and_full_sources(self):
+        path = self.write("quotes.csv", (
+            "text,source,weight\n"
+            "Already here,Movie A,1\n"
+            "Second,Movie A,2\n"
+            "Third,Movie A,\n"
+            "Fourth,Movie A,1\n"
+            "New,Movie B,5\n"
+            "New,Movie B,5\n"
+            "Broken,Movie C,zero\n"
+        ))
+        rejects = str(Path(self.tmp.name) / "rejects.csv")
+        out = StringIO()
+        call_command("import_quotes", path, "--chunk-size", "3", "--rejects", rejects, stdout=out)
+        self.assertEqual(Quote.objects.count(), 4)
+        self.assertEqual(Quote.objects.get(text="Third").weight, 1)
+        self.assertEqual(Source.quote_count_for("Movie A"), 3)
+        self.assertEqual(Source.quote_count_for("Movie B"), 1)
+        self.assertIn("Imported 3 of 7 rows", out.getvalue())
+        lines = Path(rejects).read_text().splitlines()
+        self.assertEqual([line.split(",")[:2] for line in lines[1:]], [
+            ["2", "duplicate quote"], ["5", "source limit reached"], ["7", "duplicate quote"], ["8", "invalid weight"],
+        ])
+
+    def test_jsonl_import_uses_fixed_queries_per_chunk(self):
+        path = self.write("quotes.jsonl", "".join(
+            json.dumps({"text": f"Line {i}", "source": f"Book {i // 3}", "weight": 2}) + "\n" for i in range(30)
+        ) + "not json\n")
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("import_quotes", path, "--chunk-size", "10", stdout=StringIO())
+        self.assertEqual(Quote.objects.filter(source__startswith="Book").count(), 30)
+        self.assertEqual(Source.quote_count_for("Book 9"), 3)
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        # one hash lookup and one source lookup per chunk; the last chunk only holds the bad line
+        self.assertEqual(len(selects), 6)
+
+    def test_import_refreshes_sampler(self):
+        sampler.load()
+        path = self.write("quotes.csv", "text,source,weight\nFresh,Movie Z,3\n")
+        call_command("import_quotes", path, stdout=StringIO())
+        self.assertFalse(sampler.loaded)
+
+
+class ExportQuotesTests(TestCase):
+    def setUp(self):
+        self.quote = Quote.objects.create(text='He said "hi", then left', source="Movie A", weight=2)
+        Quote.objects.filter(pk=self.quote.pk).update(views=7, likes=3, dislikes=1)
+
+    def test_command_csv(self):
+        out = StringIO()
+        with mock.patch("sys.stdout", new=mock.Mock(buffer=BytesIO())) as stdout:
+            call_command("export_quotes", stdout=out)
+        text = stdout.buffer.getvalue().decode()
+        rows = list(csv.reader(StringIO(text)))
+        self.assertEqual(rows[0][:7], ["id", "text", "source", "weight", "views", "likes", "dislikes"])
+        self.assertEqual(rows[1][:7], [str(self.quote.pk), 'He said "hi", then left', "Movie A", "2", "7", "3", "1"])
+
+    def test_command_gzip_jsonl_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "quotes.jsonl.gz"
+            call_command("export_quotes", "--format", "jsonl", "--gzip", "-o", str(path), stdout=StringIO())
+            records = [json.loads(line) for line in gzip.decompress(path.read_bytes()).decode().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["likes"], 3)
+
+    def test_export_streams_in_blocks(self):
+        Quote.objects.bulk_create([
+            Quote(text=f"Bulk {i}", source=f"Book {i // 3}", weight=1, content_hash=content_hash_for(f"Bulk {i}", f"Book {i // 3}"))
+            for i in range(3000)
+        ])
+        with mock.patch("quotes.exporting.BLOCK_SIZE", 4096):
+            blocks = list(exporting.export("ndjson", chunk_size=500))
+        self.assertGreater(len(blocks), 10)
+        self.assertEqual(b"".join(blocks).count(b"\n"), 3001)
+
+    def test_admin_endpoint_requires_staff(self):
+        url = reverse("admin:quotes_quote_export")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin_user)
+        response = self.client.get(url, {"format": "ndjson", "gzip": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("quotes.ndjson.gz", response["Content-Disposition"])
+        body = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(json.loads(body)["views"], 7)
+        self.assertEqual(self.client.get(url, {"format": "xml"}).status_code, 400)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.river = Quote.objects.create(text="The river <flows> on", source="Siddhartha", weight=1)
+        self.stone = Quote.objects.create(text="A rolling stone", source="River Songs", weight=1)
+        Quote.objects.create(text="Nothing to see", source="Elsewhere", weight=1)
+
+    def test_match_expression_quotes_user_input(self):
+        self.assertIsNone(match_expression("  -- "))
+        self.assertEqual(match_expression('river AND "NOT" stone*'), '"river" "AND" "NOT" "stone"*')
+
+    def test_ranked_results_follow_edits_and_deletes(self):
+        # The source column weighs more than the text column
+        self.assertEqual([q.pk for q in SearchResults("river")[:10]], [self.stone.pk, self.river.pk])
+        self.stone.source = "Quarry"
+        self.stone.save()
+        self.assertEqual([q.pk for q in SearchResults("river")[:10]], [self.river.pk])
+        self.river.delete()
+        self.assertEqual(SearchResults("river").count(), 0)
+        self.assertEqual(SearchResults("quarr").count(), 1)
+
+    def test_database_check_reports_missing_triggers(self):
+        """Test that a table rebuild dropping the FTS triggers fails the database system check"""
+        self.assertEqual(check_fts_index(databases=["default"]), [])
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER quotes_quote_fts_update")
+        errors = check_fts_index(databases=["default"])
+        self.assertEqual([error.id for error in errors], ["quotes.E001"])
+        self.assertIn("quotes_quote_fts_update", errors[0].msg)
+
+    def test_counter_updates_keep_the_index(self):
+        Quote.objects.filter(pk=self.river.pk).update(views=5)
+        self.assertEqual(SearchResults("flows").count(), 1)
+
+    def test_view_highlights_escaped_text_and_paginates(self):
+        for i in range(25):
+            Quote.objects.create(text=f"Many rivers {i}", source=f"Delta {i}", weight=1)
+        response = self.client.get(reverse("quotes:search"), {"q": "river"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page"].paginator.count, 27)
+        self.assertEqual(len(response.context["page"].object_list), 20)
+        self.assertContains(response, "The <mark>river</mark> &lt;flows&gt; on")
+        response = self.client.get(reverse("quotes:search"), {"q": "river", "page": 2})
+        self.assertEqual(len(response.context["page"].object_list), 7)
+
+    def test_admin_search_uses_fts(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:quotes_quote_changelist"), {"q": "stone"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.stone])
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertIn("MATCH", sql)
+        self.assertNotIn("LIKE", sql)
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = str(Path(tmp.name) / "cache.sqlite3")
+        self.cache = self.make()
+
+    def make(self, **options):
+        return SQLiteCache(self.path, {"OPTIONS": {"ACCESS_RESOLUTION": 0, **options}})
+
+    def test_entries_are_shared_between_instances(self):
+        self.cache.set("quote", {"id": 1, "text": "Hi"})
+        self.cache.set_many({"a": 1, "b": [2]})
+        other = self.make()
+        self.assertEqual(other.get("quote"), {"id": 1, "text": "Hi"})
+        self.assertEqual(other.get_many(["a", "b", "c"]), {"a": 1, "b": [2]})
+        other.delete("quote")
+        self.assertIsNone(self.cache.get("quote"))
+        self.assertFalse(self.cache.has_key("quote"))
+
+    def test_ttl_and_add(self):
+        with mock.patch("quotes.sqlite_cache.time.time", return_value=1000.0), \
+                mock.patch("django.core.cache.backends.base.time.time", return_value=1000.0):
+            self.cache.set("short", "v", timeout=10)
+            self.assertFalse(self.cache.add("short", "other"))
+        with mock.patch("quotes.sqlite_cache.time.time", return_value=1011.0), \
+                mock.patch("django.core.cache.backends.base.time.time", return_value=1011.0):
+            self.assertIsNone(self.cache.get("short"))
+            self.assertTrue(self.cache.add("short", "other"))
+            self.assertEqual(self.cache.get("short"), "other")
+        self.cache.set("forever", 1, timeout=None)
+        self.assertFalse(self.cache.add("forever", 2))
+
+    def test_incr(self):
+        self.cache.set("n", 1)
+        self.assertEqual(self.cache.incr("n", 5), 6)
+        self.assertEqual(self.cache.decr("n"), 5)
+        self.cache.set("big", 2 ** 70)
+        self.assertEqual(self.cache.incr("big"), 2 ** 70 + 1)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set("hits", 0)
+        script = (
+            "import sys; from quotes.sqlite_cache import SQLiteCache; "
+            "c = SQLiteCache(sys.argv[1], {}); [c.incr('hits') for _ in range(200)]"
+        )
+        procs = [subprocess.Popen([sys.executable, "-c", script, self.path], cwd=settings.BASE_DIR) for _ in range(4)]
+        self.assertEqual([proc.wait(timeout=60) for proc in procs], [0] * 4)
+        self.assertEqual(self.cache.get("hits"), 800)
+
+    def test_lru_eviction(self):
+        cache = self.make(MAX_ENTRIES=20, CULL_FREQUENCY=4)
+        clock = iter(range(10_000))
+        with mock.patch("quotes.sqlite_cache.time.time", side_effect=lambda: float(next(clock))):
+            for i in range(20):
+                cache.set(f"k{i}", i, timeout=None)
+            cache.get("k0")  # recently used, must survive
+            for i in range(20, 30):
+                cache.set(f"k{i}", i, timeout=None)
+            self.assertEqual(cache.get("k0"), 0)
+            self.assertIsNone(cache.get("k1"))
+            self.assertEqual(cache.get("k29"), 29)
+        self.assertLessEqual(sqlite3.connect(self.path).execute("SELECT count(*) FROM cache").fetchone()[0], 20)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        settings_override = override_settings(QUOTES_METRICS={"DIRECTORY": tmp.name, "WRITE_INTERVAL": 3600, "TOKEN": "s3cret"})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.registry.clear()
+        Quote.objects.create(text="Measured", source="Metrics", weight=1)
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def series(self, kind, name, labels):
+        for series_name, series_labels, value in metrics.registry.snapshot()[kind]:
+            if (series_name, series_labels) == (name, list(labels)):
+                return value
+        return None
+
+    def test_middleware_records_latency_and_queries(self):
+        self.client.get(reverse('quotes:random'))
+        self.client.get(reverse('quotes:random'))
+        self.assertEqual(self.series("counters", "quotes_http_requests_total", ("quotes:random", "GET", "200")), 2)
+        durations = self.series("histograms", "quotes_http_request_duration_seconds", ("quotes:random",))
+        self.assertEqual(sum(durations[:-1]), 2)
+        queries = self.series("histograms", "quotes_db_queries_per_request", ("quotes:random",))
+        self.assertEqual(queries[0], 0)  # every request queried at least the corpus version
+        self.assertIsNotNone(self.series("histograms", "quotes_sampler_draw_seconds", ("one",)))
+
+        cache = SQLiteCache(str(self.directory / "cache.sqlite3"), {})
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get_many(["a", "b"])
+        self.assertEqual(self.series("counters", "quotes_cache_requests_total", ("hit",)), 2)
+        self.assertEqual(self.series("counters", "quotes_cache_requests_total", ("miss",)), 1)
+
+    def test_snapshots_are_written_off_the_request_path(self):
+        """Test that requests only update memory and the writer thread produces the snapshot"""
+        with mock.patch.object(metrics.registry, "write", wraps=metrics.registry.write) as write:
+            self.client.get(reverse('quotes:random'))
+            write.assert_not_called()
+        self.assertEqual(list(self.directory.glob("metrics-*.json")), [])
+
+        with override_settings(QUOTES_METRICS={"DIRECTORY": str(self.directory), "WRITE_INTERVAL": 0.01}):
+            metrics.start_writer()
+            self.addCleanup(metrics.stop_writer)
+            for _ in range(500):
+                if list(self.directory.glob("metrics-*.json")):
+                    break
+                time.sleep(0.01)
+        snapshots = list(self.directory.glob("metrics-*.json"))
+        self.assertEqual(len(snapshots), 1)
+        self.assertIn("quotes_http_requests_total", snapshots[0].read_text())
+
+    def test_collect_merges_workers_and_folds_exited_ones(self):
+        metrics.registry.inc("quotes_cache_requests_total", ("hit",), 3)
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+        snapshot = {"counters": [["quotes_cache_requests_total", ["hit"], 4]], "histograms": []}
+        (self.directory / f"metrics-{exited.pid}-abc123.json").write_text(json.dumps(snapshot))
+
+        merged = metrics.collect()
+        self.assertEqual(merged["counters"], [["quotes_cache_requests_total", ["hit"], 7]])
+        self.assertFalse((self.directory / f"metrics-{exited.pid}-abc123.json").exists())
+        self.assertTrue((self.directory / metrics.ARCHIVE).exists())
+        # The archive keeps the exited worker's counts
+        self.assertEqual(metrics.collect()["counters"], merged["counters"])
+
+    def test_render_prometheus_text(self):
+        metrics.registry.observe("quotes_http_request_duration_seconds", 0.02, ('say "hi"',))
+        text = metrics.render(metrics.registry.snapshot())
+        self.assertIn("# TYPE quotes_http_request_duration_seconds histogram", text)
+        self.assertIn('quotes_http_request_duration_seconds_bucket{view="say \\"hi\\"",le="0.01"} 0', text)
+        self.assertIn('quotes_http_request_duration_seconds_bucket{view="say \\"hi\\"",le="0.025"} 1', text)
+        self.assertIn('quotes_http_request_duration_seconds_bucket{view="say \\"hi\\"",le="+Inf"} 1', text)
+        self.assertIn('quotes_http_request_duration_seconds_count{view="say \\"hi\\""} 1', text)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.get(reverse('quotes:random'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('quotes_http_requests_total{view="quotes:random",method="GET",status="200"} 1', response.content.decode())
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        Quote.objects.create(text="Profiled", source="Profiling", weight=1)
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def profiling(self, **config):
+        return override_settings(QUOTES_PROFILING={"DIRECTORY": self.directory, **config})
+
+    def captured(self):
+        return [json.loads(path.read_text()) for path in profiling.captures(self.directory)]
+
+    def test_signed_header_profiles_request(self):
+        with self.profiling():
+            self.client.get(reverse('quotes:random'), HTTP_X_PROFILE="forged")
+            self.assertEqual(self.captured(), [])
+            self.client.get(reverse('quotes:random'), HTTP_X_PROFILE=profiling.profile_token())
+        [meta] = self.captured()
+        self.assertEqual((meta["view"], meta["status"], meta["trigger"]), ("quotes:random", 200, "header"))
+        self.assertTrue(any("quotes_quote" in query["sql"] for query in meta["queries"]))
+        self.assertIn("('int',)", [query["params"] for query in meta["queries"]])
+        self.assertEqual(len(list(self.directory.glob("*.prof"))), 1)
+
+        out = StringIO()
+        with self.profiling():
+            call_command("profiles", "show", profiling.captures(self.directory)[0].stem, stdout=out)
+        self.assertIn("Slowest queries", out.getvalue())
+        self.assertIn("random_quote", out.getvalue())
+
+    def test_slow_request_arms_its_route(self):
+        with self.profiling(SLOW_THRESHOLD=0.0):
+            self.client.get(reverse('quotes:random'))
+            self.assertEqual(self.captured(), [])
+            self.client.get(reverse('quotes:random'))  # armed by the first one
+            self.client.get(reverse('quotes:popular'))
+            self.client.get(reverse('quotes:popular'))
+        self.assertEqual([(m["view"], m["trigger"]) for m in self.captured()],
+                         [("quotes:random", "slow"), ("quotes:popular", "slow")])
+
+    def test_header_token_is_single_use(self):
+        token = profiling.profile_token()
+        with self.profiling():
+            self.client.get(reverse('quotes:random'), HTTP_X_PROFILE=token)
+            self.client.get(reverse('quotes:random'), HTTP_X_PROFILE=token)
+        self.assertEqual(len(self.captured()), 1)
+
+    def test_query_log_keeps_parameter_types_only(self):
+        self.client.force_login(User.objects.create_superuser("profiled", "profiled@example.com", "pw"))
+        with self.profiling():
+            self.client.get(reverse('admin:index'), HTTP_X_PROFILE=profiling.profile_token())
+        [meta] = self.captured()
+        session_queries = [query for query in meta["queries"] if "django_session" in query["sql"]]
+        self.assertTrue(session_queries)
+        self.assertNotIn(self.client.session.session_key, json.dumps(meta))
+        self.assertIn("'str'", session_queries[0]["params"])
+
+    def test_budget_keeps_newest_captures(self):
+        with self.profiling(MAX_CAPTURES=2):
+            for page in ('quotes:random', 'quotes:popular', 'quotes:search'):
+                self.client.get(reverse(page), HTTP_X_PROFILE=profiling.profile_token())
+            self.assertEqual([m["view"] for m in self.captured()], ["quotes:popular", "quotes:search"])
+            self.assertEqual(len(list(self.directory.glob("*.prof"))), 2)
+            out = StringIO()
+            call_command("profiles", "list", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class DatabaseTuningTests(TestCase):
+    def test_router_sends_reads_outside_transactions_to_replica(self):
+        router = ReadReplicaRouter()
+        with mock.patch.dict(connections.settings, {"replica": connections.settings["default"]}):
+            with mock.patch.object(connections["default"], "in_atomic_block", False):
+                self.assertEqual(router.db_for_read(Quote), "replica")
+            # Inside a transaction reads must see its own writes
+            self.assertEqual(router.db_for_read(Quote), "default")
+        self.assertEqual(router.db_for_write(Quote), "default")
+        self.assertFalse(router.allow_migrate("replica", "quotes"))
+
+    def test_router_with_production_databases(self):
+        """Test the router against the production aliases: quote reads use the replica, other apps stay on default"""
+        from django.contrib.sessions.models import Session
+        from django.db import router
+
+        from config import settings_production
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "db.sqlite3")
+            handler = ConnectionHandler({
+                alias: {**config, "NAME": path} for alias, config in settings_production.DATABASES.items()
+            })
+            try:
+                with override_settings(DATABASE_ROUTERS=settings_production.DATABASE_ROUTERS), \
+                        mock.patch("quotes.routers.connections", handler):
+                    self.assertEqual(Quote.objects.all().db, "replica")
+                    self.assertEqual(Quote.objects.all().db, router.db_for_read(Quote))
+                    self.assertEqual(Session.objects.all().db, "default")
+                    self.assertEqual(User.objects.all().db, "default")
+                    self.assertEqual(router.db_for_write(Quote), "default")
+                    with mock.patch.object(handler["default"], "in_atomic_block", True):
+                        self.assertEqual(Quote.objects.all().db, "default")
+            finally:
+                handler.close_all()
+
+    def test_router_without_replica(self):
+        with mock.patch.object(connections["default"], "in_atomic_block", False):
+            self.assertEqual(ReadReplicaRouter().db_for_read(Quote), "default")
+
+    def test_production_connections_apply_pragmas(self):
+        from config import settings_production
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "db.sqlite3")
+            handler = ConnectionHandler({
+                alias: {**config, "NAME": path} for alias, config in settings_production.DATABASES.items()
+            })
+            try:
+                with handler["default"].cursor() as cursor:
+                    pragmas = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                               for name in ("journal_mode", "synchronous", "busy_timeout", "query_only")}
+                    cursor.execute("CREATE TABLE t (x)")
+                self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 20000, "query_only": 0})
+                self.assertEqual(handler["default"].transaction_mode, "IMMEDIATE")
+                with handler["replica"].cursor() as cursor:
+                    self.assertEqual(cursor.execute("PRAGMA query_only").fetchone()[0], 1)
+                    self.assertEqual(cursor.execute("SELECT count(*) FROM t").fetchone()[0], 0)
+                    with self.assertRaises(DatabaseError):
+                        cursor.execute("INSERT INTO t VALUES (1)")
+            finally:
+                handler.close_all()
+
+    def test_production_templates_use_cached_loader(self):
+        from config import settings_production
+
+        options = settings_production.TEMPLATES[0]["OPTIONS"]
+        self.assertFalse(settings_production.TEMPLATES[0]["APP_DIRS"])
+        self.assertEqual(options["loaders"][0][0], "django.template.loaders.cached.Loader")
+        # The development settings are left alone
+        self.assertNotIn("loaders", settings.TEMPLATES[0]["OPTIONS"])
+
 
 class QuoteViewsTests(TestCase):
     def setUp(self):
+        leaderboard.invalidate()
         self.client = Client()
         self.quote = Quote.objects.create(
             text="Test quote", source="Test Movie", weight=1
         )
 
+    def tearDown(self):
+        view_counter.flush()
+        vote_counter.flush()
+
     def test_random_quote_view(self):
         """Test random quote view displays quote and increments views"""
         initial_views = self.quote.views
@@ -142,11 +1255,33 @@ class QuoteViewsTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Test quote")
+        self.assertEqual(response.context["quote"].views, initial_views + 1)
 
-        # Check that views were incremented
+        # Check that views were incremented once the buffer is flushed
+        view_counter.flush()
         self.quote.refresh_from_db()
         self.assertEqual(self.quote.views, initial_views + 1)
 
+    def test_random_quote_views_survive_flushes(self):
+        """Test that the shown count includes views the request's own add just flushed"""
+        for config in ({"MAX_PENDING": 1}, {"DURABILITY": "immediate"}):
+            with self.subTest(**config), override_settings(QUOTES_COUNTERS={"FLUSH_INTERVAL": 3600, **config}):
+                shown = [self.client.get(reverse('quotes:random')).context["quote"].views for _ in range(3)]
+                self.quote.refresh_from_db()
+                self.assertEqual(shown, [self.quote.views - 2, self.quote.views - 1, self.quote.views])
+
+    @override_settings(QUOTES_HISTORY={"SIZE": 2})
+    def test_random_quote_does_not_repeat_recent_quotes(self):
+        """Test that the last SIZE quotes shown to a visitor are skipped"""
+        sampler.invalidate()
+        Quote.objects.create(text="Second", source="Other Movie", weight=50)
+        Quote.objects.create(text="Third", source="Third Movie", weight=50)
+        shown = [self.client.get(reverse('quotes:random')).context["quote"].pk for _ in range(9)]
+        for i in range(2, len(shown)):
+            self.assertEqual(len(set(shown[i - 2:i + 1])), 3, shown)
+        self.client.cookies["recent_quotes"] = "tampered"
+        self.assertEqual(self.client.get(reverse('quotes:random')).status_code, 200)
+
     def test_random_quote_view_no_quotes(self):
         """Test random quote view when no quotes exist"""
         Quote.objects.all().delete()
@@ -161,6 +1296,7 @@ class QuoteViewsTests(TestCase):
         response = self.client.post(reverse('quotes:like', args=[self.quote.pk]))
 
         self.assertEqual(response.status_code, 302)  # Redirect
+        vote_counter.flush()
         self.quote.refresh_from_db()
         self.assertEqual(self.quote.likes, initial_likes + 1)
 
@@ -170,9 +1306,120 @@ class QuoteViewsTests(TestCase):
         response = self.client.post(reverse('quotes:dislike', args=[self.quote.pk]))
 
         self.assertEqual(response.status_code, 302)  # Redirect
+        vote_counter.flush()
         self.quote.refresh_from_db()
         self.assertEqual(self.quote.dislikes, initial_dislikes + 1)
 
+    def test_like_quote_json(self):
+        """Test JSON like endpoint returns the updated counters without redirecting"""
+        response = self.client.post(reverse('quotes:api_like', args=[self.quote.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"id": self.quote.pk, "views": 0, "likes": 1, "dislikes": 0})
+
+        response = self.client.post(reverse('quotes:api_dislike', args=[self.quote.pk]))
+        self.assertEqual(response.json()["dislikes"], 1)
+        self.assertEqual(response.json()["likes"], 1)
+
+        vote_counter.flush()
+        self.quote.refresh_from_db()
+        self.assertEqual((self.quote.likes, self.quote.dislikes), (1, 1))
+
+    def test_vote_json_counts_survive_flushes(self):
+        """Test that the returned counters never go backwards when a vote crosses a flush"""
+        for config in ({"MAX_PENDING": 3}, {"DURABILITY": "immediate"}):
+            with self.subTest(**config), override_settings(QUOTES_COUNTERS={"FLUSH_INTERVAL": 3600, **config}):
+                vote_counter.flush()
+                start = Quote.objects.get(pk=self.quote.pk).likes
+                likes = [self.client.post(reverse('quotes:api_like', args=[self.quote.pk])).json()["likes"]
+                         for _ in range(5)]
+                self.assertEqual(likes, list(range(start + 1, start + 6)))
+                response = self.client.post(reverse('quotes:api_dislike', args=[self.quote.pk]))
+                self.assertEqual(response.json()["likes"], start + 5)
+
+    def test_vote_json_errors(self):
+        """Test JSON vote endpoints reject GET and unknown quotes"""
+        response = self.client.get(reverse('quotes:api_like', args=[self.quote.pk]))
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('quotes:api_dislike', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(vote_counter.pending(999, "dislikes"), 0)
+
+    def test_random_quote_links_json_vote_endpoints(self):
+        """Test the quote card exposes the JSON endpoints next to the form fallback"""
+        response = self.client.get(reverse('quotes:random'))
+        self.assertContains(response, reverse('quotes:api_like', args=[self.quote.pk]))
+        self.assertContains(response, reverse('quotes:like', args=[self.quote.pk]))
+
+    def test_random_quotes_json(self):
+        """Test the batch API returns sampled quotes without counting views"""
+        response = self.client.get(reverse('quotes:api_random'), {'n': 5})
+        self.assertEqual(response.status_code, 200)
+        quotes = response.json()["quotes"]
+        self.assertEqual(len(quotes), 5)
+        self.assertEqual(quotes[0]["text"], "Test quote")
+        self.assertEqual(quotes[0]["api_like_url"], reverse('quotes:api_like', args=[self.quote.pk]))
+        self.assertEqual(view_counter.pending(self.quote.pk, "views"), 0)
+
+    def test_random_quotes_json_limits(self):
+        """Test the batch size is validated and capped"""
+        response = self.client.get(reverse('quotes:api_random'), {'n': 'many'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('quotes:api_random'), {'n': 1000})
+        self.assertEqual(len(response.json()["quotes"]), 50)
+        Quote.objects.all().delete()
+        response = self.client.get(reverse('quotes:api_random'))
+        self.assertEqual(response.json()["quotes"], [])
+
+    def test_random_quotes_json_never_repeats_within_history(self):
+        """Test that no quote in an API batch repeats the SIZE quotes shown before it, including the history"""
+        for i in range(7):
+            Quote.objects.create(text=f"Quote {i}", source=f"Movie {i}", weight=1 + i)
+        size = history_settings()["SIZE"]
+        for strategy in ("index", "sql"):
+            with self.subTest(strategy=strategy), self.settings(QUOTES_SAMPLER_STRATEGY=strategy):
+                shown = [self.client.get(reverse('quotes:random')).context["quote"].pk]
+                after = Quote.objects.exclude(pk=shown[0]).values_list("pk", flat=True)[:2]
+                shown += after
+                response = self.client.get(reverse('quotes:api_random'), {'n': 50, 'after': list(after)})
+                shown += [quote["id"] for quote in response.json()["quotes"]]
+                self.assertEqual(len(shown), 53)
+                for i, pk in enumerate(shown):
+                    self.assertNotIn(pk, shown[max(0, i - size):i])
+
+    def test_record_views_json_updates_history(self):
+        """Test that quotes shown from the client-side queue join the history cookie"""
+        other = Quote.objects.create(text="Other", source="Movie", weight=1)
+        with mock.patch("quotes.views.pick_weighted_quotes", return_value=[other, self.quote]):
+            token = self.client.get(reverse('quotes:api_random')).json()["views_token"]
+        response = self.client.post(reverse('quotes:api_views'), {'ids': [other.pk, self.quote.pk], 'token': token})
+        request = response.wsgi_request
+        request.COOKIES["recent_quotes"] = response.cookies["recent_quotes"].value
+        self.assertEqual(recent_quotes(request), [self.quote.pk, other.pk])
+
+    def test_record_views_json(self):
+        """Test that displayed quotes are reported back in one batch"""
+        token = self.client.get(reverse('quotes:api_random'), {'n': 2}).json()["views_token"]
+        response = self.client.post(reverse('quotes:api_views'), {'ids': [self.quote.pk, self.quote.pk], 'token': token})
+        self.assertEqual(response.json(), {"recorded": 2})
+        self.assertEqual(view_counter.pending(self.quote.pk, "views"), 2)
+
+        self.assertEqual(self.client.get(reverse('quotes:api_views')).status_code, 400)
+        self.assertEqual(self.client.post(reverse('quotes:api_views'), {'ids': ['x']}).status_code, 400)
+
+    def test_record_views_json_only_counts_served_ids(self):
+        """Test that views need a batch token and count each id at most as often as it was served"""
+        other = Quote.objects.create(text="Never served", source="Movie", weight=1)
+        with mock.patch("quotes.views.pick_weighted_quotes", return_value=[self.quote]):
+            token = self.client.get(reverse('quotes:api_random'), {'n': 1}).json()["views_token"]
+        url = reverse('quotes:api_views')
+        self.assertEqual(self.client.post(url, {'ids': [self.quote.pk]}).json(), {"recorded": 0})
+        self.assertEqual(self.client.post(url, {'ids': [self.quote.pk], 'token': 'forged'}).json(), {"recorded": 0})
+        response = self.client.post(url, {'ids': [self.quote.pk] * 100 + [other.pk], 'token': token})
+        self.assertEqual(response.json(), {"recorded": 1})
+        self.assertEqual(view_counter.pending(self.quote.pk, "views"), 1)
+        self.assertEqual(view_counter.pending(other.pk, "views"), 0)
+
     def test_like_dislike_get_method_fails(self):
         """Test that GET method for like/dislike returns 400"""
         response = self.client.get(reverse('quotes:like', args=[self.quote.pk]))
@@ -204,6 +1451,51 @@ class QuoteViewsTests(TestCase):
         self.assertContains(response, "Quote 2")
         self.assertNotContains(response, "Test quote")
 
+    def test_popular_quotes_conditional_get(self):
+        """Test that the popular page answers 304 until its board changes"""
+        quote2 = Quote.objects.create(text="Quote 2", source="Movie 2", weight=1, likes=5)
+        response = self.client.get(reverse('quotes:popular'))
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(reverse('quotes:popular'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        # Each source filter has its own ETag
+        self.assertNotEqual(self.client.get(reverse('quotes:popular'), {'source': 'Movie 2'})["ETag"], etag)
+
+        self.client.post(reverse('quotes:api_like', args=[quote2.pk]))
+        vote_counter.flush()
+        leaderboard.mark_stale()
+        response = self.client.get(reverse('quotes:popular'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_random_card_skips_the_cache(self):
+        """Test that the random page renders the card without cache round trips and follows edits"""
+        with mock.patch.object(cache, "get", wraps=cache.get) as get:
+            response = self.client.get(reverse('quotes:random'))
+        get.assert_not_called()
+        self.assertContains(response, "Test quote")
+
+        self.client.post(reverse('quotes:edit', args=[self.quote.pk]),
+                         {'text': 'Edited quote', 'source': 'Test Movie', 'weight': 1})
+        response = self.client.get(reverse('quotes:random'))
+        self.assertContains(response, "Edited quote")
+        self.assertNotContains(response, "Test quote")
+
+    def test_popular_table_fragment_tracks_counters(self):
+        """Test that the cached popular table is keyed on the board contents"""
+        cache.clear()
+        self.client.get(reverse('quotes:popular'))
+        response = self.client.get(reverse('quotes:popular'))
+        key = make_template_fragment_key("popular_rows", [response.context["board_digest"]])
+        self.assertIn("Test quote", cache.get(key))
+        self.client.post(reverse('quotes:api_like', args=[self.quote.pk]))
+        vote_counter.flush()
+        leaderboard.mark_stale()
+        response = self.client.get(reverse('quotes:popular'))
+        self.assertContains(response, 'data-likes="1"')
+
     def test_add_quote_view_get(self):
         """Test add quote view GET request"""
         response = self.client.get(reverse('quotes:add'))
@@ -249,3 +1541,284 @@ class QuoteViewsTests(TestCase):
         response = self.client.get(reverse('quotes:edit', args=[999]))
 
         self.assertEqual(response.status_code, 302)  # Redirect to random
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        leaderboard.invalidate()
+        sampler.invalidate()
+        self.quote = Quote.objects.create(text="Async quote", source="Async Movie", weight=1)
+        self.factory = AsyncRequestFactory()
+
+    def tearDown(self):
+        view_counter.flush()
+        vote_counter.flush()
+
+    async def test_random_quote_counts_view(self):
+        response = await async_views.random_quote(self.factory.get("/quotes/"))
+        self.assertContains(response, "Async quote")
+        self.assertEqual(view_counter.pending(self.quote.pk, "views"), 1)
+        # The only quote is shown again rather than nothing, and stays first in the history
+        request = self.factory.get("/quotes/")
+        request.COOKIES["recent_quotes"] = response.cookies["recent_quotes"].value
+        response = await async_views.random_quote(request)
+        self.assertContains(response, "Async quote")
+        self.assertEqual(recent_quotes(request), [self.quote.pk])
+
+    @override_settings(QUOTES_COUNTERS={"DURABILITY": "immediate"})
+    async def test_counters_include_flushed_increments(self):
+        response = await async_views.random_quote(self.factory.get("/quotes/"))
+        self.assertContains(response, '<span class="stat-value" data-stat="views">1</span>', html=True)
+        for likes in (1, 2):
+            response = await async_views.like_quote_json(self.factory.post("/"), self.quote.pk)
+            self.assertEqual(json.loads(response.content)["likes"], likes)
+
+    async def test_popular_quotes_conditional_get(self):
+        with mock.patch("quotes.async_views.sync_to_async", wraps=sync_to_async) as offload:
+            response = await async_views.popular_quotes(self.factory.get("/quotes/popular/"))
+        # The fragment cache lookup happens off the event loop
+        self.assertIn(async_views.render, [call.args[0] for call in offload.call_args_list])
+        self.assertContains(response, "Async quote")
+        self.assertEqual(response["ETag"], f'"{await sync_to_async(leaderboard.digest)()}"')
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = await async_views.popular_quotes(
+            self.factory.get("/quotes/popular/", headers={"if-none-match": response["ETag"]})
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_vote_endpoints(self):
+        response = await async_views.like_quote_json(self.factory.post("/"), self.quote.pk)
+        self.assertEqual(json.loads(response.content)["likes"], 1)
+        response = await async_views.dislike_quote(self.factory.post("/"), self.quote.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(vote_counter.pending(self.quote.pk, "dislikes"), 1)
+        self.assertEqual((await async_views.like_quote_json(self.factory.get("/"), self.quote.pk)).status_code, 400)
+        self.assertEqual((await async_views.dislike_quote_json(self.factory.post("/"), 0)).status_code, 404)
+
+    async def test_probes(self):
+        prober = health.Prober()
+        await sync_to_async(prober.refresh)()
+        with mock.patch("quotes.health.start_prober", return_value=prober):
+            response = await async_views.ready_view(self.factory.get("/ready"))
+        self.assertEqual(response.status_code, 200)
+        response = await async_views.live_view(self.factory.get("/live"))
+        self.assertEqual(json.loads(response.content)["status"], "alive")
+
+    async def test_middleware_stack_runs_async(self):
+        metrics.registry.clear()
+        with tempfile.TemporaryDirectory() as tmp, override_settings(QUOTES_METRICS={"DIRECTORY": tmp}):
+            response = await self.async_client.get(reverse('quotes:popular'))
+        self.assertEqual(response.status_code, 200)
+        # Queries made in sync_to_async threads still reach the request's metrics
+        for name, labels, values in metrics.registry.snapshot()["histograms"]:
+            if (name, labels) == ("quotes_db_queries_per_request", ["quotes:popular"]):
+                self.assertEqual(values[0], 0)
+                break
+        else:
+            self.fail("no query histogram recorded")
+
+
+class HealthTests(TestCase):
+    def setUp(self):
+        sampler.invalidate()
+        Quote.objects.create(text="Probe me", source="Movie", weight=2)
+        self.prober = health.Prober()
+        patcher = mock.patch("quotes.health.start_prober", return_value=self.prober)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_live_does_no_io(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('live'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_ready_serves_the_last_probe(self):
+        self.assertEqual(self.client.get(reverse('ready')).status_code, 503)  # no probe yet
+        sampler.load()
+        with self.assertNumQueries(1):  # SELECT 1; the loaded sampler index knows the corpus size
+            self.prober.refresh()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.prober.result["quotes_count"], 1)
+        self.assertEqual(set(response.json()), {"status", "checked_at"})
+        self.prober.updated_at -= health.health_settings()["STALE_AFTER"] + 1
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("last probe", response.json()["reason"])
+
+    def test_ready_hides_probe_errors(self):
+        """Test that exception text from a failed probe reaches the log but not the public /ready"""
+        with mock.patch.object(connection, "cursor", side_effect=DatabaseError("unable to open /srv/secret/db")), \
+                self.assertLogs("quotes.health", "WARNING") as logs:
+            self.prober.refresh()
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "unavailable")
+        self.assertNotIn("secret", response.content.decode())
+        self.assertIn("secret", logs.output[0])
+
+    def test_probe_reports_empty_corpus_without_counting(self):
+        Quote.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            result = health.probe()
+        self.assertEqual(result["status"], "degraded")
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_detailed_health_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('quotes:health')).status_code, 403)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        response = self.client.get(reverse('quotes:health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["quotes_count"], 1)
+
+
+class QueuedLoggingTests(TestCase):
+    def setUp(self):
+        self.sink = logging.getLogger("quotes.tests.sink")
+        self.sink.propagate = False
+        self.app = logging.getLogger("quotes.tests.app")
+        self.app.propagate = False
+        self.stream = StringIO()
+        target = logging.StreamHandler(self.stream)
+        target.setFormatter(JSONFormatter())
+        self.sink.addHandler(target)
+        self.addCleanup(self.sink.removeHandler, target)
+
+    def attach(self, handler):
+        self.app.addHandler(handler)
+        self.addCleanup(self.app.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_records_reach_the_sink_as_json(self):
+        handler = self.attach(QueueHandler("quotes.tests.sink"))
+        self.app.warning("Quote %s not found", 7, extra={"request": object(), "status_code": 404})
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            self.app.exception("Vote failed")
+        handler.stop()
+        first, second = [json.loads(line) for line in self.stream.getvalue().splitlines()]
+        self.assertEqual((first["message"], first["level"], first["status_code"]), ("Quote 7 not found", "WARNING", 404))
+        self.assertIn("<object object", first["request"])
+        self.assertEqual(second["message"], "Vote failed")
+        self.assertIn("ValueError: broken", second["exception"])
+
+    def test_full_queue_drops_and_reports(self):
+        release = threading.Event()
+        blocker = mock.Mock(level=logging.NOTSET, handle=lambda record: release.wait(5))
+        self.sink.addHandler(blocker)
+        self.addCleanup(self.sink.removeHandler, blocker)
+        handler = self.attach(QueueHandler("quotes.tests.sink", maxsize=2, policy="block", block_timeout=0.01))
+        for i in range(10):
+            self.app.warning("line %d", i)
+        self.assertGreaterEqual(handler.dropped, 6)
+        release.set()
+        self.app.warning("after")
+        handler.stop()
+        messages = [json.loads(line)["message"] for line in self.stream.getvalue().splitlines()]
+        self.assertEqual(messages[-1], f"Log queue was full; dropped {handler.dropped} record(s)")
+        self.assertIn("after", messages)
+
+
+class BenchmarkTests(TestCase):
+    def test_skewed_corpus_respects_model_limits(self):
+        benchmark_corpus.generate(600, text=benchmark_corpus.sentence, skew=1.2)
+        self.assertEqual(Quote.objects.count(), 600)
+        sizes = Counter(Quote.objects.values_list("source", flat=True))
+        self.assertLessEqual(max(sizes.values()), 3)
+        self.assertGreater(Counter(sizes.values())[1], Counter(sizes.values())[3])
+        self.assertEqual(Source.objects.get(name="Source 0").quote_count, sizes["Source 0"])
+        weights = list(Quote.objects.values_list("weight", flat=True))
+        self.assertGreater(weights.count(1), len(weights) / 4)
+        self.assertGreater(max(weights), 10)
+        self.assertEqual(len(set(Quote.objects.values_list("content_hash", flat=True))), 600)
+
+    def test_compare_flags_regressions_in_the_worse_direction(self):
+        baseline = {"pick": {"count": 100, "p99_ms": 1.0, "ops_per_sec": 1000.0}, "gone": {"p99_ms": 1.0}}
+        results = {"pick": {"count": 50, "p99_ms": 1.3, "ops_per_sec": 1200.0}, "new": {"p99_ms": 9.0}}
+        changes = {change["metric"]: change for change in compare(results, baseline, 0.1)}
+        self.assertEqual(set(changes), {"p99_ms", "ops_per_sec"})
+        self.assertTrue(changes["p99_ms"]["regression"])
+        self.assertFalse(changes["ops_per_sec"]["regression"])
+        self.assertFalse(compare({"pick": {"ops_per_sec": 950.0}}, baseline, 0.1)[0]["regression"])
+        self.assertTrue(compare({"pick": {"ops_per_sec": 850.0}}, baseline, 0.1)[0]["regression"])
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN every statement the views issue and fail on full scans or temp B-tree sorts."""
+
+    # Statements that read the whole table by design
+    ALLOWED_FULL_SCANS = (
+        # Sampler index load
+        'SELECT "quotes_quote"."id" AS "id", "quotes_quote"."weight" AS "weight" FROM "quotes_quote" ORDER BY 1 ASC',
+        # health_check quote count
+        'SELECT COUNT(*) AS "__count" FROM "quotes_quote"',
+    )
+
+    def setUp(self):
+        sampler.invalidate()
+        leaderboard.invalidate()
+        for i in range(30):
+            Quote.objects.create(text=f"Quote {i}", source=f"Movie {i // 3}", weight=i % 5 + 1, likes=i % 4, views=i)
+        self.quote = Quote.objects.first()
+
+    def tearDown(self):
+        view_counter.flush()
+        vote_counter.flush()
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoRegressions(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        statements = [q["sql"] for q in ctx.captured_queries if q["sql"].split()[0] in ("SELECT", "UPDATE", "DELETE")]
+        self.assertTrue(statements)
+        for sql in statements:
+            if sql in self.ALLOWED_FULL_SCANS:
+                continue
+            for step in self.plan(sql):
+                self.assertNotIn("TEMP B-TREE", step, sql)
+                if step.startswith("SCAN quotes_quote"):
+                    # Walking an index in order is only cheap when a LIMIT stops it early
+                    self.assertIn("USING INDEX", step, sql)
+                    self.assertIn(" LIMIT ", sql, sql)
+
+    def test_random_quote(self):
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:random')))
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:random')))
+
+    def test_random_quotes_api_and_views(self):
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:api_random'), {'n': 10}))
+        batch = self.client.get(reverse('quotes:api_random'), {'n': 10}).json()
+        self.client.post(reverse('quotes:api_views'), {'ids': [batch["quotes"][0]["id"]], 'token': batch["views_token"]})
+        self.assertNoRegressions(view_counter.flush)
+
+    def test_votes(self):
+        self.assertNoRegressions(lambda: self.client.post(reverse('quotes:api_like', args=[self.quote.pk])))
+        self.client.post(reverse('quotes:dislike', args=[self.quote.pk]))
+        self.assertNoRegressions(vote_counter.flush)
+
+    def test_popular(self):
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:popular')))
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:popular'), {'source': 'Movie 2'}))
+        leaderboard.mark_stale()
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:popular')))
+
+    def test_add_and_edit(self):
+        data = {'text': 'Brand new', 'source': 'Movie 1', 'weight': 1}
+        self.assertNoRegressions(lambda: self.client.post(reverse('quotes:add'), data))
+        data = {'text': 'Brand new', 'source': 'New source', 'weight': 1}
+        self.assertNoRegressions(lambda: self.client.post(reverse('quotes:add'), data))
+        self.assertNoRegressions(lambda: self.client.post(reverse('quotes:add'), data))
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:edit', args=[self.quote.pk])))
+        data = {'text': 'Edited', 'source': self.quote.source, 'weight': 2}
+        self.assertNoRegressions(lambda: self.client.post(reverse('quotes:edit', args=[self.quote.pk]), data))
+
+    def test_health_check(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.assertNoRegressions(lambda: self.client.get(reverse('quotes:health')))
@@ -1,15 +1,24 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = "quotes"
 
+# Read and vote endpoints have async twins for ASGI workers (see quotes/async_views.py)
+served = async_views if getattr(settings, "QUOTES_ASYNC_VIEWS", False) else views
+
 urlpatterns = [
-    path("", views.random_quote, name="random"),
+    path("", served.random_quote, name="random"),
     path("add/", views.add_quote, name="add"),
-    path("like/<int:pk>/", views.like_quote, name="like"),
-    path("dislike/<int:pk>/", views.dislike_quote, name="dislike"),
+    path("like/<int:pk>/", served.like_quote, name="like"),
+    path("dislike/<int:pk>/", served.dislike_quote, name="dislike"),
+    path("api/random/", views.random_quotes_json, name="api_random"),
+    path("api/views/", views.record_views_json, name="api_views"),
+    path("api/like/<int:pk>/", served.like_quote_json, name="api_like"),
+    path("api/dislike/<int:pk>/", served.dislike_quote_json, name="api_dislike"),
     path("<int:pk>/edit/", views.edit_quote, name="edit"),
-    path("popular/", views.popular_quotes, name="popular"),
+    path("popular/", served.popular_quotes, name="popular"),
+    path("search/", views.search_quotes, name="search"),
     path("health/", views.health_check, name="health"),
 ]
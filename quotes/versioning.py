@@ -0,0 +1,188 @@
+"""
+Corpus version shared by every worker process.
+
+Every change to a quote appends a row to ``QuoteChange``, and the id of the
+newest row is the corpus version. ``post_save``/``post_delete`` record the
+quote they touched; bulk operations that bypass signals record a row without
+a quote, meaning "everything may have changed".
+
+``CorpusVersionMiddleware`` calls ``corpus.sync()`` on each request, which
+checks the database at most once per ``CHECK_INTERVAL`` seconds (1 s by
+default), so a worker can serve state up to that old after another worker
+changed a quote: a deleted quote may still be drawn (the view then reloads the
+sampler), a new one is not drawn yet. The worker that made the change sees it
+at once through its own signals. Tests set the interval to 0 to sync on every
+request. When the version is unchanged a check is a single primary-key lookup. Otherwise the worker reads the rows it has not
+applied yet and re-reads only the quotes they name: weights go to the
+sampler, deletions to the sampler and the leaderboard, and ``corpus_changed``
+tells any other per-process cache which quotes changed. A bulk row, a gap
+left by pruning or more than ``MAX_DELTA`` pending rows fall back to a full
+reload.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.dispatch import Signal
+
+from .health import PROBE_PATHS
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "CHECK_INTERVAL": 1.0,
+    "MAX_DELTA": 500,
+    "RETENTION": 10000,
+}
+# Prune the change log once every this many changes
+PRUNE_EVERY = 1000
+
+# Sent after a worker applied changes made by any process. ``pks`` is the set of changed
+# quote ids, or None together with ``full=True`` when everything must be rebuilt.
+corpus_changed = Signal()
+
+
+def corpus_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUOTES_CORPUS", {})}
+
+
+def record_change(pk: Optional[int]) -> int:
+    """Append a change for quote ``pk`` (None for bulk changes) and return the new version."""
+    from .models import QuoteChange
+
+    change = QuoteChange.objects.create(quote_id=pk)
+    if change.pk % PRUNE_EVERY == 0:
+        QuoteChange.objects.filter(pk__lte=change.pk - corpus_settings()["RETENTION"]).delete()
+    return change.pk
+
+
+def record_bulk_change() -> int:
+    """Make every worker rebuild its quote state, e.g. after bulk_create or queryset.update()."""
+    return record_change(None)
+
+
+class CorpusVersion:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._applied: Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def applied(self) -> Optional[int]:
+        return self._applied if self._pid == os.getpid() else None
+
+    def current(self) -> int:
+        from django.db.models import Max
+
+        from .models import QuoteChange
+
+        # MAX() of the primary key is a single b-tree probe
+        return QuoteChange.objects.aggregate(version=Max("id"))["version"] or 0
+
+    def due(self) -> bool:
+        """Whether ``sync()`` would check the database now (no query)."""
+        return self.applied is None or time.monotonic() - self._checked_at >= corpus_settings()["CHECK_INTERVAL"]
+
+    def sync(self, force: bool = False) -> bool:
+        """Apply changes made since the last sync; return True if anything changed."""
+        if not force and not self.due():
+            return False
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._pid != os.getpid():
+                self._pid, self._applied = os.getpid(), None
+            version = self.current()
+            if version == self._applied:
+                return False
+            if self._applied is None:
+                # State inherited from before this worker started following the log
+                self._reload(version)
+            else:
+                self._apply(version)
+            return True
+
+    def _reload(self, version: int) -> None:
+        from .leaderboard import leaderboard
+        from .sampling import sampler
+
+        sampler.invalidate()
+        leaderboard.invalidate()
+        self._applied = version
+        corpus_changed.send(sender=self.__class__, pks=None, full=True)
+
+    def _apply(self, version: int) -> None:
+        from .leaderboard import leaderboard
+        from .models import Quote, QuoteChange
+        from .sampling import sampler
+
+        limit = corpus_settings()["MAX_DELTA"]
+        changes = list(
+            QuoteChange.objects.filter(pk__gt=self._applied, pk__lte=version)
+            .order_by("id")
+            .values_list("id", "quote_id")[: limit + 1]
+        )
+        if (
+            not changes
+            or len(changes) > limit
+            or changes[0][0] != self._applied + 1
+            or any(pk is None for _, pk in changes)
+        ):
+            self._reload(version)
+            return
+        pks = {pk for _, pk in changes}
+        weights = dict(Quote.objects.order_by().filter(pk__in=pks).values_list("id", "weight"))
+        for pk in pks:
+            if pk in weights:
+                sampler.update(pk, weights[pk])
+            else:
+                sampler.discard(pk)
+                leaderboard.discard(pk)
+        leaderboard.mark_stale()
+        self._applied = changes[-1][0]
+        corpus_changed.send(sender=self.__class__, pks=pks, full=False)
+
+
+def _sync_quietly() -> None:
+    try:
+        corpus.sync()
+    except DatabaseError:
+        # Serve from the current state rather than failing the request (e.g. during migrations)
+        logger.warning("Could not check the quote corpus version", exc_info=True)
+
+
+class CorpusVersionMiddleware:
+    """Bring this worker's per-process quote state up to date before each request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path_info not in PROBE_PATHS:
+            _sync_quietly()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Probes answer from memory; they must not wait on the corpus check
+        if request.path_info in PROBE_PATHS or not corpus.due():
+            return await self.get_response(request)
+        await sync_to_async(_sync_quietly)()
+        return await self.get_response(request)
+
+
+corpus = CorpusVersion()
@@ -1,12 +1,34 @@
-from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest
+from collections import Counter
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
-from django.db.models import F
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
+from .counters import view_counter, vote_counter
 from .forms import QuoteForm
+from .history import history_settings, recent_quotes, remember_quote, remember_quotes
+from .leaderboard import fingerprint, leaderboard
 from .models import Quote
-from .services import pick_weighted_quote
+from .search import SearchResults
+from .services import pick_weighted_quote, pick_weighted_quotes
+
+RANDOM_BATCH_DEFAULT = 10
+RANDOM_BATCH_MAX = 50
+VIEWS_BATCH_MAX = 100
+# A views report may span this many batches (the client reports every few quotes, across refills)
+VIEWS_TOKENS_MAX = 4
+VIEWS_TOKEN_SALT = "quotes.views"
+VIEWS_TOKEN_MAX_AGE = 24 * 3600
+SEARCH_PAGE_SIZE = 20
+# Lifetime of the popular table fragment in seconds. Its key changes with every counter change, so this only
+# bounds how long superseded fragments linger. The random card is not fragment-cached: with the shared SQLite
+# cache the lookup costs more than rendering two variables (see the render benchmark).
+POPULAR_FRAGMENT_TIMEOUT = 30
 
 
 def add_quote(request: HttpRequest) -> HttpResponse:
@@ -21,28 +43,126 @@ def add_quote(request: HttpRequest) -> HttpResponse:
 
 
 def random_quote(request: HttpRequest) -> HttpResponse:
-    quote = pick_weighted_quote()
+    recent = recent_quotes(request)
+    quote = pick_weighted_quote(exclude=recent)
     if not quote:
         return render(request, "quotes/random.html", {"quote": None})
-    Quote.objects.filter(pk=quote.pk).update(views=F("views") + 1)
-    quote.refresh_from_db(fields=["views"])  # keep view count fresh if displayed
-    return render(request, "quotes/random.html", {"quote": quote})
+    # DB value plus this worker's unflushed views, counted before a flush the add may trigger
+    quote.views += view_counter.add(quote.pk, "views")
+    response = render(request, "quotes/random.html", {"quote": quote})
+    remember_quote(response, recent, quote.pk)
+    return response
+
+
+def _quote_payload(quote: Quote) -> dict:
+    return {
+        "id": quote.pk,
+        "text": quote.text,
+        "source": quote.source,
+        "weight": quote.weight,
+        "views": quote.views + view_counter.pending(quote.pk, "views"),
+        "likes": quote.likes + vote_counter.pending(quote.pk, "likes"),
+        "dislikes": quote.dislikes + vote_counter.pending(quote.pk, "dislikes"),
+        "like_url": reverse("quotes:like", args=[quote.pk]),
+        "dislike_url": reverse("quotes:dislike", args=[quote.pk]),
+        "api_like_url": reverse("quotes:api_like", args=[quote.pk]),
+        "api_dislike_url": reverse("quotes:api_dislike", args=[quote.pk]),
+    }
+
+
+def random_quotes_json(request: HttpRequest) -> JsonResponse:
+    """Sampled quotes for the client-side queue; views are not counted here.
+
+    ``after`` lists the ids the client shows before this batch (oldest first):
+    they join the history cookie in the exclusion window, so the batch does
+    not repeat a quote still queued or just shown.
+    """
+    try:
+        count = int(request.GET.get("n", RANDOM_BATCH_DEFAULT))
+        # Newest first, like the history cookie
+        shown = [int(pk) for pk in request.GET.getlist("after")[::-1][:history_settings()["SIZE"]]]
+    except ValueError:
+        return JsonResponse({"error": "n and after must be integers"}, status=400)
+    count = max(1, min(count, RANDOM_BATCH_MAX))
+    quotes = pick_weighted_quotes(count, exclude=shown + recent_quotes(request))
+    # The ids handed out, which are all record_views_json accepts back
+    token = signing.dumps([quote.pk for quote in quotes], salt=VIEWS_TOKEN_SALT, compress=True)
+    return JsonResponse({"quotes": [_quote_payload(quote) for quote in quotes], "views_token": token})
+
+
+def _served_ids(tokens: list) -> Counter:
+    """How many times each id was served in the batches behind ``tokens``; bad or expired tokens count for nothing."""
+    served = Counter()
+    for token in tokens[:VIEWS_TOKENS_MAX]:
+        try:
+            served.update(signing.loads(token, salt=VIEWS_TOKEN_SALT, max_age=VIEWS_TOKEN_MAX_AGE))
+        except signing.BadSignature:
+            continue
+    return served
+
+
+def record_views_json(request: HttpRequest) -> JsonResponse:
+    """
+    Count views for quotes the client has actually displayed, and add them to its history.
+
+    Only ids from the batches named by the ``token`` values (``views_token`` of
+    random_quotes_json) are counted, each at most as often as it was served.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        ids = [int(pk) for pk in request.POST.getlist("ids")[:VIEWS_BATCH_MAX]]
+    except ValueError:
+        return JsonResponse({"error": "ids must be integers"}, status=400)
+    served = _served_ids(request.POST.getlist("token"))
+    recorded = []
+    for pk in ids:
+        if served[pk] > 0:
+            served[pk] -= 1
+            view_counter.add(pk, "views")
+            recorded.append(pk)
+    response = JsonResponse({"recorded": len(recorded)})
+    remember_quotes(response, recent_quotes(request), recorded)
+    return response
 
 
 def like_quote(request: HttpRequest, pk: int) -> HttpResponse:
     if request.method != "POST":
         return HttpResponseBadRequest("POST required")
-    Quote.objects.filter(pk=pk).update(likes=F("likes") + 1)
+    vote_counter.add(pk, "likes")
     return redirect(reverse("quotes:random"))
 
 
 def dislike_quote(request: HttpRequest, pk: int) -> HttpResponse:
     if request.method != "POST":
         return HttpResponseBadRequest("POST required")
-    Quote.objects.filter(pk=pk).update(dislikes=F("dislikes") + 1)
+    vote_counter.add(pk, "dislikes")
     return redirect(reverse("quotes:random"))
 
 
+def _vote_json(request: HttpRequest, pk: int, field: str) -> JsonResponse:
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        counters = Quote.objects.values("views", "likes", "dislikes").get(pk=pk)
+    except Quote.DoesNotExist:
+        return JsonResponse({"error": "Quote not found"}, status=404)
+    # Pending increments are read before the add, whose flush may move them into the row read above
+    other = "dislikes" if field == "likes" else "likes"
+    counters["views"] += view_counter.pending(pk, "views")
+    counters[other] += vote_counter.pending(pk, other)
+    counters[field] += vote_counter.add(pk, field)
+    return JsonResponse({"id": pk, **counters})
+
+
+def like_quote_json(request: HttpRequest, pk: int) -> JsonResponse:
+    return _vote_json(request, pk, "likes")
+
+
+def dislike_quote_json(request: HttpRequest, pk: int) -> JsonResponse:
+    return _vote_json(request, pk, "dislikes")
+
+
 def edit_quote(request: HttpRequest, pk: int) -> HttpResponse:
     try:
         instance = Quote.objects.get(pk=pk)
@@ -58,21 +178,41 @@ def edit_quote(request: HttpRequest, pk: int) -> HttpResponse:
     return render(request, "quotes/quote_form.html", {"form": form, "instance": instance})
 
 
+def _popular_etag(request: HttpRequest) -> str:
+    return leaderboard.digest(request.GET.get("source") or None)
+
+
+@condition(etag_func=_popular_etag)
 def popular_quotes(request: HttpRequest) -> HttpResponse:
-    qs = Quote.objects.all()
     source = request.GET.get("source")
-    if source:
-        qs = qs.filter(source=source)
-    quotes = qs.order_by("-likes", "-views")[:10]
-    return render(request, "quotes/popular.html", {"quotes": quotes, "active_source": source})
+    quotes = leaderboard.top(source or None)
+    context = {
+        "quotes": quotes,
+        "active_source": source,
+        "board_digest": fingerprint(source or None, quotes),
+        "fragment_timeout": POPULAR_FRAGMENT_TIMEOUT,
+    }
+    response = render(request, "quotes/popular.html", context)
+    # Browsers revalidate every time and get a 304 while the board is unchanged
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def search_quotes(request: HttpRequest) -> HttpResponse:
+    query = request.GET.get("q", "").strip()
+    page = Paginator(SearchResults(query), SEARCH_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(request, "quotes/search.html", {"query": query, "page": page})
 
 
 def health_check(request: HttpRequest) -> HttpResponse:
-    """Health check endpoint for load balancers and monitoring."""
+    """Detailed diagnostics for staff; load balancers poll the cheap /live and /ready probes (quotes.health)."""
     import json
     from django.db import connection
     from django.core.cache import cache
 
+    if not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden("Forbidden")
+
     health_data = {
         "status": "healthy",
         "timestamp": timezone.now().isoformat(),
@@ -99,7 +239,7 @@ def health_check(request: HttpRequest) -> HttpResponse:
         health_data["cache"] = f"error: {str(e)}"
         health_data["status"] = "unhealthy"
 
-    # Check if we have quotes
+    # Exact count: a full scan, acceptable for an admin-only endpoint
     try:
         quote_count = Quote.objects.count()
         health_data["quotes_count"] = quote_count
@@ -29,9 +29,16 @@ python manage.py collectstatic --noinput
 #     User.objects.create_superuser('admin', 'admin@example.com', 'admin')
 # "
 
-# Start Gunicorn
-echo "Starting Gunicorn server..."
-exec gunicorn config.wsgi:application \
+# Start Gunicorn: sync workers with WSGI, or uvicorn workers with ASGI when QUOTES_ASYNC_VIEWS is on
+if [ "$(echo "${QUOTES_ASYNC_VIEWS:-false}" | tr '[:upper:]' '[:lower:]')" = "true" ]; then
+    APP_MODULE=config.asgi:application
+    export GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker
+else
+    APP_MODULE=config.wsgi:application
+    export GUNICORN_WORKER_CLASS=sync
+fi
+echo "Starting Gunicorn server ($APP_MODULE, $GUNICORN_WORKER_CLASS workers)..."
+exec gunicorn "$APP_MODULE" \
     --config gunicorn.conf.py \
     --bind 0.0.0.0:8000 \
     --workers 3 \
@@ -58,11 +58,17 @@ document.addEventListener('DOMContentLoaded', function() {
         observer.observe(card);
     });
 
-    // Add refresh functionality
+    // Add refresh functionality: show the next prefetched quote in place,
+    // reloading the page only when the queue is empty
     const refreshButton = document.querySelector('.btn-refresh');
     if (refreshButton) {
+        const quoteQueue = createQuoteQueue(refreshButton.closest('.quote-card'));
         refreshButton.addEventListener('click', function(e) {
             e.preventDefault();
+            if (quoteQueue && quoteQueue.showNext()) {
+                addButtonAnimation(this);
+                return;
+            }
             showButtonLoading(this);
             setTimeout(() => {
                 window.location.reload();
@@ -70,15 +76,23 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Add like/dislike animation
+    // Submit likes/dislikes through the JSON API and update the stats in place;
+    // without JS (or if the request fails) the form posts and redirects as before
     const likeButtons = document.querySelectorAll('form[action*="like"], form[action*="dislike"]');
     likeButtons.forEach(form => {
         form.addEventListener('submit', function(e) {
             const button = this.querySelector('button[type="submit"]');
             if (button) {
-                showButtonLoading(button);
                 addButtonAnimation(button);
             }
+            if (!this.dataset.apiUrl || !window.fetch) {
+                if (button) {
+                    showButtonLoading(button);
+                }
+                return;
+            }
+            e.preventDefault();
+            submitVote(this, button);
         });
     });
 
@@ -101,6 +115,157 @@ function showButtonLoading(button) {
     }, 3000);
 }
 
+// Post a vote to the JSON endpoint and refresh the stat widgets from the response
+function submitVote(form, button) {
+    const token = form.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (button) {
+        button.disabled = true;
+    }
+    fetch(form.dataset.apiUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'Accept': 'application/json',
+            'X-CSRFToken': token ? token.value : ''
+        }
+    })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Vote failed with status ' + response.status);
+            }
+            return response.json();
+        })
+        .then(counters => {
+            updateStats(form.closest('.quote-card'), counters);
+            if (button) {
+                button.disabled = false;
+            }
+        })
+        .catch(() => {
+            // Fall back to the regular form POST
+            form.submit();
+        });
+}
+
+// Update the stat widgets of a quote card from a counters payload
+function updateStats(card, counters) {
+    if (!card) {
+        return;
+    }
+    ['weight', 'views', 'likes', 'dislikes'].forEach(name => {
+        const el = card.querySelector('.stat-value[data-stat="' + name + '"]');
+        if (el && counters[name] !== undefined) {
+            el.textContent = counters[name];
+        }
+    });
+}
+
+// Queue of prefetched random quotes for a quote card. Views are reported
+// in batches for quotes that were actually shown, not when prefetched.
+function createQuoteQueue(card) {
+    if (!card || !card.dataset.randomApi || !window.fetch) {
+        return null;
+    }
+    const batchSize = 20;
+    const refillBelow = 5;
+    const viewsBatchSize = 10;
+    const queue = [];
+    let seenViews = [];
+    let lastShown = [card.dataset.quoteId];
+    let loading = false;
+
+    function refill() {
+        if (loading || queue.length >= refillBelow) {
+            return;
+        }
+        loading = true;
+        // Ids shown before the new batch, oldest first, so the server keeps it from repeating them
+        const params = new URLSearchParams({ n: batchSize });
+        lastShown.concat(queue.map(quote => quote.id)).forEach(id => params.append('after', id));
+        fetch(card.dataset.randomApi + '?' + params, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        })
+            .then(response => response.ok ? response.json() : { quotes: [] })
+            .then(data => {
+                // Views are only counted for quotes served with this batch's token
+                data.quotes.forEach(quote => {
+                    quote.viewsToken = data.views_token;
+                });
+                queue.push(...data.quotes);
+            })
+            .catch(() => {})
+            .finally(() => {
+                loading = false;
+            });
+    }
+
+    function csrfToken() {
+        const input = card.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function viewsPayload() {
+        const body = new FormData();
+        body.append('csrfmiddlewaretoken', csrfToken());
+        seenViews.forEach(quote => body.append('ids', quote.id));
+        new Set(seenViews.map(quote => quote.viewsToken)).forEach(token => body.append('token', token));
+        seenViews = [];
+        return body;
+    }
+
+    function reportViews(onUnload) {
+        if (!seenViews.length) {
+            return;
+        }
+        if (onUnload && navigator.sendBeacon) {
+            navigator.sendBeacon(card.dataset.viewsApi, viewsPayload());
+            return;
+        }
+        fetch(card.dataset.viewsApi, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'X-CSRFToken': csrfToken() },
+            body: viewsPayload(),
+            keepalive: true
+        }).catch(() => {});
+    }
+
+    function render(quote) {
+        card.dataset.quoteId = quote.id;
+        card.querySelector('.quote-text').textContent = quote.text;
+        card.querySelector('.quote-source').textContent = quote.source;
+        updateStats(card, quote);
+        card.querySelectorAll('form[data-api-url]').forEach(form => {
+            const isDislike = form.getAttribute('action').indexOf('dislike') !== -1;
+            form.setAttribute('action', isDislike ? quote.dislike_url : quote.like_url);
+            form.dataset.apiUrl = isDislike ? quote.api_dislike_url : quote.api_like_url;
+        });
+    }
+
+    window.addEventListener('pagehide', () => reportViews(true));
+    setInterval(() => reportViews(false), 15000);
+    refill();
+
+    return {
+        showNext() {
+            const quote = queue.shift();
+            refill();
+            if (!quote) {
+                return false;
+            }
+            quote.views += 1;
+            render(quote);
+            lastShown = lastShown.concat(quote.id).slice(-refillBelow);
+            seenViews.push(quote);
+            if (seenViews.length >= viewsBatchSize) {
+                reportViews(false);
+            }
+            return true;
+        }
+    };
+}
+
 // Add animation to button click
 function addButtonAnimation(button) {
     button.style.transform = 'scale(0.95)';